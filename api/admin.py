@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import User, Casino, Tokes, TokeSignOff, EarlyOutRequest, Discrepancy, DealerVacation, AuditLog
+from .models import User, Casino, Tokes, TokeSignOff, TokePayout, EarlyOutRequest, EarlyOutEvent, DailyRollup, Discrepancy, DealerVacation, AuditLog, RevokedToken
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'employee_id', 'casino', 'has_pencil_flag')
-    list_filter = ('role', 'has_pencil_flag')
+    list_filter = ('casino', 'role', 'has_pencil_flag')
     search_fields = ('username', 'email', 'first_name', 'last_name', 'employee_id')
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
@@ -23,8 +23,8 @@ class CasinoAdmin(admin.ModelAdmin):
 
 @admin.register(Tokes)
 class TokesAdmin(admin.ModelAdmin):
-    list_display = ('id', 'date', 'finalized', 'per_hour_rate', 'created_at')
-    list_filter = ('finalized', 'date')
+    list_display = ('id', 'casino', 'date', 'finalized', 'pool_amount', 'per_hour_rate', 'created_at')
+    list_filter = ('casino', 'finalized', 'date')
     search_fields = ('id',)
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-date',)
@@ -37,18 +37,41 @@ class TokeSignOffAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
     raw_id_fields = ('user', 'toke')
 
+@admin.register(TokePayout)
+class TokePayoutAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'toke', 'hours', 'amount', 'created_at')
+    list_filter = ('toke__date',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    readonly_fields = ('created_at',)
+    raw_id_fields = ('toke', 'sign_off', 'user')
+
 @admin.register(EarlyOutRequest)
 class EarlyOutRequestAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'status', 'reason', 'requested_at', 'processed_at', 'authorized_by')
-    list_filter = ('status', 'reason', 'requested_at', 'processed_at')
+    list_display = ('id', 'user', 'status', 'reason', 'list_type', 'position', 'requested_at', 'processed_at', 'authorized_by')
+    list_filter = ('status', 'reason', 'list_type', 'queue_date', 'requested_at', 'processed_at')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'authorized_by__username')
     readonly_fields = ('requested_at', 'processed_at')
     raw_id_fields = ('user', 'authorized_by', 'toke_sign_off')
 
+@admin.register(EarlyOutEvent)
+class EarlyOutEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'casino', 'queue_date', 'shift', 'list_type', 'created_at')
+    list_filter = ('kind', 'list_type', 'queue_date')
+    readonly_fields = ('created_at',)
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        'gaming_day', 'casino', 'shift', 'scheduled_hours', 'actual_hours',
+        'dealer_count', 'early_out_count', 'vacation_count'
+    )
+    list_filter = ('casino', 'shift', 'gaming_day')
+    readonly_fields = ('updated_at',)
+
 @admin.register(Discrepancy)
 class DiscrepancyAdmin(admin.ModelAdmin):
-    list_display = ('id', 'reported_by', 'status', 'reported_at', 'verified_by', 'resolved_by')
-    list_filter = ('status', 'reported_at', 'verification_date', 'resolution_date')
+    list_display = ('id', 'reported_by', 'casino', 'status', 'reported_at', 'verified_by', 'resolved_by')
+    list_filter = ('casino', 'status', 'reported_at', 'verification_date', 'resolution_date')
     search_fields = (
         'reported_by__username',
         'verified_by__username',
@@ -69,8 +92,15 @@ class DealerVacationAdmin(admin.ModelAdmin):
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'action', 'model_name', 'record_id', 'timestamp')
-    list_filter = ('action', 'model_name', 'timestamp')
+    list_display = ('id', 'user', 'casino', 'action', 'model_name', 'record_id', 'timestamp')
+    list_filter = ('casino', 'action', 'model_name', 'timestamp')
     search_fields = ('user__username', 'model_name', 'record_id')
     readonly_fields = ('timestamp',)
     raw_id_fields = ('user',)
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'user', 'revoked_at', 'expires_at')
+    search_fields = ('jti', 'user__username')
+    readonly_fields = ('revoked_at',)
+    raw_id_fields = ('user',)
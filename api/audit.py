@@ -0,0 +1,143 @@
+"""
+Buffered audit log writer.
+
+Requests hand compact audit records to an in-process queue and return
+straight away. A background thread writes them with bulk_create once
+AUDIT_LOG_BATCH_SIZE records are waiting or AUDIT_LOG_FLUSH_SECONDS after
+the first one arrived, whichever comes first. The queue is bounded: when
+the database cannot keep up, new records are dropped and counted rather
+than holding up responses. Whatever is still queued is written at exit.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from .log import get_logger
+from .models import AuditLog
+
+log = get_logger(__name__)
+
+QUEUE_SIZE = getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200)
+FLUSH_SECONDS = getattr(settings, 'AUDIT_LOG_FLUSH_SECONDS', 2)
+# How long shutdown waits for the last batches to be written
+SHUTDOWN_SECONDS = 10
+
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, **fields):
+        """Queue one AuditLog row, given as model field values."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+            log.warning('audit_queue_full', dropped=self.dropped)
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self, timeout=SHUTDOWN_SECONDS):
+        """Stop the flusher after it has written what is queued."""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            self.flush()
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker, since threads do
+        # not survive a fork
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        return batch
+
+    def _next_batch(self):
+        """
+        Wait for a record, then keep collecting until the batch is full or
+        the flush interval has passed. Returns (batch, stopping).
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return self._drain(self.batch_size), True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch + self._drain(self.batch_size), True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._write(batch)
+        self.flush()
+        connection.close()
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            AuditLog.objects.bulk_create([AuditLog(**fields) for fields in batch])
+        except Exception:
+            log.exception('audit_write_failed', records=len(batch))
+
+
+writer = AuditWriter()
+atexit.register(writer.shutdown)
+
+
+def record(**fields):
+    # Stamped now; the row may only be written a flush interval later
+    fields.setdefault('timestamp', timezone.now())
+    writer.submit(**fields)
@@ -1,45 +1,140 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password
+from django.contrib.auth.hashers import make_password, verify_password
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, router
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from . import revocation, timing
+from .tokens import StreamToken
+from .log import get_logger
 
 User = get_user_model()
+log = get_logger(__name__)
+
+# Fields needed to resolve request.user; anything else loads lazily on access
+PRINCIPAL_FIELDS = (
+    'id', 'username', 'first_name', 'last_name', 'email', 'employee_id',
+    'role', 'casino', 'shift', 'has_pencil_flag', 'pencil_id',
+    'is_active', 'is_staff', 'is_superuser',
+)
+# Model.from_db takes deferred rows in concrete field order
+_PRINCIPAL_ATTNAMES = tuple(
+    f.attname for f in User._meta.concrete_fields if f.name in PRINCIPAL_FIELDS
+)
+PRINCIPAL_CACHE_TIMEOUT = getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 60)
+
+def principal_cache_key(user_id):
+    return f'auth:principal:{user_id}'
+
+def invalidate_principal(user_id):
+    cache.delete(principal_cache_key(user_id))
 
 class CustomJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        with timing.timed('auth'):
+            return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revocation.is_revoked(validated_token['jti']):
+            raise InvalidToken('Token has been revoked')
+        return validated_token
+
     def get_user(self, validated_token):
-        try:
-            user_id = validated_token['sub']
-            user = User.objects.get(id=user_id)
-            print(f'JWT Auth - Found user: {user.username}')
-            print(f'JWT Auth - User active status: {user.is_active}')
-            if not user.is_active:
-                print('JWT Auth - User is not active')
-                raise AuthenticationFailed('User is not active')
-            return user
-        except User.DoesNotExist:
-            print('JWT Auth - User not found')
-            raise AuthenticationFailed('User not found')
+        user_id = validated_token['sub']
+        key = principal_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = User.objects.filter(id=user_id).values_list(*_PRINCIPAL_ATTNAMES).first()
+            if values is None:
+                raise AuthenticationFailed('User not found')
+            cache.set(key, values, PRINCIPAL_CACHE_TIMEOUT)
+
+        user = User.from_db(router.db_for_read(User), _PRINCIPAL_ATTNAMES, values)
+        if not user.is_active:
+            raise AuthenticationFailed('User is not active')
+        return user
+
+class StreamTokenAuthentication(CustomJWTAuthentication):
+    """
+    Authenticates a StreamToken passed as ?token=. Only the event stream
+    route lists this class; everywhere else a stream token is rejected.
+    """
+    def authenticate(self, request):
+        raw_token = request.query_params.get('token')
+        if not raw_token:
+            return None
+        with timing.timed('auth'):
+            try:
+                token = StreamToken(raw_token)
+            except TokenError as e:
+                raise InvalidToken(e.args[0])
+            if revocation.is_revoked(token['jti']):
+                raise InvalidToken('Token has been revoked')
+            return self.get_user(token), token
 
 class CustomModelBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(username=username)
-            print(f'CustomModelBackend - Found user: {user.username}')
-            print(f'CustomModelBackend - User active status: {user.is_active}')
-            print(f'CustomModelBackend - Checking password...')
-            
-            if user.check_password(password):
-                print('CustomModelBackend - Password check passed')
-                return user if self.user_can_authenticate(user) else None
-            else:
-                print('CustomModelBackend - Password check failed')
-                return None
-        except User.DoesNotExist:
-            print('CustomModelBackend - User not found')
-            return None
+        user, reason = self.check_credentials(username, password)
+        if user is None:
+            log.debug('authenticate', username=username, result=reason)
+        return user
+
+    def check_credentials(self, username, password):
+        """
+        Return (user, None) when the credentials are good, otherwise
+        (None, reason). Costs one query, with the casino joined for the
+        token claims, and one hash verification. A hash made with outdated
+        hasher settings is upgraded after the response, not during it.
+        """
+        user = User.objects.select_related('casino').filter(username=username).first()
+        if user is None:
+            # Hash anyway so an unknown username takes as long as a wrong password
+            User().set_password(password)
+            return None, 'unknown_user'
+
+        is_correct, must_update = verify_password(password, user.password)
+        if not is_correct:
+            return None, 'bad_password'
+        if not self.user_can_authenticate(user):
+            return None, 'inactive'
+        if must_update:
+            upgrade_password_hash_later(user.pk, password, user.password)
+        return user, None
 
     def user_can_authenticate(self, user):
-        can_auth = user.is_active
-        print(f'CustomModelBackend - Can authenticate: {can_auth}')
-        return can_auth
+        return user.is_active
+
+# One background thread re-hashes passwords verified against outdated
+# hasher settings. Created lazily, and again in a forked worker.
+_upgrades = None
+_upgrades_pid = None
+_upgrades_lock = threading.Lock()
+
+def _upgrade_executor():
+    global _upgrades, _upgrades_pid
+    with _upgrades_lock:
+        if _upgrades is None or _upgrades_pid != os.getpid():
+            _upgrades_pid = os.getpid()
+            _upgrades = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-hash-upgrade')
+        return _upgrades
+
+def upgrade_password_hash_later(user_id, password, encoded):
+    """
+    Store a hash made with the preferred hasher, off the request thread.
+    Nothing is written if the password changed in the meantime.
+    """
+    return _upgrade_executor().submit(_upgrade_password_hash, user_id, password, encoded)
+
+def _upgrade_password_hash(user_id, password, encoded):
+    try:
+        User.objects.filter(pk=user_id, password=encoded).update(password=make_password(password))
+    except Exception:
+        log.exception('password_hash_upgrade_failed', user_id=user_id)
+    finally:
+        connection.close()
@@ -0,0 +1,282 @@
+"""
+Latency benchmarks for the hot API endpoints.
+
+seed() fills an empty database with one synthetic casino: dealers spread
+over the three shifts, a toke per gaming day, a sign-off for each dealer
+on five days out of seven, a vacation per dealer every 90 days and a
+pending early-out for one dealer in twenty today. run() then drives each
+endpoint in ENDPOINTS through the Django test client as a toke manager
+and records the latency and query count of the cold (empty cache) call,
+then the p50 and p95 latency of the warm calls, the most queries any of
+them made and how many calls per second one worker sustains. For
+auth_login that last figure is logins per second per worker, which is
+bounded by the password hasher's work factor.
+
+compare() checks a run against a stored baseline. An endpoint regresses
+when its p95 grows by more than the tolerance (and by more than
+NOISE_FLOOR_MS, so sub-millisecond jitter is ignored) or when it makes
+more queries than before.
+"""
+import logging
+import statistics
+import time
+from collections import namedtuple
+from datetime import time as dt_time, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import User, Casino, Tokes, TokeSignOff, DealerVacation, EarlyOutRequest
+from .shifts import current_gaming_day
+
+SIZES = {
+    'small': {'dealers': 100, 'days': 30},
+    'medium': {'dealers': 1000, 'days': 90},
+    'large': {'dealers': 10000, 'days': 365},
+}
+
+BATCH_SIZE = 5000
+NOISE_FLOOR_MS = 1.0
+HOURLY_POOL = Decimal('25.00')
+MANAGER_PASSWORD = 'bench-password'
+
+# Seeded shift times by User.shift
+SHIFT_TIMES = {
+    1: (dt_time(9, 30), dt_time(17, 30)),
+    2: (dt_time(17, 30), dt_time(1, 30)),
+    3: (dt_time(1, 30), dt_time(9, 30)),
+}
+
+Endpoint = namedtuple('Endpoint', 'name method path data', defaults=(None,))
+
+
+def _finalize_path(dataset):
+    # Each call finalizes a different past day, oldest last
+    pending = iter(dataset['past_tokes'])
+    return lambda: f'/api/tokes/{next(pending)}/finalize/'
+
+
+ENDPOINTS = (
+    Endpoint('tokes_current', 'get', lambda dataset: lambda: '/api/tokes/current/'),
+    Endpoint('early_out_current_list', 'get', lambda dataset: lambda: '/api/early-out-requests/current-list/'),
+    Endpoint('toke_finalize', 'post', _finalize_path),
+    Endpoint('dealers', 'get', lambda dataset: lambda: '/api/dealers/'),
+    Endpoint('vacation_history', 'get', lambda dataset: lambda: '/api/dealer-vacations/history/'),
+    Endpoint(
+        'auth_login',
+        'post',
+        lambda dataset: lambda: '/api/auth/login/',
+        {'username': 'bench-manager', 'password': MANAGER_PASSWORD}
+    ),
+)
+
+
+def _works(dealer_index, day_index):
+    # Five days on, two off, staggered so every day is equally staffed
+    return (dealer_index + day_index) % 7 < 5
+
+
+def _batches(objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(dealers, days):
+    """Create the benchmark casino and its data. Returns what run() needs."""
+    with transaction.atomic():
+        casino = Casino.objects.create(name='Benchmark Casino')
+        manager = User.objects.create(
+            username='bench-manager',
+            employee_id='bench-mgr',
+            first_name='Bench',
+            last_name='Manager',
+            role='TOKE_MANAGER',
+            casino=casino,
+            password=make_password(MANAGER_PASSWORD)
+        )
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'9{i:08d}',
+                    employee_id=f'9{i:08d}',
+                    first_name=f'Dealer{i}',
+                    last_name='Bench',
+                    role='DEALER',
+                    shift=i % 3 + 1,
+                    casino=casino,
+                    password='!'
+                )
+                for i in range(dealers)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        dealer_rows = list(
+            User.objects.filter(casino=casino, role='DEALER').order_by('username').values_list('id', 'shift')
+        )
+
+        today = current_gaming_day(casino.pk)
+        dates = [today - timedelta(days=offset) for offset in range(days)]
+        toke_rows = []
+        for day_index, day in enumerate(dates):
+            working = sum(1 for i in range(dealers) if _works(i, day_index))
+            pool = HOURLY_POOL * 8 * working if day_index else None
+            toke_rows.append(Tokes(
+                casino=casino,
+                date=day,
+                pool_amount=pool,
+                per_hour_rate=HOURLY_POOL if pool else None
+            ))
+        Tokes.objects.bulk_create(toke_rows, batch_size=BATCH_SIZE)
+
+        def sign_offs():
+            for day_index, (day, toke) in enumerate(zip(dates, toke_rows)):
+                for i, (user_id, shift) in enumerate(dealer_rows):
+                    if _works(i, day_index):
+                        start, end = SHIFT_TIMES[shift]
+                        yield TokeSignOff(
+                            user_id=user_id,
+                            toke=toke,
+                            shift_date=day,
+                            shift_start=start,
+                            shift_end=end,
+                            scheduled_hours=8,
+                            actual_hours=8,
+                            original_hours=8
+                        )
+
+        for batch in _batches(sign_offs()):
+            TokeSignOff.objects.bulk_create(batch)
+
+        def vacations():
+            for i, (user_id, _) in enumerate(dealer_rows):
+                for period in range(max(1, days // 90)):
+                    start = today - timedelta(days=(i * 13 + period * 90) % days)
+                    yield DealerVacation(
+                        user_id=user_id,
+                        start_date=start,
+                        end_date=start + timedelta(days=4),
+                        status='APPROVED',
+                        approved_by=manager
+                    )
+
+        for batch in _batches(vacations()):
+            DealerVacation.objects.bulk_create(batch)
+
+        positions = {}
+        early_outs = []
+        for i, (user_id, shift) in enumerate(dealer_rows):
+            if i % 20 == 0:
+                positions[shift] = positions.get(shift, 0) + 1
+                early_outs.append(EarlyOutRequest(
+                    user_id=user_id,
+                    status='PENDING',
+                    casino=casino,
+                    queue_date=today,
+                    shift=shift,
+                    list_type='dealer',
+                    position=positions[shift]
+                ))
+        EarlyOutRequest.objects.bulk_create(early_outs, batch_size=BATCH_SIZE)
+
+    return {
+        'manager': manager,
+        'past_tokes': [toke.pk for toke in toke_rows[1:]],
+        'rows': {
+            'dealers': len(dealer_rows),
+            'tokes': len(toke_rows),
+            'sign_offs': TokeSignOff.objects.count(),
+            'vacations': DealerVacation.objects.count(),
+            'early_outs': len(early_outs),
+        },
+    }
+
+
+def _percentile(samples, percent):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+def _call(client, method, path, data=None):
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if data is None:
+            response = getattr(client, method)(path)
+        else:
+            response = getattr(client, method)(path, data, content_type='application/json')
+        elapsed = (time.perf_counter() - started) * 1000
+    return response.status_code, elapsed, len(queries)
+
+
+def run(dataset, repeat):
+    """Benchmark every endpoint. Returns {name: result}."""
+    token = RefreshToken.for_user(dataset['manager']).access_token
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+    # The per-request timing and login lines would drown out the report
+    for name in ('api', 'api.timing'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = {}
+    for endpoint in ENDPOINTS:
+        next_path = endpoint.path(dataset)
+        # Finalize uses up one past toke per call
+        calls = repeat
+        if endpoint.name == 'toke_finalize':
+            calls = min(repeat, len(dataset['past_tokes']) - 1)
+
+        cache.clear()
+        status_code, cold_ms, cold_queries = _call(client, endpoint.method, next_path(), endpoint.data)
+        samples = []
+        max_queries = 0
+        for _ in range(calls):
+            code, elapsed, query_count = _call(client, endpoint.method, next_path(), endpoint.data)
+            status_code = max(status_code, code)
+            samples.append(elapsed)
+            max_queries = max(max_queries, query_count)
+
+        results[endpoint.name] = {
+            'method': endpoint.method.upper(),
+            'status': status_code,
+            'samples': len(samples),
+            'cold_ms': round(cold_ms, 2),
+            'cold_queries': cold_queries,
+            'p50_ms': round(_percentile(samples, 50), 2) if samples else None,
+            'p95_ms': round(_percentile(samples, 95), 2) if samples else None,
+            'queries': max_queries,
+            'per_second': round(1000 * len(samples) / sum(samples), 1) if samples else None,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of (endpoint, message) for every regression against baseline."""
+    regressions = []
+    for name, before in baseline.get('endpoints', {}).items():
+        after = results.get(name)
+        if after is None:
+            regressions.append((name, 'missing from this run'))
+            continue
+
+        if before.get('p95_ms') is not None and after.get('p95_ms') is not None:
+            limit = before['p95_ms'] * (1 + tolerance)
+            if after['p95_ms'] > limit and after['p95_ms'] - before['p95_ms'] > NOISE_FLOOR_MS:
+                regressions.append((
+                    name,
+                    f"p95 {after['p95_ms']} ms, was {before['p95_ms']} ms (limit {limit:.2f} ms)"
+                ))
+        if after['queries'] > before['queries'] or after['cold_queries'] > before['cold_queries']:
+            regressions.append((
+                name,
+                f"{after['cold_queries']}/{after['queries']} cold/warm queries, "
+                f"was {before['cold_queries']}/{before['queries']}"
+            ))
+    return regressions
@@ -0,0 +1,123 @@
+"""
+Early-out waiting lines.
+
+There is one queue per casino, gaming day, shift and list type (dealer or
+supervisor). Every pending request in a queue stores its 1-based position,
+so "what's my position" is a read of the request row. Removing a request
+closes the gap with set-based UPDATEs. "Next N" is a range read on the
+index behind early_out_queue_position_unique, the constraint that stops
+two waiting requests from ever holding the same place.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import EarlyOutRequest
+from .shifts import current_gaming_day
+
+SHIFT_NUMBERS = {'day': 1, 'swing': 2, 'grave': 3}
+LIST_TYPES = ('dealer', 'supervisor')
+
+# Joins retried after losing a race for the same place in line
+ENQUEUE_ATTEMPTS = 3
+# Added to positions while they move, above any real place in line, so no
+# two rows share a position at any point of a multi-row UPDATE
+PARKED_OFFSET = 1000000
+
+
+class EarlyOutQueue:
+    def __init__(self, casino_id, queue_date, shift, list_type):
+        self.casino_id = casino_id
+        self.queue_date = queue_date
+        self.shift = shift
+        self.list_type = list_type
+
+    @classmethod
+    def for_user(cls, user, list_type, shift=None, queue_date=None):
+        """Queue a user joins: their casino, today's gaming day and their shift unless one is given."""
+        return cls(
+            casino_id=user.casino_id,
+            queue_date=queue_date or current_gaming_day(user.casino_id),
+            shift=shift or user.shift,
+            list_type=list_type
+        )
+
+    @classmethod
+    def for_request(cls, early_out):
+        return cls(early_out.casino_id, early_out.queue_date, early_out.shift, early_out.list_type)
+
+    def requests(self):
+        """Every request filed against this queue, whatever its status."""
+        return EarlyOutRequest.objects.filter(
+            casino_id=self.casino_id,
+            queue_date=self.queue_date,
+            shift=self.shift,
+            list_type=self.list_type
+        )
+
+    def waiting(self):
+        """Pending requests in line order."""
+        return self.requests().filter(position__isnull=False).order_by('position')
+
+    @staticmethod
+    def in_line_order(requests):
+        """
+        Order requests from one or more queues for display: by shift, waiting
+        requests by their place in line, then the rest by when they were made.
+        """
+        return requests.order_by('shift', F('position').asc(nulls_last=True), 'requested_at', 'id')
+
+    def enqueue(self, user, **fields):
+        """Create a pending request at the back of the line."""
+        last_position = self.waiting().order_by('-position').values('position')[:1]
+        for attempt in range(ENQUEUE_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    early_out = EarlyOutRequest.objects.create(
+                        user=user,
+                        status='PENDING',
+                        casino_id=self.casino_id,
+                        queue_date=self.queue_date,
+                        shift=self.shift,
+                        list_type=self.list_type,
+                        **fields
+                    )
+                    # Assign the position in the same statement that reads the
+                    # tail; a join that still lands on the same place fails the
+                    # unique constraint and tries again behind it
+                    EarlyOutRequest.objects.filter(pk=early_out.pk).update(
+                        position=Coalesce(Subquery(last_position), Value(0)) + 1
+                    )
+                break
+            except IntegrityError:
+                if attempt == ENQUEUE_ATTEMPTS - 1:
+                    raise
+        early_out.refresh_from_db(fields=['position'])
+        return early_out
+
+    def remove(self, early_out, status):
+        """Take a request out of the line, setting its new status, and close the gap."""
+        removed_position = EarlyOutRequest.objects.filter(pk=early_out.pk).values('position')[:1]
+        with transaction.atomic():
+            # Park everyone behind it first; the write takes the lock before
+            # the removed position is read, so concurrent removals stay ordered
+            self.waiting().filter(
+                position__gt=Subquery(removed_position)
+            ).update(position=F('position') + PARKED_OFFSET)
+
+            early_out.status = status
+            early_out.position = None
+            early_out.save()
+
+            # Then bring them back one place forward
+            self.waiting().filter(
+                position__gt=PARKED_OFFSET
+            ).update(position=F('position') - PARKED_OFFSET - 1)
+        return early_out
+
+    def next(self, count):
+        return self.waiting()[:count]
+
+    def size(self):
+        # Positions are kept contiguous, so the last position is the length
+        last = self.waiting().order_by('-position').values_list('position', flat=True).first()
+        return last or 0
@@ -0,0 +1,154 @@
+"""
+Early-out list change events and the Server-Sent Events stream that serves them.
+
+Changes are appended to EarlyOutEvent when the surrounding transaction
+commits, and waiting streams in the same process are woken straight away.
+Streams also re-check the log every EARLY_OUT_STREAM_POLL_SECONDS, which
+picks up events written by other worker processes and keeps the
+connection alive. Event ids come from the log, so a reconnecting client
+resumes from its Last-Event-ID.
+
+Streams only follow the current gaming day's queues, so the
+prune_early_out_events command deletes events for queue dates older than
+EARLY_OUT_EVENT_RETENTION_DAYS.
+
+Deployment: an open stream is only cheap under ASGI (tokebook.asgi), where
+astream is an idle coroutine between polls and each poll borrows a thread
+just for its query. Under WSGI every open stream holds a worker thread, so
+stream ends after EARLY_OUT_STREAM_WSGI_MAX_SECONDS and the client
+reconnects; size the WSGI worker pool for the number of open early-out
+screens, or route /api/early-out-requests/stream/ to an ASGI server.
+"""
+import asyncio
+import json
+import threading
+import time
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import EarlyOutEvent
+
+POLL_SECONDS = getattr(settings, 'EARLY_OUT_STREAM_POLL_SECONDS', 15)
+# Streams end after this long and the client reconnects with Last-Event-ID,
+# so a connection is never held indefinitely
+MAX_STREAM_SECONDS = getattr(settings, 'EARLY_OUT_STREAM_MAX_SECONDS', 300)
+# A WSGI stream holds a worker thread, so it ends much sooner
+WSGI_MAX_STREAM_SECONDS = getattr(settings, 'EARLY_OUT_STREAM_WSGI_MAX_SECONDS', 25)
+# How often an async stream checks for events published in this process
+WAKE_SECONDS = 0.5
+BATCH_SIZE = 100
+RETENTION_DAYS = getattr(settings, 'EARLY_OUT_EVENT_RETENTION_DAYS', 7)
+
+_condition = threading.Condition()
+_generation = 0
+
+
+def _notify():
+    global _generation
+    with _condition:
+        _generation += 1
+        _condition.notify_all()
+
+
+def _wait(seen_generation, timeout):
+    """Block until an event is published after seen_generation, or timeout."""
+    with _condition:
+        if _generation == seen_generation:
+            _condition.wait(timeout)
+        return _generation
+
+
+def publish(early_out, kind, data):
+    """Record an event for the early-out's queue once the transaction commits."""
+    def write():
+        EarlyOutEvent.objects.create(
+            casino_id=early_out.casino_id,
+            queue_date=early_out.queue_date,
+            shift=early_out.shift,
+            list_type=early_out.list_type,
+            kind=kind,
+            payload=data
+        )
+        _notify()
+
+    transaction.on_commit(write)
+
+
+def queue_events(queue):
+    return EarlyOutEvent.objects.filter(
+        casino_id=queue.casino_id,
+        queue_date=queue.queue_date,
+        shift=queue.shift,
+        list_type=queue.list_type
+    )
+
+
+def latest_event_id(queue):
+    return queue_events(queue).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def prune(days=RETENTION_DAYS):
+    """Delete events for queue dates more than days ago. Returns how many."""
+    cutoff = timezone.localdate() - timedelta(days=days)
+    deleted, _ = EarlyOutEvent.objects.filter(queue_date__lt=cutoff).delete()
+    return deleted
+
+
+def format_event(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.payload)}\n\n"
+
+
+def _fetch(queue, last_event_id):
+    return list(queue_events(queue).filter(id__gt=last_event_id).order_by('id')[:BATCH_SIZE])
+
+
+def _fetch_and_close(queue, last_event_id):
+    # Runs on an executor thread that no request cycle closes connections for
+    try:
+        return _fetch(queue, last_event_id)
+    finally:
+        connection.close()
+
+
+def stream(queue, last_event_id):
+    """Yield SSE frames for the queue, starting after last_event_id. For WSGI."""
+    deadline = time.monotonic() + WSGI_MAX_STREAM_SECONDS
+    yield "retry: 3000\n\n"
+
+    while time.monotonic() < deadline:
+        seen_generation = _generation
+        events = _fetch(queue, last_event_id)
+        for event in events:
+            last_event_id = event.id
+            yield format_event(event)
+
+        if len(events) == BATCH_SIZE:
+            continue
+        timeout = min(POLL_SECONDS, deadline - time.monotonic())
+        if _wait(seen_generation, max(timeout, 0)) == seen_generation:
+            yield ": keep-alive\n\n"
+
+
+async def astream(queue, last_event_id):
+    """Yield SSE frames for the queue, starting after last_event_id. For ASGI."""
+    fetch = sync_to_async(_fetch_and_close, thread_sensitive=False)
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+    yield "retry: 3000\n\n"
+
+    while time.monotonic() < deadline:
+        seen_generation = _generation
+        events = await fetch(queue, last_event_id)
+        for event in events:
+            last_event_id = event.id
+            yield format_event(event)
+
+        if len(events) == BATCH_SIZE:
+            continue
+        # _generation is a plain counter, so checking it doesn't need a thread
+        poll_at = min(time.monotonic() + POLL_SECONDS, deadline)
+        while _generation == seen_generation and time.monotonic() < poll_at:
+            await asyncio.sleep(WAKE_SECONDS)
+        if _generation == seen_generation:
+            yield ": keep-alive\n\n"
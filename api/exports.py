@@ -0,0 +1,93 @@
+"""
+Streaming export of toke sign-offs with their rates and payouts.
+
+Rows are read with a server-side iterator in EXPORT_CHUNK_SIZE chunks and
+written out a chunk at a time, so memory use is the same for one day or
+several years. Each row is a flat tuple of EXPORT_COLUMNS; no model
+instances are built.
+"""
+import csv
+import io
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import TokeSignOff
+
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# (output column, queryset lookup)
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('shift_date', 'shift_date'),
+    ('toke_id', 'toke_id'),
+    ('user_id', 'user_id'),
+    ('employee_id', 'user__employee_id'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('role', 'user__role'),
+    ('casino', 'toke__casino__name'),
+    ('shift', 'user__shift'),
+    ('shift_start', 'shift_start'),
+    ('shift_end', 'shift_end'),
+    ('scheduled_hours', 'scheduled_hours'),
+    ('actual_hours', 'actual_hours'),
+    ('toke_hours', 'toke_hours'),
+    ('per_hour_rate', 'toke__per_hour_rate'),
+    ('payout_amount', 'payout__amount'),
+    ('finalized', 'toke__finalized'),
+)
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_rows(casino_id, start_date, end_date, shift=None):
+    """Yield one tuple per sign-off for the casino in the range, ordered by shift date."""
+    queryset = TokeSignOff.objects.filter(
+        toke__casino_id=casino_id,
+        shift_date__range=(start_date, end_date)
+    )
+    if shift:
+        queryset = queryset.filter(user__shift=shift)
+
+    return queryset.order_by('shift_date', 'created_at').values_list(
+        *(lookup for _, lookup in EXPORT_COLUMNS)
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(rows):
+        yield ''.join(
+            encoder.encode(dict(zip(HEADER, row))) + '\n'
+            for row in chunk
+        )
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only, for an empty export
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', ndjson_lines),
+    'csv': ('text/csv', csv_lines),
+}
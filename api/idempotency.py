@@ -0,0 +1,102 @@
+"""
+Idempotency-Key support for retried mutations.
+
+A view method decorated with @idempotent runs as usual unless the request
+carries an Idempotency-Key header. With one, the first request claims
+the key in the cache, runs the view and stores its response for
+IDEMPOTENCY_TTL_SECONDS. A repeat of that request from the same user
+gets the stored response back, marked with Idempotent-Replayed: true,
+without reaching the write path. Keys are scoped to the user and the
+route. The stored entry records a hash of the query string and body, and
+reusing a key with a different request returns 422. A repeat that
+arrives while the first is still running returns 409, so the client
+retries later rather than racing it for the write lock.
+
+Server errors are not stored. The key is released instead, so the next
+retry runs the view again.
+
+Claims and stored responses live in the default cache, so a retry is
+only recognised by a worker that shares it. Multi-worker deployments
+need the shared cache backend described in settings.
+"""
+import functools
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+TTL_SECONDS = getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 60 * 60)
+# How long an in-flight claim blocks repeats if the worker dies mid-request
+IN_PROGRESS_SECONDS = 60
+MAX_KEY_LENGTH = 255
+
+_IN_PROGRESS = 'in-progress'
+
+
+def _cache_key(request, key):
+    return f'idempotency:{request.user.pk}:{request.method}:{request.path}:{key}'
+
+
+def _fingerprint(request):
+    # The query string counts: add-to-list takes its list and shift there
+    digest = hashlib.sha256(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def idempotent(view_method):
+    @functools.wraps(view_method)
+    def wrapped(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        if not cache.add(cache_key, (_IN_PROGRESS, fingerprint), IN_PROGRESS_SECONDS):
+            return _replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, (fingerprint, response.status_code, response.data), TTL_SECONDS)
+        return response
+    return wrapped
+
+
+def _replay(stored, fingerprint):
+    # stored is None if the claim expired in the meantime; the retry will claim it
+    if stored is None or stored[0] == _IN_PROGRESS:
+        if stored is not None and stored[1] != fingerprint:
+            return _mismatch()
+        return Response(
+            {'error': 'A request with this Idempotency-Key is still being processed'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    stored_fingerprint, status_code, data = stored
+    if stored_fingerprint != fingerprint:
+        return _mismatch()
+    response = Response(data, status=status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _mismatch():
+    return Response(
+        {'error': 'Idempotency-Key was already used with a different request body'},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
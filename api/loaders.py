@@ -0,0 +1,69 @@
+"""
+Batched loaders for the toke serializers.
+
+Each loader runs a fixed number of queries no matter how many tokes or
+sign-offs are being serialized. The results are handed to the nested
+serializers through the serializer context.
+"""
+from collections import defaultdict
+from .models import TokeSignOff, EarlyOutRequest
+
+ACTIVE_EARLY_OUT_STATUSES = ['PENDING', 'APPROVED']
+
+
+def load_sign_offs(tokes):
+    """Return {toke_id: [sign_off, ...]} for the given tokes, with users and payouts, in one query."""
+    sign_offs_by_toke = defaultdict(list)
+    toke_ids = [toke.pk for toke in tokes]
+    if not toke_ids:
+        return sign_offs_by_toke
+
+    sign_offs = TokeSignOff.objects.filter(
+        toke_id__in=toke_ids
+    ).select_related('user__casino', 'payout')
+
+    for sign_off in sign_offs:
+        sign_offs_by_toke[sign_off.toke_id].append(sign_off)
+    return sign_offs_by_toke
+
+
+def load_early_outs(sign_offs):
+    """
+    Return {(user_id, shift_date): early_out} for the given sign-offs in one query.
+    Keeps the most recent active request per user and day, matching the
+    single-row lookup in TokeSignOffSerializer.get_early_out.
+    """
+    early_outs = {}
+    user_ids = {s.user_id for s in sign_offs}
+    dates = {s.shift_date for s in sign_offs if s.shift_date}
+    if not user_ids or not dates:
+        return early_outs
+
+    requests = EarlyOutRequest.objects.filter(
+        user_id__in=user_ids,
+        queue_date__in=dates,
+        status__in=ACTIVE_EARLY_OUT_STATUSES
+    ).select_related('user', 'authorized_by').order_by('-requested_at')
+
+    for early_out in requests:
+        key = (early_out.user_id, early_out.queue_date)
+        # Ordered newest first, so the first request seen for a key wins
+        early_outs.setdefault(key, early_out)
+    return early_outs
+
+
+def load_toke_context(tokes):
+    """Build the serializer context entries for a page of tokes."""
+    sign_offs_by_toke = load_sign_offs(tokes)
+    all_sign_offs = [s for sign_offs in sign_offs_by_toke.values() for s in sign_offs]
+    return {
+        'sign_offs_by_toke': sign_offs_by_toke,
+        'early_outs': load_early_outs(all_sign_offs),
+    }
+
+
+def load_sign_off_context(sign_offs):
+    """Build the serializer context entries for a list of sign-offs."""
+    return {
+        'early_outs': load_early_outs(sign_offs),
+    }
@@ -0,0 +1,155 @@
+"""
+Structured, non-blocking logging.
+
+get_logger(name) returns a StructuredLogger whose methods take an event
+name and keyword fields:
+
+    log.info('login_failed', username=username, reason='bad_password')
+
+The level is checked before anything else, so a disabled call costs one
+cached isEnabledFor() lookup and no formatting. Pass plain values rather
+than pre-formatted strings, and guard anything expensive to compute with
+log.is_enabled_for(). Calls on hot paths can pass sample=0.01 (or
+HOT_PATH_SAMPLE_RATE) to keep roughly that fraction of records; kept
+records carry the rate so counts can be scaled back up.
+
+QueuedHandler is the handler the api loggers use (see LOGGING in
+settings). Request threads only put the record on a bounded in-process
+queue; a listener thread formats it as a JSON line and writes it out. When
+the queue is full, records are dropped and counted rather than blocking
+the request, the same trade-off the audit writer in api/audit.py makes.
+Whatever is still queued is written at exit.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from django.conf import settings
+
+HOT_PATH_SAMPLE_RATE = getattr(settings, 'LOG_HOT_PATH_SAMPLE_RATE', 0.01)
+QUEUE_SIZE = getattr(settings, 'LOG_QUEUE_SIZE', 10000)
+
+# LogRecord attributes that are not user fields
+_RESERVED = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'fields'}
+
+
+class StructuredLogger:
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def is_enabled_for(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, event, sample=None, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample is not None:
+            if random.random() >= sample:
+                return
+            fields['sample_rate'] = sample
+        self.logger.log(level, event, exc_info=exc_info, extra={'fields': fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event, **fields):
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name):
+    return StructuredLogger(name)
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and the fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        # Plain logging calls with extra={...} get their extras as fields too
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RESERVED)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Hands records to a listener thread that writes them to stream (stderr
+    by default) with StructuredFormatter.
+    """
+
+    def __init__(self, stream=None, queue_size=QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(StructuredFormatter())
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # The formatter configured in LOGGING applies to the written output
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Resolve %-style arguments now, while mutable arguments still hold
+        # their current values; everything else is formatted by the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        # A forked worker inherits the handler but not the listener thread
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._listener = QueueListener(self.queue, self.target)
+                self._listener.start()
+
+    def stop(self):
+        """Write whatever is still queued and stop the listener."""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        if self.dropped:
+            self.target.handle(logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': 'log_records_dropped',
+                'fields': {'count': self.dropped},
+            }))
+            self.dropped = 0
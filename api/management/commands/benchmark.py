@@ -0,0 +1,108 @@
+import json
+import platform
+import sqlite3
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from api import audit, benchmarks
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and measure p50/p95 latency and query counts '
+        'of the hot endpoints, optionally against a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(benchmarks.SIZES), default='small')
+        parser.add_argument('--repeat', type=int, default=30, help='Warm calls per endpoint')
+        parser.add_argument('--output', help='Results file (default benchmark-<size>.json)')
+        parser.add_argument('--compare', metavar='BASELINE', help='Results file to check for regressions against')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed p95 growth over the baseline, as a fraction (default 0.25)'
+        )
+        parser.add_argument(
+            '--db-file',
+            help='Seed into this SQLite file instead of an in-memory database (useful for --size large)'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = self.load_baseline(options['compare']) if options['compare'] else None
+
+        size = options['size']
+        dealers, days = benchmarks.SIZES[size]['dealers'], benchmarks.SIZES[size]['days']
+
+        # The benchmark always runs against a test database that is
+        # created here and destroyed afterwards, never the real one
+        if options['db_file']:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = options['db_file']
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f'Seeding {dealers} dealers over {days} days...')
+            dataset = benchmarks.seed(dealers, days)
+            self.stdout.write(', '.join(f'{count} {name}' for name, count in dataset['rows'].items()))
+            endpoints = benchmarks.run(dataset, options['repeat'])
+        finally:
+            # Write queued audit records (from the login calls) while the
+            # test database still exists
+            audit.writer.shutdown()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {
+            'size': size,
+            'dealers': dealers,
+            'days': days,
+            'repeat': options['repeat'],
+            'rows': dataset['rows'],
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'endpoints': endpoints,
+        }
+
+        output = options['output'] or f'benchmark-{size}.json'
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+        for name, result in endpoints.items():
+            self.stdout.write(
+                f"{name:<24} {result['status']}  cold {result['cold_ms']:>8} ms {result['cold_queries']:>4} queries  "
+                f"warm p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms {result['queries']:>4} queries  "
+                f"{result['per_second']:>8}/s"
+            )
+        self.stdout.write(f'Wrote {output}')
+
+        if baseline is not None:
+            self.check_baseline(results, baseline, options['tolerance'])
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+
+    def check_baseline(self, results, baseline, tolerance):
+        if baseline.get('size') != results['size']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded for size {baseline.get('size')}, not {results['size']}"
+            ))
+
+        regressions = benchmarks.compare(results['endpoints'], baseline, tolerance)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+            return
+        for name, message in regressions:
+            self.stdout.write(self.style.ERROR(f'REGRESSION {name}: {message}'))
+        raise CommandError(f'{len(regressions)} regression(s) against the baseline')
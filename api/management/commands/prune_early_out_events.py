@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from api import events
+
+class Command(BaseCommand):
+    help = 'Delete early-out list events for past queue dates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=events.RETENTION_DAYS,
+            help=f'Keep events for queue dates this many days back (default {events.RETENTION_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        deleted = events.prune(options['days'])
+        self.stdout.write(f'Pruned {deleted} early-out event(s)')
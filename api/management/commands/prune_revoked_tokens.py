@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.revocation import revocations
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token entries whose tokens have expired'
+
+    def handle(self, *args, **options):
+        deleted = revocations.prune()
+        self.stdout.write(f'Pruned {deleted} expired revoked token(s)')
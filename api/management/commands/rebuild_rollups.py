@@ -0,0 +1,58 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from api.models import TokeSignOff, EarlyOutRequest, DealerVacation, DailyRollup
+from api import rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily rollup rows from sign-offs, early outs and vacations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First gaming day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last gaming day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = self.parse_date(options['start'])
+            end = self.parse_date(options['end'])
+        except ValueError:
+            raise CommandError('Invalid date format. Use YYYY-MM-DD')
+
+        if not start or not end:
+            first, last = self.data_range()
+            if first is None:
+                self.stdout.write('No sign-offs, early outs or vacations to roll up')
+                return
+            start = start or first
+            end = end or last
+
+        if end < start:
+            raise CommandError('--end must not be before --start')
+
+        # Drop rows for days that no longer have any data
+        DailyRollup.objects.filter(gaming_day__range=(start, end)).delete()
+
+        count = 0
+        for day in rollups.days_between(start, end):
+            rollups.refresh_day(day)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {count} days ({start} to {end})'))
+
+    def parse_date(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+    def data_range(self):
+        bounds = [
+            TokeSignOff.objects.aggregate(first=Min('shift_date'), last=Max('shift_date')),
+            EarlyOutRequest.objects.aggregate(first=Min('queue_date'), last=Max('queue_date')),
+            DealerVacation.objects.filter(status='APPROVED').aggregate(
+                first=Min('start_date'),
+                last=Max('end_date')
+            ),
+        ]
+        firsts = [b['first'] for b in bounds if b['first']]
+        lasts = [b['last'] for b in bounds if b['last']]
+        if not firsts:
+            return None, None
+        return min(firsts), max(lasts)
@@ -0,0 +1,78 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# PRAGMA auto_vacuum values
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+class Command(BaseCommand):
+    help = 'Refresh SQLite planner statistics, reclaim free pages and checkpoint the WAL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enable-incremental-vacuum',
+            action='store_true',
+            help='Switch the database to auto_vacuum=INCREMENTAL (runs a full VACUUM once)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('sqlite_maintenance only runs against a SQLite database')
+
+        with connection.cursor() as cursor:
+            self.cursor = cursor
+            self.page_size = self.pragma('page_size')
+            self.step('ANALYZE', self.analyze)
+            self.step('Incremental vacuum', lambda: self.vacuum(options['enable_incremental_vacuum']))
+            self.step('WAL checkpoint', self.checkpoint)
+
+    def pragma(self, statement):
+        self.cursor.execute(f'PRAGMA {statement}')
+        return self.cursor.fetchone()[0]
+
+    def step(self, name, run):
+        started = time.monotonic()
+        result = run()
+        elapsed = (time.monotonic() - started) * 1000
+        self.stdout.write(f'{name}: {result} ({elapsed:.0f} ms)')
+
+    def analyze(self):
+        self.cursor.execute('ANALYZE')
+        self.cursor.execute('SELECT COUNT(DISTINCT tbl), COUNT(DISTINCT idx) FROM sqlite_stat1')
+        tables, indexes = self.cursor.fetchone()
+        return f'statistics for {tables} tables and {indexes} indexes'
+
+    def vacuum(self, enable):
+        free_before = self.pragma('freelist_count')
+        mode = AUTO_VACUUM_MODES.get(self.pragma('auto_vacuum'))
+
+        if mode != 'INCREMENTAL':
+            if not enable:
+                return (
+                    f'skipped, auto_vacuum is {mode} with {free_before} free pages '
+                    f'({self.size(free_before)}); rerun with --enable-incremental-vacuum to switch'
+                )
+            # The new mode only takes effect once the file is rebuilt
+            self.cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self.cursor.execute('VACUUM')
+            return f'switched auto_vacuum from {mode} to INCREMENTAL, reclaimed {self.size(free_before)}'
+
+        self.cursor.execute('PRAGMA incremental_vacuum')
+        self.cursor.fetchall()
+        freed = free_before - self.pragma('freelist_count')
+        return f'freed {freed} of {free_before} free pages ({self.size(freed)})'
+
+    def checkpoint(self):
+        journal_mode = self.pragma('journal_mode')
+        if journal_mode.lower() != 'wal':
+            return f'skipped, journal_mode is {journal_mode}'
+
+        # TRUNCATE also shrinks the -wal file back to zero bytes
+        self.cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        busy, wal_pages, checkpointed = self.cursor.fetchone()
+        if busy:
+            return f'incomplete, readers held {wal_pages - checkpointed} of {wal_pages} WAL pages'
+        return f'copied {checkpointed} WAL pages ({self.size(checkpointed)}) into the database'
+
+    def size(self, pages):
+        return f'{pages * self.page_size / 1024:.0f} KiB'
@@ -0,0 +1,94 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+For every request ServerTimingMiddleware calls observe() with the URL
+route name from api/urls.py (e.g. current_toke, early-out-request-authorize
+or rollups-weekly), the method, the status code and the total and
+database time it has already measured. Each (route, method) pair gets a
+latency histogram and a database-time histogram with the fixed buckets
+below, plus a counter per status code. Requests that match no route are
+grouped under "unmatched" so stray paths cannot grow the label set.
+
+The figures live in process memory and start at zero when the process
+does; with several workers each one reports its own.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.db_time = defaultdict(lambda: Histogram(DB_BUCKETS))
+        self.responses = defaultdict(int)
+
+    def observe(self, route, method, status, seconds, db_seconds):
+        key = (route or UNMATCHED_ROUTE, method)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.db_time[key].observe(db_seconds)
+            self.responses[(*key, status)] += 1
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                '# HELP tokebook_request_duration_seconds Time to respond, by route and method.',
+                '# TYPE tokebook_request_duration_seconds histogram',
+            ]
+            for (route, method), histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('tokebook_request_duration_seconds', _labels(route, method)))
+
+            lines += [
+                '# HELP tokebook_request_db_duration_seconds Time spent in database queries per request, by route and method.',
+                '# TYPE tokebook_request_db_duration_seconds histogram',
+            ]
+            for (route, method), histogram in sorted(self.db_time.items()):
+                lines.extend(histogram.lines('tokebook_request_db_duration_seconds', _labels(route, method)))
+
+            lines += [
+                '# HELP tokebook_responses_total Responses sent, by route, method and status code.',
+                '# TYPE tokebook_responses_total counter',
+            ]
+            for (route, method, status), count in sorted(self.responses.items()):
+                lines.append(f'tokebook_responses_total{{{_labels(route, method)},status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(route, method):
+    return f'route="{route}",method="{method}"'
+
+
+registry = Registry()
+
+
+def observe(route, method, status, seconds, db_seconds):
+    registry.observe(route, method, status, seconds, db_seconds)
@@ -1,7 +1,71 @@
+import logging
+import time
+from django.conf import settings
+from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
-from django.contrib.contenttypes.models import ContentType
 from django.http import HttpResponse
-from .models import AuditLog
+from . import audit, metrics, timing
+from .log import get_logger
+
+timing_log = get_logger('api.timing')
+
+# Requests making more queries than this are flagged; None disables the check
+QUERY_BUDGET = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+
+class ServerTimingMiddleware:
+    """
+    Reports where each request's time went in a Server-Timing header and a
+    log line: total, view, database (with the query count), authentication
+    and serialization. Phases overlap, e.g. queries run while serializing
+    count towards both. Requests over REQUEST_QUERY_BUDGET queries are
+    logged as warnings and marked in the header. The total and database
+    times also feed the per-route histograms in api/metrics.py.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        timings.durations['total'] = time.perf_counter() - started
+        if hasattr(request, '_view_started'):
+            timings.durations['view'] = time.perf_counter() - request._view_started
+
+        response['Server-Timing'] = timings.header(QUERY_BUDGET)
+
+        match = getattr(request, 'resolver_match', None)
+        metrics.observe(
+            match.url_name if match else None,
+            request.method,
+            response.status_code,
+            timings.durations['total'],
+            timings.durations.get('db', 0.0)
+        )
+
+        over_budget = QUERY_BUDGET and timings.query_count > QUERY_BUDGET
+        level = logging.WARNING if over_budget else logging.INFO
+        if timing_log.is_enabled_for(level):
+            phases = {f'{name}_ms': round(ms, 1) for name, ms in timings.milliseconds().items()}
+            phases.setdefault('db_ms', 0.0)
+            timing_log.log(
+                level,
+                'request_over_query_budget' if over_budget else 'request_timing',
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+                queries=timings.query_count,
+                query_budget=QUERY_BUDGET,
+                **phases
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
 
 class AuditLogMiddleware(MiddlewareMixin):
     def process_request(self, request):
@@ -19,18 +83,18 @@ class AuditLogMiddleware(MiddlewareMixin):
         
         # Only log if user is authenticated or it's a login attempt
         if request.user.is_authenticated or is_login_attempt:
-            try:
-                AuditLog.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    action=request.audit_log_action,
-                    ip_address=request.audit_data.get('ip_address'),
-                    content_type=getattr(request, 'audit_log_content_type', None),
-                    object_id=getattr(request, 'audit_log_object_id', None),
-                    details=getattr(request, 'audit_log_details', {}),
-                    casino=request.user.casino if request.user.is_authenticated else None
-                )
-            except Exception as e:
-                print(f"Error creating audit log: {str(e)}")
+            # Queued for the background writer in api/audit.py, so the
+            # INSERT stays off the response path
+            user = request.user if request.user.is_authenticated else None
+            audit.record(
+                user_id=user.pk if user else None,
+                action=request.audit_log_action,
+                model_name=getattr(request, 'audit_log_model_name', 'unknown'),
+                record_id=getattr(request, 'audit_log_record_id', None),
+                changes=getattr(request, 'audit_log_details', {}),
+                ip_address=request.audit_data.get('ip_address'),
+                casino_id=user.casino_id if user else None
+            )
         
         return response
 
@@ -43,17 +107,20 @@ class AuditLogMiddleware(MiddlewareMixin):
 def log_action(action, content_object=None, details=None):
     def decorator(view_func):
         def wrapped_view(request, *args, **kwargs):
-            request.audit_log_action = action
+            # DRF views get a Request wrapper; the middleware only sees the
+            # underlying HttpRequest, so the audit attributes go there
+            http_request = getattr(request, '_request', request)
+            http_request.audit_log_action = action
             if content_object:
-                request.audit_log_content_type = ContentType.objects.get_for_model(content_object)
-                request.audit_log_object_id = content_object.id
-            
+                http_request.audit_log_model_name = content_object._meta.model_name
+                http_request.audit_log_record_id = str(content_object.pk)
+
             # Handle details as a function or static value
             if callable(details):
-                request.audit_log_details = details(request)
+                http_request.audit_log_details = details(request)
             else:
-                request.audit_log_details = details or {}
-                
+                http_request.audit_log_details = dict(details or {})
+
             return view_func(request, *args, **kwargs)
         return wrapped_view
     return decorator
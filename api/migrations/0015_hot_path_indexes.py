@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_tokes_is_collection_day'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dealervacation',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='vacation_status_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokes',
+            index=models.Index(fields=['date'], name='tokes_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokesignoff',
+            index=models.Index(fields=['shift_date'], name='signoff_shift_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokesignoff',
+            index=models.Index(fields=['user', '-shift_date'], name='signoff_user_shift_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:11
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tokes',
+            name='pool_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total toke pool posted for this day', max_digits=12, null=True),
+        ),
+        migrations.CreateModel(
+            name='TokePayout',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hours', models.DecimalField(decimal_places=2, help_text='Hours the payout was calculated from', max_digits=5)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Exact share of the pool paid to the dealer', max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sign_off', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payout', to='api.tokesignoff')),
+                ('toke', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='api.tokes')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='toke_payouts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='payout_user_created_idx')],
+            },
+        ),
+    ]
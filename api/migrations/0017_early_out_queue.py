@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:12
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_queue_fields(apps, schema_editor):
+    EarlyOutRequest = apps.get_model('api', 'EarlyOutRequest')
+    next_position = {}
+    requests = EarlyOutRequest.objects.select_related('user').order_by('requested_at')
+    for early_out in requests:
+        early_out.casino = early_out.user.casino
+        early_out.queue_date = timezone.localtime(early_out.requested_at).date()
+        early_out.shift = early_out.user.shift
+        early_out.list_type = 'supervisor' if early_out.user.role == 'SUPERVISOR' else 'dealer'
+        if early_out.status == 'PENDING':
+            key = (early_out.casino, early_out.queue_date, early_out.shift, early_out.list_type)
+            next_position[key] = next_position.get(key, 0) + 1
+            early_out.position = next_position[key]
+        early_out.save(update_fields=['casino', 'queue_date', 'shift', 'list_type', 'position'])
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_toke_payouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='casino',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='list_type',
+            field=models.CharField(choices=[('dealer', 'Dealer'), ('supervisor', 'Supervisor')], default='dealer', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, help_text='1-based place in the waiting line while pending', null=True),
+        ),
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='queue_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='shift',
+            field=models.IntegerField(blank=True, choices=[(1, 'Day'), (2, 'Swing'), (3, 'Grave')], null=True),
+        ),
+        migrations.AddIndex(
+            model_name='earlyoutrequest',
+            index=models.Index(fields=['casino', 'queue_date', 'shift', 'list_type', 'position'], name='early_out_queue_idx'),
+        ),
+        migrations.RunPython(backfill_queue_fields, noop),
+    ]
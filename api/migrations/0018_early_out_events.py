@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:13
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_early_out_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarlyOutEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('casino', models.CharField(blank=True, max_length=100, null=True)),
+                ('queue_date', models.DateField()),
+                ('shift', models.IntegerField(blank=True, null=True)),
+                ('list_type', models.CharField(choices=[('dealer', 'Dealer'), ('supervisor', 'Supervisor')], max_length=10)),
+                ('kind', models.CharField(choices=[('add', 'Added'), ('remove', 'Removed'), ('authorize', 'Authorized')], max_length=10)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['casino', 'queue_date', 'shift', 'list_type', 'id'], name='early_out_event_queue_idx')],
+            },
+        ),
+    ]
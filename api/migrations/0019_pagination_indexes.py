@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_early_out_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dealervacation',
+            index=models.Index(fields=['-start_date'], name='vacation_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discrepancy',
+            index=models.Index(fields=['-reported_at'], name='discrepancy_reported_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokesignoff',
+            index=models.Index(fields=['-created_at'], name='signoff_created_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('casino', models.CharField(blank=True, default='', max_length=100)),
+                ('gaming_day', models.DateField()),
+                ('shift', models.IntegerField(default=0)),
+                ('scheduled_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('actual_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('dealer_count', models.IntegerField(default=0)),
+                ('early_out_count', models.IntegerField(default=0)),
+                ('vacation_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-gaming_day', 'shift'],
+                'indexes': [models.Index(fields=['gaming_day'], name='daily_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('casino', 'gaming_day', 'shift'), name='daily_rollup_bucket_unique')],
+            },
+        ),
+    ]
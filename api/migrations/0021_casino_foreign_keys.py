@@ -0,0 +1,295 @@
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+# Models whose free-text casino column becomes a foreign key
+NAMED_CASINO_MODELS = ('User', 'EarlyOutRequest', 'EarlyOutEvent', 'AuditLog', 'DailyRollup')
+
+CENT = Decimal('0.01')
+
+
+def _to_cents(value):
+    return int((Decimal(value) / CENT).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def allocate(pool_amount, hours):
+    """
+    Split pool_amount across (key, hours) pairs by largest remainder, ties
+    broken by str(key). A frozen copy of api.payouts.allocate as it was
+    when this migration was written, so later changes there cannot alter it.
+    """
+    pool_cents = _to_cents(pool_amount)
+    weights = [(key, _to_cents(h)) for key, h in hours]
+    total = sum(weight for _, weight in weights)
+    if total <= 0:
+        raise ValueError('No valid hours found for rate calculation')
+
+    shares = {}
+    remainders = []
+    for key, weight in weights:
+        cents, remainder = divmod(pool_cents * weight, total)
+        shares[key] = cents
+        remainders.append((-remainder, str(key), key))
+
+    leftover = pool_cents - sum(shares.values())
+    for _, _, key in sorted(remainders)[:leftover]:
+        shares[key] += 1
+
+    return {key: Decimal(cents) * CENT for key, cents in shares.items()}
+
+
+def link_casinos(apps, schema_editor):
+    Casino = apps.get_model('api', 'Casino')
+    models_with_names = [apps.get_model('api', name) for name in NAMED_CASINO_MODELS]
+
+    # Every casino name in use gets a Casino row, so no assignment is lost
+    casino_ids = dict(Casino.objects.values_list('name', 'id'))
+    for model in models_with_names:
+        names = model.objects.exclude(casino__isnull=True).exclude(casino='').values_list('casino', flat=True).distinct()
+        for name in names:
+            if name not in casino_ids:
+                casino_ids[name] = Casino.objects.create(name=name).id
+
+    for model in models_with_names:
+        for name, casino_id in casino_ids.items():
+            model.objects.filter(casino=name).update(casino_ref_id=casino_id)
+
+    # Rollups are derived data; rows with no casino are dropped (rebuild_rollups recreates the rest)
+    apps.get_model('api', 'DailyRollup').objects.filter(casino_ref__isnull=True).delete()
+
+    # Discrepancies belong to the reporter's casino
+    User = apps.get_model('api', 'User')
+    apps.get_model('api', 'Discrepancy').objects.update(
+        casino_id=Subquery(User.objects.filter(pk=OuterRef('reported_by_id')).values('casino_ref_id')[:1])
+    )
+
+    _split_shared_tokes(apps, casino_ids)
+
+
+def _split_shared_tokes(apps, casino_ids):
+    """
+    Tokes were shared by every casino. Each toke becomes one toke per
+    casino whose dealers signed onto it, and every sign-off moves to the
+    toke of its dealer's casino. The original row goes to the casino with
+    the most sign-offs, which also keeps sign-offs from users with no
+    casino. A posted pool is split between the new tokes by hours, and
+    existing payouts are recomputed per toke. A toke nobody signed onto
+    is copied to every casino.
+    """
+    Tokes = apps.get_model('api', 'Tokes')
+    TokeSignOff = apps.get_model('api', 'TokeSignOff')
+    TokePayout = apps.get_model('api', 'TokePayout')
+    names = {casino_id: name for name, casino_id in casino_ids.items()}
+    all_casinos = sorted(names, key=names.get)
+    if not all_casinos:
+        return
+
+    for toke in Tokes.objects.filter(casino__isnull=True):
+        sign_offs = list(
+            TokeSignOff.objects.filter(toke=toke).values_list('id', 'user_id', 'user__casino_ref_id', 'actual_hours')
+        )
+        counts = Counter(casino_id for _, _, casino_id, _ in sign_offs if casino_id)
+        if counts:
+            owners = sorted(counts, key=lambda casino_id: (-counts[casino_id], names[casino_id]))
+        else:
+            owners = all_casinos
+
+        toke.casino_id = owners[0]
+        toke.save(update_fields=['casino'])
+        tokes_by_casino = {owners[0]: toke}
+        for casino_id in owners[1:]:
+            tokes_by_casino[casino_id] = Tokes.objects.create(
+                casino_id=casino_id,
+                date=toke.date,
+                finalized=toke.finalized,
+                is_collection_day=toke.is_collection_day,
+                per_hour_rate=toke.per_hour_rate if not sign_offs else None
+            )
+            TokeSignOff.objects.filter(toke=toke, user__casino_ref_id=casino_id).update(
+                toke=tokes_by_casino[casino_id]
+            )
+
+        if len(tokes_by_casino) > 1 and sign_offs and toke.pool_amount is not None:
+            _split_pool(Tokes, TokePayout, toke, tokes_by_casino, sign_offs)
+
+
+def _split_pool(Tokes, TokePayout, toke, tokes_by_casino, sign_offs):
+    had_payouts = TokePayout.objects.filter(toke=toke).exists()
+    TokePayout.objects.filter(toke=toke).delete()
+
+    owner = toke.casino_id
+    paid = {}  # casino id -> [(sign-off id, user id, hours)]
+    for pk, user_id, casino_id, hours in sign_offs:
+        if hours and hours > 0:
+            paid.setdefault(casino_id if casino_id in tokes_by_casino else owner, []).append((pk, user_id, hours))
+    if not paid:
+        return
+
+    pools = allocate(
+        toke.pool_amount,
+        [(casino_id, sum(hours for _, _, hours in rows)) for casino_id, rows in paid.items()]
+    )
+    for casino_id, casino_toke in tokes_by_casino.items():
+        rows = paid.get(casino_id)
+        if not rows:
+            Tokes.objects.filter(pk=casino_toke.pk).update(pool_amount=None, per_hour_rate=None)
+            continue
+        pool = pools[casino_id]
+        total_hours = sum(hours for _, _, hours in rows)
+        Tokes.objects.filter(pk=casino_toke.pk).update(
+            pool_amount=pool,
+            per_hour_rate=(pool / total_hours).quantize(CENT, rounding=ROUND_HALF_UP)
+        )
+        if had_payouts:
+            amounts = allocate(pool, [(pk, hours) for pk, _, hours in rows])
+            TokePayout.objects.bulk_create([
+                TokePayout(toke=casino_toke, sign_off_id=pk, user_id=user_id, hours=hours, amount=amounts[pk])
+                for pk, user_id, hours in rows
+            ])
+
+
+def unlink_casinos(apps, schema_editor):
+    # Tokes split per casino going forwards stay separate rows going back
+    Casino = apps.get_model('api', 'Casino')
+    for name in NAMED_CASINO_MODELS:
+        apps.get_model('api', name).objects.update(
+            casino=Subquery(Casino.objects.filter(pk=OuterRef('casino_ref_id')).values('name')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='earlyoutrequest',
+            name='early_out_queue_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='earlyoutevent',
+            name='early_out_event_queue_idx',
+        ),
+        migrations.RemoveConstraint(
+            model_name='dailyrollup',
+            name='daily_rollup_bucket_unique',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='casino_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='earlyoutrequest',
+            name='casino_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='early_out_requests', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='earlyoutevent',
+            name='casino_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='early_out_events', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='casino_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_logs', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='casino_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='tokes',
+            name='casino',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tokes', to='api.casino'),
+        ),
+        migrations.AddField(
+            model_name='discrepancy',
+            name='casino',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='discrepancies', to='api.casino'),
+        ),
+        migrations.RunPython(link_casinos, unlink_casinos),
+        migrations.RemoveField(
+            model_name='user',
+            name='casino',
+        ),
+        migrations.RemoveField(
+            model_name='earlyoutrequest',
+            name='casino',
+        ),
+        migrations.RemoveField(
+            model_name='earlyoutevent',
+            name='casino',
+        ),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='casino',
+        ),
+        migrations.RemoveField(
+            model_name='dailyrollup',
+            name='casino',
+        ),
+        migrations.RenameField(
+            model_name='user',
+            old_name='casino_ref',
+            new_name='casino',
+        ),
+        migrations.RenameField(
+            model_name='earlyoutrequest',
+            old_name='casino_ref',
+            new_name='casino',
+        ),
+        migrations.RenameField(
+            model_name='earlyoutevent',
+            old_name='casino_ref',
+            new_name='casino',
+        ),
+        migrations.RenameField(
+            model_name='auditlog',
+            old_name='casino_ref',
+            new_name='casino',
+        ),
+        migrations.RenameField(
+            model_name='dailyrollup',
+            old_name='casino_ref',
+            new_name='casino',
+        ),
+        migrations.AlterField(
+            model_name='dailyrollup',
+            name='casino',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.casino'),
+        ),
+        migrations.AddIndex(
+            model_name='earlyoutrequest',
+            index=models.Index(fields=['casino', 'queue_date', 'shift', 'list_type', 'position'], name='early_out_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='earlyoutevent',
+            index=models.Index(fields=['casino', 'queue_date', 'shift', 'list_type', 'id'], name='early_out_event_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(fields=('casino', 'gaming_day', 'shift'), name='daily_rollup_bucket_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['casino', 'role'], name='user_casino_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokes',
+            index=models.Index(fields=['casino', '-date'], name='tokes_casino_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='discrepancy',
+            index=models.Index(fields=['casino', '-reported_at'], name='discrepancy_casino_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['casino', '-timestamp'], name='audit_casino_time_idx'),
+        ),
+    ]
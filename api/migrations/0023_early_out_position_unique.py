@@ -0,0 +1,43 @@
+from itertools import groupby
+from django.db import migrations, models
+
+
+def renumber_queues(apps, schema_editor):
+    """
+    Give every waiting request a distinct place: 1..n per queue, keeping the
+    current order and breaking ties by when the request was made.
+    """
+    EarlyOutRequest = apps.get_model('api', 'EarlyOutRequest')
+    waiting = EarlyOutRequest.objects.filter(position__isnull=False).order_by(
+        'casino_id', 'queue_date', 'shift', 'list_type', 'position', 'requested_at', 'id'
+    ).only('id', 'casino_id', 'queue_date', 'shift', 'list_type', 'position')
+
+    def queue(early_out):
+        return (early_out.casino_id, early_out.queue_date, early_out.shift, early_out.list_type)
+
+    changed = []
+    for _, requests in groupby(waiting.iterator(), key=queue):
+        for position, early_out in enumerate(requests, start=1):
+            if early_out.position != position:
+                early_out.position = position
+                changed.append(early_out)
+    EarlyOutRequest.objects.bulk_update(changed, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_revoked_tokens'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_queues, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='earlyoutrequest',
+            name='early_out_queue_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='earlyoutrequest',
+            constraint=models.UniqueConstraint(fields=('casino', 'queue_date', 'shift', 'list_type', 'position'), name='early_out_queue_position_unique'),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
-import uuid
 from django.utils import timezone
+import uuid
+from .shifts import ShiftCalendar
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -16,7 +18,13 @@ class User(AbstractUser):
 
     employee_id = models.CharField(max_length=10, unique=True, null=True, blank=True)  # 800 number
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='DEALER')
-    casino = models.CharField(max_length=100, null=True, blank=True)  # Keep as CharField to match initial migration
+    casino = models.ForeignKey(
+        'Casino',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='users'
+    )
     has_pencil_flag = models.BooleanField(default=False)
     pencil_id = models.CharField(max_length=10, unique=True, null=True, blank=True)
     shift = models.IntegerField(
@@ -36,6 +44,9 @@ class User(AbstractUser):
 
     class Meta:
         db_table = 'auth_user'
+        indexes = [
+            models.Index(fields=['casino', 'role'], name='user_casino_role_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # If user is a casino manager, ensure they have pencil flag and ID
@@ -79,31 +90,7 @@ class Casino(models.Model):
         Determines the current shift based on casino's shift configuration
         Returns: 'day', 'swing', or 'grave'
         """
-        def time_to_minutes(t):
-            return t.hour * 60 + t.minute
-
-        current_time = timezone.localtime().time()
-        current_minutes = time_to_minutes(current_time)
-        
-        # Convert all shift times to minutes
-        grave_start = time_to_minutes(self.grave_start)  # 90 (1:30 AM)
-        grave_end = time_to_minutes(self.grave_end)      # 570 (9:30 AM)
-        day_start = time_to_minutes(self.day_start)      # 570 (9:30 AM)
-        day_end = time_to_minutes(self.day_end)          # 1050 (5:30 PM)
-        swing_start = time_to_minutes(self.swing_start)   # 1050 (5:30 PM)
-        swing_end = time_to_minutes(self.swing_end)       # 90 (1:30 AM)
-
-        # Day shift: 9:30 AM (570) to 5:30 PM (1050)
-        if day_start <= current_minutes < day_end:
-            return 'day'
-            
-        # Grave shift: 1:30 AM (90) to 9:30 AM (570)
-        if grave_start <= current_minutes < grave_end:
-            return 'grave'
-            
-        # Swing shift: 5:30 PM (1050) to 1:30 AM (90)
-        # If we're not in day or grave shift, we must be in swing shift
-        return 'swing'
+        return ShiftCalendar.for_casino(self).shift_name()
 
     class Meta:
         ordering = ['name']
@@ -113,9 +100,17 @@ class Casino(models.Model):
 
 class Tokes(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    casino = models.ForeignKey(Casino, null=True, blank=True, on_delete=models.PROTECT, related_name='tokes')
     date = models.DateField()
     finalized = models.BooleanField(default=False)
     is_collection_day = models.BooleanField(default=True, help_text='True if this is a collection day, False if distribution day')
+    pool_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text='Total toke pool posted for this day'
+    )
     per_hour_rate = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -128,10 +123,30 @@ class Tokes(models.Model):
     class Meta:
         ordering = ['-date']
         verbose_name_plural = 'Tokes'
+        indexes = [
+            models.Index(fields=['date'], name='tokes_date_idx'),
+            models.Index(fields=['casino', '-date'], name='tokes_casino_date_idx'),
+        ]
 
     def __str__(self):
         return f"Tokes for {self.date}"
 
+class TokeSignOffQuerySet(models.QuerySet):
+    """Hot-path lookups, kept here so the query-plan tests cover what the views run."""
+
+    def for_day(self, day):
+        return self.filter(shift_date=day)
+
+    def for_casino_day(self, casino_id, day):
+        """Sign-offs on a casino's toke for a gaming day."""
+        return self.for_day(day).filter(toke__casino_id=casino_id)
+
+    def for_toke_user(self, toke, user):
+        return self.filter(toke=toke, user=user)
+
+    def latest_for_user(self, user):
+        return self.filter(user=user).order_by('-shift_date')
+
 class TokeSignOff(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -170,6 +185,8 @@ class TokeSignOff(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TokeSignOffQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         # When first created, set actual_hours to scheduled_hours
         if not self.pk:  # New instance
@@ -183,10 +200,50 @@ class TokeSignOff(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'toke']
+        indexes = [
+            models.Index(fields=['shift_date'], name='signoff_shift_date_idx'),
+            models.Index(fields=['user', '-shift_date'], name='signoff_user_shift_date_idx'),
+            models.Index(fields=['-created_at'], name='signoff_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.toke.date}"
 
+class TokePayout(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    toke = models.ForeignKey(Tokes, on_delete=models.CASCADE, related_name='payouts')
+    sign_off = models.OneToOneField(TokeSignOff, on_delete=models.CASCADE, related_name='payout')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='toke_payouts')
+    hours = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        help_text='Hours the payout was calculated from'
+    )
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text='Exact share of the pool paid to the dealer'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='payout_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.get_full_name()} - {self.amount}"
+
+class DealerVacationQuerySet(models.QuerySet):
+    def covering(self, day, status='APPROVED'):
+        """Vacations with the given status that include the given day."""
+        return self.filter(status=status, start_date__lte=day, end_date__gte=day)
+
+    def overlapping(self, start_date, end_date):
+        """Vacations that include at least one day from start_date to end_date."""
+        return self.filter(start_date__lte=end_date, end_date__gte=start_date)
+
 class DealerVacation(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -215,8 +272,14 @@ class DealerVacation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DealerVacationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-start_date', '-end_date']
+        indexes = [
+            models.Index(fields=['status', 'start_date', 'end_date'], name='vacation_status_range_idx'),
+            models.Index(fields=['-start_date'], name='vacation_start_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.start_date} - {self.end_date}) - {self.status}"
@@ -241,6 +304,11 @@ class EarlyOutRequest(models.Model):
         ('ADA', 'ADA'),
     ]
 
+    LIST_TYPE_CHOICES = [
+        ('dealer', 'Dealer'),
+        ('supervisor', 'Supervisor'),
+    ]
+
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='early_out_requests')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
@@ -264,12 +332,95 @@ class EarlyOutRequest(models.Model):
     table_number = models.CharField(max_length=10, null=True, blank=True)
     toke_sign_off = models.ForeignKey(TokeSignOff, null=True, blank=True, on_delete=models.SET_NULL)
 
+    # Queue placement, see api/early_out_queue.py
+    casino = models.ForeignKey(Casino, null=True, blank=True, on_delete=models.SET_NULL, related_name='early_out_requests')
+    queue_date = models.DateField(null=True, blank=True)
+    shift = models.IntegerField(
+        choices=[(1, 'Day'), (2, 'Swing'), (3, 'Grave')],
+        null=True,
+        blank=True
+    )
+    list_type = models.CharField(max_length=10, choices=LIST_TYPE_CHOICES, default='dealer')
+    position = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='1-based place in the waiting line while pending'
+    )
+
     class Meta:
         ordering = ['-requested_at']
+        constraints = [
+            # No two waiting requests share a place in line; the unique
+            # index also serves the queue's range reads
+            models.UniqueConstraint(
+                fields=['casino', 'queue_date', 'shift', 'list_type', 'position'],
+                name='early_out_queue_position_unique'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.requested_at.date()}"
 
+class EarlyOutEvent(models.Model):
+    """Append-only log of early-out list changes, replayed by the event stream."""
+    KIND_CHOICES = [
+        ('add', 'Added'),
+        ('remove', 'Removed'),
+        ('authorize', 'Authorized'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    casino = models.ForeignKey(Casino, null=True, blank=True, on_delete=models.SET_NULL, related_name='early_out_events')
+    queue_date = models.DateField()
+    shift = models.IntegerField(null=True, blank=True)
+    list_type = models.CharField(max_length=10, choices=EarlyOutRequest.LIST_TYPE_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['casino', 'queue_date', 'shift', 'list_type', 'id'],
+                name='early_out_event_queue_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.list_type}, {self.queue_date})"
+
+class DailyRollup(models.Model):
+    """
+    Per casino, gaming day and shift totals, kept current by api/rollups.py.
+    Dealers with no shift assigned are counted under shift 0.
+    """
+    id = models.BigAutoField(primary_key=True)
+    casino = models.ForeignKey(Casino, on_delete=models.CASCADE, related_name='daily_rollups')
+    gaming_day = models.DateField()
+    shift = models.IntegerField(default=0)
+    scheduled_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    actual_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    dealer_count = models.IntegerField(default=0)
+    early_out_count = models.IntegerField(default=0)
+    vacation_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-gaming_day', 'shift']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['casino', 'gaming_day', 'shift'],
+                name='daily_rollup_bucket_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['gaming_day'], name='daily_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.casino} {self.gaming_day} shift {self.shift}"
+
 class Discrepancy(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -283,6 +434,7 @@ class Discrepancy(models.Model):
         on_delete=models.CASCADE,
         related_name='reported_discrepancies'
     )
+    casino = models.ForeignKey(Casino, null=True, blank=True, on_delete=models.SET_NULL, related_name='discrepancies')
     description = models.TextField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     reported_at = models.DateTimeField(auto_now_add=True)
@@ -310,6 +462,10 @@ class Discrepancy(models.Model):
     class Meta:
         ordering = ['-reported_at']
         verbose_name_plural = 'Discrepancies'
+        indexes = [
+            models.Index(fields=['-reported_at'], name='discrepancy_reported_idx'),
+            models.Index(fields=['casino', '-reported_at'], name='discrepancy_casino_idx'),
+        ]
 
     def __str__(self):
         return f"Discrepancy {self.id} - {self.status}"
@@ -328,11 +484,28 @@ class AuditLog(models.Model):
     record_id = models.CharField(max_length=50, null=True, blank=True)
     changes = models.JSONField(default=dict)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    casino = models.CharField(max_length=100, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    casino = models.ForeignKey(Casino, null=True, blank=True, on_delete=models.SET_NULL, related_name='audit_logs')
+    # Set when the change is recorded, not when the buffered row is written
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['casino', '-timestamp'], name='audit_casino_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name() if self.user else 'System'} - {self.action} {self.model_name} {self.record_id}"
+
+class RevokedToken(models.Model):
+    """
+    A JWT that must no longer be accepted, keyed by its jti. Rows can be
+    pruned once the token has expired; see api/revocation.py.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name='revoked_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Revoked {self.jti}"
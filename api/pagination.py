@@ -0,0 +1,44 @@
+"""
+Cursor pagination for the list endpoints.
+
+Each class pages on the model's natural ordering, so a page is an indexed
+range read that starts where the previous page ended. There is no
+COUNT(*), and a deep page costs the same as the first one. The cursor
+records the first ordering field's value plus how many rows sharing it
+were already returned, so every ordering ends on the primary key to keep
+tied rows in the same order from one page to the next.
+Clients can ask for a different page size with ?page_size=, up to
+max_page_size.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class TokesPagination(BaseCursorPagination):
+    ordering = ('-date', '-id')
+
+
+class TokeSignOffPagination(BaseCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class DiscrepancyPagination(BaseCursorPagination):
+    ordering = ('-reported_at', '-id')
+
+
+class DealerVacationPagination(BaseCursorPagination):
+    ordering = ('-start_date', '-id')
+
+
+class DailyRollupPagination(BaseCursorPagination):
+    # Unique within the one casino the rollup list is scoped to
+    ordering = ('-gaming_day', 'shift')
+
+
+class UserPagination(BaseCursorPagination):
+    ordering = 'id'
@@ -0,0 +1,92 @@
+"""
+Toke payout engine.
+
+Splits a posted pool between the day's sign-offs in proportion to their
+hours, using exact integer cent arithmetic. Rounding remainders go to the
+largest fractional shares, with ties broken by sign-off id, so the same
+inputs always give the same payouts and the amounts always add up to the
+pool.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.utils import timezone
+from .models import Tokes, TokeSignOff, TokePayout
+
+CENT = Decimal('0.01')
+
+
+class PayoutError(ValueError):
+    pass
+
+
+def _to_cents(value):
+    return int((Decimal(value) / CENT).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def allocate(pool_amount, hours):
+    """
+    Split pool_amount across hours, a list of (key, hours) pairs.
+    Returns {key: Decimal amount}; the amounts sum exactly to the pool.
+    """
+    pool_cents = _to_cents(pool_amount)
+    weights = [(key, _to_cents(h)) for key, h in hours]
+    total = sum(weight for _, weight in weights)
+    if total <= 0:
+        raise PayoutError('No valid hours found for rate calculation')
+
+    shares = {}
+    remainders = []
+    for key, weight in weights:
+        cents, remainder = divmod(pool_cents * weight, total)
+        shares[key] = cents
+        remainders.append((-remainder, str(key), key))
+
+    # Hand out the cents lost to flooring, largest remainder first
+    leftover = pool_cents - sum(shares.values())
+    for _, _, key in sorted(remainders)[:leftover]:
+        shares[key] += 1
+
+    return {key: Decimal(cents) * CENT for key, cents in shares.items()}
+
+
+def write_payouts(toke, pool_amount):
+    """
+    Recalculate and store the payouts for a toke from its sign-offs' actual
+    hours. Returns the per-hour rate (rounded to cents, for display only).
+    """
+    pool_amount = Decimal(pool_amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    with transaction.atomic():
+        sign_offs = list(
+            TokeSignOff.objects.filter(
+                toke=toke,
+                actual_hours__gt=0
+            ).values_list('id', 'user_id', 'actual_hours')
+        )
+        amounts = allocate(pool_amount, [(pk, hours) for pk, _, hours in sign_offs])
+        total_hours = sum(hours for _, _, hours in sign_offs)
+        per_hour_rate = (pool_amount / total_hours).quantize(CENT, rounding=ROUND_HALF_UP)
+
+        TokePayout.objects.filter(toke=toke).delete()
+        TokePayout.objects.bulk_create(
+            [
+                TokePayout(
+                    toke=toke,
+                    sign_off_id=pk,
+                    user_id=user_id,
+                    hours=hours,
+                    amount=amounts[pk]
+                )
+                for pk, user_id, hours in sign_offs
+            ],
+            batch_size=500
+        )
+        Tokes.objects.filter(pk=toke.pk).update(
+            pool_amount=pool_amount,
+            per_hour_rate=per_hour_rate,
+            updated_at=timezone.now()
+        )
+
+    toke.pool_amount = pool_amount
+    toke.per_hour_rate = per_hour_rate
+    return per_hour_rate
@@ -0,0 +1,41 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets text/event-stream requests through content negotiation. Streaming
+    views return their own StreamingHttpResponse; this only renders error
+    responses, as a single JSON data line.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"data: {json.dumps(data)}\n\n".encode(self.charset)
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Lets export formats through content negotiation. Export views stream
+    their own response; this only renders error responses, as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
+
+
+class NDJSONRenderer(PassthroughRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
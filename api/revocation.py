@@ -0,0 +1,137 @@
+"""
+Revoked JWTs.
+
+RevokedToken rows, keyed by the token's jti with a unique index, are the
+source of truth. Every worker also keeps a Bloom filter of the revoked
+jtis in memory, so checking a token that was never revoked (nearly all
+of them) is a few bit tests and never touches the database. Only when the
+filter says "maybe" is the row looked up, which also rules out the
+filter's false positives (REVOCATION_BLOOM_ERROR_RATE of them).
+
+Workers learn about each other's revocations through two cache keys: the
+generation changes on every revocation, and the worker then loads the
+rows added since its last sync; the epoch changes when rows are pruned,
+and the worker rebuilds its filter from scratch, since a Bloom filter
+cannot forget entries. With the default per-process cache each worker
+only sees its own revocations, so multi-worker deployments need the
+shared cache backend described in settings.
+
+Rows whose token has expired are deleted by the prune_revoked_tokens
+command, which keeps the table (and the filter) the size of the tokens
+that are still live. That is safe because simplejwt rejects expired
+tokens on its own, even with VERIFY_EXP off.
+"""
+import hashlib
+import math
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .models import RevokedToken
+
+BLOOM_CAPACITY = getattr(settings, 'REVOCATION_BLOOM_CAPACITY', 100000)
+BLOOM_ERROR_RATE = getattr(settings, 'REVOCATION_BLOOM_ERROR_RATE', 0.001)
+
+GENERATION_KEY = 'revocation:generation'
+EPOCH_KEY = 'revocation:epoch'
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._filter = None
+        self._state = None  # (epoch, generation) the filter was synced at
+        self._last_id = 0
+
+    def revoke(self, token, user_id=None):
+        """
+        Revoke a simplejwt token until it expires. Returns False if it was
+        already revoked.
+        """
+        jti = token['jti']
+        _, created = RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'user_id': user_id, 'expires_at': datetime_from_epoch(token['exp'])}
+        )
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+        return created
+
+    def is_revoked(self, jti):
+        self._sync()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def prune(self):
+        """Delete rows for tokens that have expired. Returns how many."""
+        deleted, _ = RevokedToken.objects.filter(expires_at__lt=timezone.now()).delete()
+        if deleted:
+            cache.set(EPOCH_KEY, uuid.uuid4().hex, None)
+        return deleted
+
+    def _sync(self):
+        # Read the state before the rows, so a revocation that lands in
+        # between changes the generation again and is picked up next time
+        values = cache.get_many([EPOCH_KEY, GENERATION_KEY])
+        state = (values.get(EPOCH_KEY), values.get(GENERATION_KEY))
+        if self._filter is not None and state == self._state:
+            return
+
+        with self._lock:
+            if self._filter is not None and state == self._state:
+                return
+            if self._filter is None or state[0] != self._state[0]:
+                self._rebuild()
+            else:
+                for row_id, jti in RevokedToken.objects.filter(id__gt=self._last_id).values_list('id', 'jti'):
+                    self._filter.add(jti)
+                    self._last_id = max(self._last_id, row_id)
+            self._state = state
+
+    def _rebuild(self):
+        rows = list(RevokedToken.objects.values_list('id', 'jti'))
+        # Leave room to grow so the false positive rate holds until the next prune
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for _, jti in rows:
+            bloom.add(jti)
+        self._filter = bloom
+        self._last_id = max((row_id for row_id, _ in rows), default=0)
+
+
+revocations = RevocationList()
+
+
+def revoke(token, user_id=None):
+    return revocations.revoke(token, user_id)
+
+
+def is_revoked(jti):
+    return revocations.is_revoked(jti)
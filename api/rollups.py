@@ -0,0 +1,221 @@
+"""
+Daily rollups of sign-off hours, dealer, early-out and vacation counts.
+
+Only the rows a change can affect are recomputed. A sign-off refreshes
+its toke's casino and its dealer's shift on that gaming day, and an
+early-out refreshes its queue's casino on the queue date (every shift,
+since a request can move between shifts). Each of those is three grouped
+queries over the one bucket's rows plus a single upsert. A vacation only
+moves vacation counts, so its dealer's bucket gets one query over the
+vacations overlapping its dates and one upsert of vacation_count for every
+day covered, however long it is. Weekly and monthly figures are sums over
+at most 31 days of rollup rows per shift, so reports never touch the raw
+tables.
+
+Sign-offs are counted under their toke's casino, early-outs under their
+queue's casino and vacations under the dealer's casino; rows with no
+casino are left out. All of them use the shift the dealer has when the
+day is refreshed, so run the rebuild_rollups command after moving dealers
+between casinos or shifts in bulk.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import TokeSignOff, EarlyOutRequest, DealerVacation, DailyRollup
+
+TOTAL_FIELDS = ('scheduled_hours', 'actual_hours', 'dealer_count', 'early_out_count', 'vacation_count')
+
+
+def _bucket(casino_id, shift):
+    return (casino_id, shift or 0)
+
+
+def _empty():
+    return {
+        'scheduled_hours': Decimal('0'),
+        'actual_hours': Decimal('0'),
+        'dealer_count': 0,
+        'early_out_count': 0,
+        'vacation_count': 0,
+    }
+
+
+def _scope(casino_id, shift, casino_field, shift_field):
+    """
+    Filter kwargs limiting a query to one casino and/or shift. None means
+    any; shift 0 means dealers with no shift, as in the rollup rows.
+    """
+    scope = {}
+    if casino_id is not None:
+        scope[casino_field] = casino_id
+    if shift == 0:
+        scope[f'{shift_field}__isnull'] = True
+    elif shift is not None:
+        scope[shift_field] = shift
+    return scope
+
+
+def compute_day(day, casino_id=None, shift=None):
+    """
+    Return {(casino id, shift): totals} for a gaming day from the raw tables,
+    optionally only for one casino and/or shift.
+    """
+    buckets = defaultdict(_empty)
+
+    sign_offs = TokeSignOff.objects.for_day(day).filter(
+        toke__casino__isnull=False,
+        **_scope(casino_id, shift, 'toke__casino', 'user__shift')
+    ).values(
+        'toke__casino', 'user__shift'
+    ).annotate(
+        scheduled=Sum('scheduled_hours'),
+        actual=Sum('actual_hours'),
+        dealers=Count('user', distinct=True)
+    )
+    for row in sign_offs:
+        totals = buckets[_bucket(row['toke__casino'], row['user__shift'])]
+        totals['scheduled_hours'] = row['scheduled'] or Decimal('0')
+        totals['actual_hours'] = row['actual'] or Decimal('0')
+        totals['dealer_count'] = row['dealers']
+
+    early_outs = EarlyOutRequest.objects.filter(
+        queue_date=day,
+        status='APPROVED',
+        casino__isnull=False,
+        **_scope(casino_id, shift, 'casino', 'shift')
+    ).values('casino', 'shift').annotate(count=Count('id'))
+    for row in early_outs:
+        buckets[_bucket(row['casino'], row['shift'])]['early_out_count'] = row['count']
+
+    vacations = DealerVacation.objects.covering(day).filter(
+        user__casino__isnull=False,
+        **_scope(casino_id, shift, 'user__casino', 'user__shift')
+    ).values(
+        'user__casino', 'user__shift'
+    ).annotate(count=Count('user', distinct=True))
+    for row in vacations:
+        buckets[_bucket(row['user__casino'], row['user__shift'])]['vacation_count'] = row['count']
+
+    return buckets
+
+
+def refresh_day(day, casino_id=None, shift=None):
+    """
+    Recompute and store a gaming day's rollup rows: all of them, or only
+    those for one casino and/or shift.
+    """
+    buckets = compute_day(day, casino_id, shift)
+    rows = [
+        DailyRollup(casino_id=casino_id, gaming_day=day, shift=shift, **totals)
+        for (casino_id, shift), totals in buckets.items()
+    ]
+
+    with transaction.atomic():
+        stale = DailyRollup.objects.filter(gaming_day=day, **_scope(casino_id, shift, 'casino', 'shift'))
+        for casino_id, shift in buckets:
+            stale = stale.exclude(casino_id=casino_id, shift=shift)
+        stale.delete()
+
+        # Upsert, so concurrent refreshes of the same day cannot collide
+        DailyRollup.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['casino', 'gaming_day', 'shift'],
+            update_fields=[*TOTAL_FIELDS, 'updated_at']
+        )
+
+
+def refresh_days(days, casino_id=None, shift=None):
+    for day in sorted(set(days)):
+        refresh_day(day, casino_id, shift)
+
+
+def refresh_vacations(casino_id, shift, start_date, end_date):
+    """
+    Recompute vacation_count for one casino and shift from start_date to
+    end_date, without touching the other totals.
+    """
+    on_vacation = defaultdict(set)
+    vacations = DealerVacation.objects.overlapping(start_date, end_date).filter(
+        status='APPROVED',
+        **_scope(casino_id, shift, 'user__casino', 'user__shift')
+    ).values_list('user_id', 'start_date', 'end_date')
+    for user_id, first, last in vacations:
+        for day in days_between(max(first, start_date), min(last, end_date)):
+            on_vacation[day].add(user_id)
+
+    existing = DailyRollup.objects.filter(
+        casino_id=casino_id,
+        shift=shift,
+        gaming_day__range=(start_date, end_date)
+    )
+    days = set(on_vacation) | set(existing.values_list('gaming_day', flat=True))
+    rows = [
+        DailyRollup(casino_id=casino_id, gaming_day=day, shift=shift, vacation_count=len(on_vacation[day]))
+        for day in days
+    ]
+
+    with transaction.atomic():
+        DailyRollup.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['casino', 'gaming_day', 'shift'],
+            update_fields=['vacation_count', 'updated_at']
+        )
+        # Rows that only held vacations
+        existing.filter(**{field: 0 for field in TOTAL_FIELDS}).delete()
+
+
+def days_between(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def refresh_range(start_date, end_date):
+    for day in days_between(start_date, end_date):
+        refresh_day(day)
+
+
+def schedule_refresh(*days, casino_id=None, shift=None):
+    """
+    Refresh the given days, for one casino and/or shift if given, once the
+    surrounding transaction commits.
+    """
+    days = [day for day in days if day]
+    if days:
+        transaction.on_commit(lambda: refresh_days(days, casino_id, shift))
+
+
+def schedule_vacation_refresh(casino_id, shift, *ranges):
+    """Refresh vacation counts over each (start, end) range once the transaction commits."""
+    if casino_id is None:
+        # Dealers with no casino are left out of the rollups
+        return
+    for start_date, end_date in ranges:
+        transaction.on_commit(
+            lambda start_date=start_date, end_date=end_date: refresh_vacations(casino_id, shift or 0, start_date, end_date)
+        )
+
+
+def summarize(casino_id, start_date, end_date):
+    """
+    Sum the rollup rows for a casino over a date range.
+    Returns (per-shift totals ordered by shift, overall totals).
+    """
+    rows = DailyRollup.objects.filter(
+        casino_id=casino_id,
+        gaming_day__range=(start_date, end_date)
+    ).values_list('shift', *TOTAL_FIELDS)
+
+    by_shift = defaultdict(_empty)
+    totals = _empty()
+    for shift, *values in rows:
+        for field, value in zip(TOTAL_FIELDS, values):
+            by_shift[shift][field] += value
+            totals[field] += value
+
+    return [{'shift': shift, **by_shift[shift]} for shift in sorted(by_shift)], totals
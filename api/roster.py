@@ -0,0 +1,183 @@
+"""
+Per-casino, per-gaming-day roster snapshot used by the "current toke"
+endpoints.
+
+The snapshot holds the day's sign-offs, vacation pseudo-rows and early-out
+state for one casino. It is cached under the casino's current version and
+the day's, so serving it is two cache reads. The signal handlers in
+api/signals.py never edit a cached snapshot; once a change commits they
+give the affected days a new version, and the next read rebuilds the
+snapshot from the database. A change to a user shows on every day the user
+appears on, so it gives the whole casino a new version instead. Setting a version is a single cache write, so
+concurrent changes cannot lose each other's updates the way a
+read-modify-write of the snapshot could. A snapshot built from rows read
+before a change lands is stored under the old version and never served.
+Versions are random rather than counted, so a version key that is evicted
+and recreated can never bring back an old snapshot.
+"""
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from .models import TokeSignOff, DealerVacation, EarlyOutRequest
+
+ACTIVE_EARLY_OUT_STATUSES = ['PENDING', 'APPROVED']
+ROSTER_CACHE_TIMEOUT = getattr(settings, 'ROSTER_CACHE_TIMEOUT', 60 * 60 * 36)
+
+
+def _casino_version_key(casino_id):
+    return f'roster-version:{casino_id or 0}'
+
+
+def _version_key(casino_id, day):
+    return f'roster-version:{casino_id or 0}:{day.isoformat()}'
+
+
+def _cache_key(casino_id, day, casino_version, version):
+    return f'roster:{casino_id or 0}:{day.isoformat()}:{casino_version}:{version}'
+
+
+def _user_data(user):
+    return {
+        'id': str(user.id),
+        'name': user.get_full_name(),
+        'role': user.role
+    }
+
+
+def _sign_off_row(sign_off):
+    return {
+        'id': str(sign_off.id),
+        'user': _user_data(sign_off.user),
+        'shift_start': sign_off.shift_start,
+        'shift_end': sign_off.shift_end,
+        'scheduled_hours': sign_off.scheduled_hours,
+        'actual_hours': sign_off.actual_hours,
+        'is_on_vacation': False
+    }
+
+
+def _vacation_row(vacation):
+    return {
+        'id': f"v-{vacation.user_id}",
+        'user': _user_data(vacation.user),
+        'shift_start': "00:00",
+        'shift_end': "00:00",
+        'scheduled_hours': 8.0,  # Default to 8 hours for vacation
+        'actual_hours': 8.0,
+        'is_on_vacation': True
+    }
+
+
+def _early_out_entry(early_out):
+    return {
+        'id': early_out.id,
+        'status': early_out.status,
+        'hours_worked': early_out.hours_worked if early_out.status == 'APPROVED' else None
+    }
+
+
+def build_roster(casino_id, day):
+    """Build a casino's snapshot for a gaming day from the database."""
+    # Oldest first; roster_response lists them newest first
+    sign_offs = TokeSignOff.objects.for_casino_day(casino_id, day).select_related('user').order_by('created_at')
+
+    vacations = DealerVacation.objects.covering(day).filter(user__casino_id=casino_id).select_related('user')
+
+    early_outs = EarlyOutRequest.objects.filter(
+        casino_id=casino_id,
+        queue_date=day,
+        status__in=ACTIVE_EARLY_OUT_STATUSES
+    ).order_by('requested_at')
+
+    return {
+        'sign_offs': {s.user_id: _sign_off_row(s) for s in sign_offs},
+        'vacations': {v.id: (v.user_id, _vacation_row(v)) for v in vacations},
+        # Ordered oldest first, so the latest request per user wins
+        'early_outs': {eo.user_id: _early_out_entry(eo) for eo in early_outs},
+    }
+
+
+def get_roster(casino_id, day):
+    """Return a casino's snapshot for a gaming day, building it on first use."""
+    version_keys = [_casino_version_key(casino_id), _version_key(casino_id, day)]
+    versions = cache.get_many(version_keys)
+    if len(versions) < len(version_keys):
+        for version_key in version_keys:
+            if version_key not in versions:
+                cache.add(version_key, uuid.uuid4().hex, ROSTER_CACHE_TIMEOUT)
+        versions = cache.get_many(version_keys)
+    key = _cache_key(casino_id, day, *(versions.get(version_key) for version_key in version_keys))
+    roster = cache.get(key)
+    if roster is None:
+        roster = build_roster(casino_id, day)
+        cache.set(key, roster, ROSTER_CACHE_TIMEOUT)
+    return roster
+
+
+def roster_response(casino_id, day):
+    """Format the snapshot the way the current toke endpoints return it."""
+    roster = get_roster(casino_id, day)
+    sign_offs = roster['sign_offs']
+    early_outs = roster['early_outs']
+
+    # Newest sign-off first, followed by dealers on vacation who did not sign
+    rows = list(reversed(sign_offs.values()))
+    seen = set(sign_offs)
+    for user_id, row in roster['vacations'].values():
+        if user_id not in seen:
+            seen.add(user_id)
+            rows.append(row)
+
+    return {
+        'id': str(day),
+        'date': day.isoformat(),
+        'signOffs': [
+            {**row, 'early_out': early_outs.get(int(row['user']['id']))}
+            for row in rows
+        ]
+    }
+
+
+def invalidate(casino_id, *days):
+    """Have the next read of each day's snapshot rebuild it."""
+    cache.set_many(
+        {_version_key(casino_id, day): uuid.uuid4().hex for day in days if day},
+        ROSTER_CACHE_TIMEOUT
+    )
+
+
+def _days(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def sign_offs_changed(casino_id, day):
+    """Sign-offs saved or deleted, including by bulk_create, which sends no signals."""
+    invalidate(casino_id, day)
+
+
+def vacation_saved(casino_id, start_date, end_date, previous_range=None):
+    days = set(_days(start_date, end_date))
+    if previous_range:
+        days.update(_days(*previous_range))
+    invalidate(casino_id, *days)
+
+
+def vacation_deleted(casino_id, start_date, end_date):
+    invalidate(casino_id, *_days(start_date, end_date))
+
+
+def early_out_saved(early_out):
+    invalidate(early_out.casino_id, early_out.queue_date)
+
+
+def early_out_removed(casino_id, day):
+    invalidate(casino_id, day)
+
+
+def user_changed(casino_id):
+    """A user's name or role changed, or the user was deleted."""
+    cache.set(_casino_version_key(casino_id), uuid.uuid4().hex, ROSTER_CACHE_TIMEOUT)
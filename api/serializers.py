@@ -1,8 +1,21 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
-from .models import User, Casino, Tokes, TokeSignOff, DealerVacation, EarlyOutRequest, Discrepancy
+from django.db.models.manager import BaseManager
+from .models import User, Casino, Tokes, TokeSignOff, DealerVacation, EarlyOutRequest, Discrepancy, DailyRollup
+from .loaders import load_toke_context, load_sign_off_context, load_early_outs
+from . import timing
 
-class UserSerializer(serializers.ModelSerializer):
+class TimedRepresentationMixin:
+    """Counts to_representation towards the request's serialize timing (see api/timing.py)."""
+
+    def to_representation(self, instance):
+        with timing.timed('serialize'):
+            return super().to_representation(instance)
+
+class TimedModelSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    pass
+
+class UserSerializer(TimedModelSerializer):
     first_name = serializers.CharField(required=True, allow_blank=False)
     last_name = serializers.CharField(required=True, allow_blank=False)
     casino_name = serializers.CharField(source='casino.name', read_only=True)
@@ -54,7 +67,7 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class CasinoSerializer(serializers.ModelSerializer):
+class CasinoSerializer(TimedModelSerializer):
     current_shift = serializers.CharField(source='get_current_shift', read_only=True)
     
     class Meta:
@@ -84,23 +97,49 @@ class CasinoSerializer(serializers.ModelSerializer):
 
         return data
 
-class TokesSerializer(serializers.ModelSerializer):
+def with_loaded_context(args, kwargs, key, loader):
+    """
+    Arguments for a many=True serializer with loader's batch for the
+    instances added to its context, unless the caller's context has it.
+    """
+    context = kwargs.get('context') or {}
+    if not args or args[0] is None or key in context:
+        return args, kwargs
+    instances = list(args[0].all() if isinstance(args[0], BaseManager) else args[0])
+    return (instances, *args[1:]), {**kwargs, 'context': {**context, **loader(instances)}}
+
+class TokesSerializer(TimedModelSerializer):
     signOffs = serializers.SerializerMethodField()
     date = serializers.DateField(format='%Y-%m-%d')
 
     class Meta:
         model = Tokes
         fields = [
-            'id', 'date', 'finalized', 'per_hour_rate',
+            'id', 'date', 'finalized', 'pool_amount', 'per_hour_rate',
             'created_at', 'updated_at', 'signOffs'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # The pool, rate and finalized flag only change through update_pool
+        # and finalize, which keep the stored payouts in step
+        read_only_fields = [
+            'id', 'finalized', 'pool_amount', 'per_hour_rate',
+            'created_at', 'updated_at'
+        ]
 
-    def get_signOffs(self, obj):
-        sign_offs = TokeSignOff.objects.filter(toke=obj).select_related('user')
-        return TokeSignOffSerializer(sign_offs, many=True).data
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Sign-offs, users and early-outs for the whole page, loaded up front
+        args, kwargs = with_loaded_context(args, kwargs, 'sign_offs_by_toke', load_toke_context)
+        return super().many_init(*args, **kwargs)
 
-class EarlyOutRequestSerializer(serializers.ModelSerializer):
+    def get_signOffs(self, obj):
+        sign_offs_by_toke = self.context.get('sign_offs_by_toke')
+        if sign_offs_by_toke is None:
+            sign_offs = TokeSignOff.objects.filter(toke=obj).select_related('user__casino', 'payout')
+        else:
+            sign_offs = sign_offs_by_toke.get(obj.pk, [])
+        return TokeSignOffSerializer(sign_offs, many=True, context=self.context).data
+
+class EarlyOutRequestSerializer(TimedModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     authorized_by_name = serializers.CharField(source='authorized_by.get_full_name', read_only=True)
 
@@ -109,13 +148,21 @@ class EarlyOutRequestSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'user_name', 'pit_number', 'table_number',
             'requested_at', 'status', 'reason', 'authorized_by',
-            'authorized_by_name', 'hours_worked'
+            'authorized_by_name', 'hours_worked', 'list_type', 'position'
         ]
-        read_only_fields = ['id', 'user', 'requested_at', 'authorized_by']
+        # Status and place in line only change through EarlyOutQueue
+        read_only_fields = ['id', 'user', 'requested_at', 'status', 'authorized_by', 'list_type', 'position']
 
-class TokeSignOffSerializer(serializers.ModelSerializer):
+class TokeSignOffSerializer(TimedModelSerializer):
     user = UserSerializer(read_only=True)
     early_out = serializers.SerializerMethodField()
+    payout_amount = serializers.DecimalField(
+        source='payout.amount',
+        max_digits=10,
+        decimal_places=2,
+        read_only=True,
+        allow_null=True
+    )
     is_on_vacation = serializers.BooleanField(default=False)
     signed_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%S')
 
@@ -124,25 +171,30 @@ class TokeSignOffSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'shift_date', 'shift_start', 'shift_end',
             'scheduled_hours', 'actual_hours', 'original_hours',
-            'toke_hours', 'early_out', 'is_on_vacation',
+            'toke_hours', 'payout_amount', 'early_out', 'is_on_vacation',
             'created_at', 'updated_at', 'signed_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Same-day early-outs for every sign-off in the list, in one query
+        args, kwargs = with_loaded_context(args, kwargs, 'early_outs', load_sign_off_context)
+        return super().many_init(*args, **kwargs)
+
     def get_early_out(self, obj):
-        # Get today's early out request for this user if it exists
-        early_out = EarlyOutRequest.objects.filter(
-            user=obj.user,
-            requested_at__date=obj.shift_date,
-            status__in=['PENDING', 'APPROVED']
-        ).first()
+        # Use the batch loaded for the list when there is one
+        early_outs = self.context.get('early_outs')
+        if early_outs is None:
+            early_outs = load_early_outs([obj])
 
+        early_out = early_outs.get((obj.user_id, obj.shift_date))
         if early_out:
             serializer = EarlyOutRequestSerializer(early_out)
             return serializer.data
         return None
 
-class DealerVacationSerializer(serializers.ModelSerializer):
+class DealerVacationSerializer(TimedModelSerializer):
     user = UserSerializer(read_only=True)
     approved_by = UserSerializer(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(
@@ -171,7 +223,7 @@ class DealerVacationSerializer(serializers.ModelSerializer):
                 })
         return data
 
-class DiscrepancySerializer(serializers.ModelSerializer):
+class DiscrepancySerializer(TimedModelSerializer):
     reported_by = UserSerializer(read_only=True)
     verified_by = UserSerializer(read_only=True)
     resolved_by = UserSerializer(read_only=True)
@@ -179,12 +231,22 @@ class DiscrepancySerializer(serializers.ModelSerializer):
     class Meta:
         model = Discrepancy
         fields = [
-            'id', 'reported_by', 'description', 'status',
+            'id', 'reported_by', 'casino', 'description', 'status',
             'reported_at', 'verified_by', 'verification_date',
             'verification_notes', 'resolved_by', 'resolution_date',
             'resolution_notes'
         ]
         read_only_fields = [
-            'id', 'reported_at', 'verification_date',
+            'id', 'casino', 'reported_at', 'verification_date',
             'resolution_date'
         ]
+
+class DailyRollupSerializer(TimedModelSerializer):
+    class Meta:
+        model = DailyRollup
+        fields = [
+            'casino', 'gaming_day', 'shift', 'scheduled_hours',
+            'actual_hours', 'dealer_count', 'early_out_count',
+            'vacation_count', 'updated_at'
+        ]
+        read_only_fields = fields
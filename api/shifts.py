@@ -0,0 +1,165 @@
+"""
+Shift calendars: map timestamps to a casino's gaming day and shift.
+
+A ShiftCalendar turns a casino's six shift times into a table with one
+entry per minute of the day, holding the shift number and whether that
+minute belongs to the previous or next gaming day. Classifying a
+timestamp is then a single table lookup, and classify_many maps a whole
+batch through the table without comparing against shift boundaries row
+by row.
+
+Calendars are cached per casino and rebuilt when the casino's shift
+times change. The gaming day starts when the grave shift does, so the
+end of a swing shift that runs past midnight stays on the day it began.
+"""
+import time
+from datetime import date, time as dt_time, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+# Numbers match User.shift
+SHIFT_NAMES = {1: 'day', 2: 'swing', 3: 'grave'}
+MINUTES_PER_DAY = 24 * 60
+EPOCH = date(1970, 1, 1)
+# How long a calendar looked up by casino id is trusted before the
+# casino's times are read again; saves in this process drop it at once
+LOOKUP_CACHE_SECONDS = getattr(settings, 'SHIFT_CALENDAR_CACHE_SECONDS', 60)
+
+DEFAULT_TIMES = {
+    'grave_start': dt_time(1, 30),
+    'grave_end': dt_time(9, 30),
+    'day_start': dt_time(9, 30),
+    'day_end': dt_time(17, 30),
+    'swing_start': dt_time(17, 30),
+    'swing_end': dt_time(1, 30),
+}
+TIME_FIELDS = tuple(DEFAULT_TIMES)
+
+
+def _minutes(t):
+    # Unsaved casinos still hold their string defaults
+    if isinstance(t, str):
+        t = dt_time.fromisoformat(t)
+    return t.hour * 60 + t.minute
+
+
+def _in_range(minute, start, end):
+    if start <= end:
+        return start <= minute < end
+    # Wraps past midnight
+    return minute >= start or minute < end
+
+
+class ShiftCalendar:
+    def __init__(self, grave_start, grave_end, day_start, day_end, swing_start, swing_end):
+        self.times = (grave_start, grave_end, day_start, day_end, swing_start, swing_end)
+        grave = (_minutes(grave_start), _minutes(grave_end))
+        day = (_minutes(day_start), _minutes(day_end))
+
+        # The gaming day turns over at the start of the grave shift. A grave
+        # shift starting in the evening belongs to the next day; one starting
+        # after midnight leaves the early hours on the previous day.
+        boundary = grave[0]
+        next_day = boundary >= MINUTES_PER_DAY // 2
+
+        table = []
+        for minute in range(MINUTES_PER_DAY):
+            # Same precedence as the original get_current_shift: day, then
+            # grave, and anything else is swing
+            if _in_range(minute, *day):
+                shift = 1
+            elif _in_range(minute, *grave):
+                shift = 3
+            else:
+                shift = 2
+
+            if next_day:
+                offset = 1 if minute >= boundary else 0
+            else:
+                offset = -1 if minute < boundary else 0
+            table.append((timedelta(days=offset), shift))
+        self._table = tuple(table)
+
+    @classmethod
+    def default(cls):
+        return cls(**DEFAULT_TIMES)
+
+    @classmethod
+    def for_casino(cls, casino):
+        """The calendar for a Casino, reused until its shift times change."""
+        times = tuple(getattr(casino, field) for field in TIME_FIELDS)
+        cached = _calendars.get(casino.pk)
+        if cached is None or cached.times != times:
+            cached = cls(*times)
+            _calendars[casino.pk] = cached
+        return cached
+
+    @classmethod
+    def for_casino_id(cls, casino_id):
+        """The calendar for a casino by id, or the default one if there is no such casino."""
+        now = time.monotonic()
+        entry = _by_id.get(casino_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        from .models import Casino
+        casino = Casino.objects.filter(pk=casino_id).only('id', *TIME_FIELDS).first() if casino_id else None
+        calendar = cls.for_casino(casino) if casino else _default_calendar
+        _by_id[casino_id] = (now + LOOKUP_CACHE_SECONDS, calendar)
+        return calendar
+
+    def classify(self, value=None):
+        """Return (gaming day, shift number) for an aware datetime, default now."""
+        local = timezone.localtime(value)
+        offset, shift = self._table[local.hour * 60 + local.minute]
+        return local.date() + offset, shift
+
+    def classify_many(self, values):
+        """classify() for a batch of aware datetimes, in order."""
+        # Work in local minutes since the epoch. The UTC offset only changes
+        # on the hour, so it is looked up once per distinct hour.
+        tz = timezone.get_current_timezone()
+        offsets = {}
+        local_minutes = []
+        for value in values:
+            minute = int(value.timestamp()) // 60
+            hour = minute // 60
+            offset = offsets.get(hour)
+            if offset is None:
+                offset = offsets[hour] = int(value.astimezone(tz).utcoffset().total_seconds()) // 60
+            local_minutes.append(minute + offset)
+
+        days = {}
+        result = []
+        for minute, (offset, shift) in zip(
+            local_minutes,
+            map(self._table.__getitem__, [m % MINUTES_PER_DAY for m in local_minutes])
+        ):
+            day_number = minute // MINUTES_PER_DAY
+            day = days.get(day_number)
+            if day is None:
+                day = days[day_number] = EPOCH + timedelta(days=day_number)
+            result.append((day + offset, shift))
+        return result
+
+    def gaming_day(self, value=None):
+        return self.classify(value)[0]
+
+    def shift_name(self, value=None):
+        return SHIFT_NAMES[self.classify(value)[1]]
+
+
+_calendars = {}
+_by_id = {}
+_default_calendar = ShiftCalendar.default()
+
+
+def forget_casino(casino):
+    """Drop cached calendars for a casino whose times were just saved."""
+    _calendars.pop(casino.pk, None)
+    _by_id.pop(casino.pk, None)
+
+
+def current_gaming_day(casino_id=None):
+    """Today's gaming day for a casino (by id), or for the default shift times."""
+    return ShiftCalendar.for_casino_id(casino_id).gaming_day()
@@ -1,6 +1,9 @@
-from django.db.models.signals import pre_save, post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import User
+from .models import User, Casino, Tokes, TokeSignOff, DealerVacation, EarlyOutRequest
+from .authentication import invalidate_principal
+from . import roster, rollups, shifts, vacation_history
 
 @receiver(pre_save, sender=User)
 def auto_set_pencil_flag(sender, instance, **kwargs):
@@ -17,3 +20,112 @@ def ensure_casino_manager_pencil_flag(sender, instance, created, **kwargs):
     """
     if not created and instance.role == 'CASINO_MANAGER' and not instance.has_pencil_flag:
         User.objects.filter(id=instance.id).update(has_pencil_flag=True)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """
+    Drop the cached authentication fields once the change is committed
+    """
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_principal(user_id))
+
+# User fields shown on the roster
+ROSTER_USER_FIELDS = frozenset(['first_name', 'last_name', 'role', 'casino', 'casino_id'])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def update_roster_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Rebuild the casino's rosters when a name or role they show changes; saves
+    of other fields alone, such as last_login, leave them as they are
+    """
+    if update_fields is not None and not ROSTER_USER_FIELDS & update_fields:
+        return
+    casino_id = instance.casino_id
+    transaction.on_commit(lambda: roster.user_changed(casino_id))
+
+@receiver(post_save, sender=Casino)
+def forget_casino_shift_calendar(sender, instance, **kwargs):
+    """
+    Rebuild the casino's shift calendar with its new times
+    """
+    shifts.forget_casino(instance)
+
+def related_values(instance, field, model, *names):
+    """
+    The named fields of a related row as a dict, or None if it is gone. Read
+    from the related object when it is already loaded, otherwise as plain
+    values through the *_id field, so handlers never load whole rows.
+    """
+    descriptor = getattr(type(instance), field)
+    if descriptor.is_cached(instance):
+        related = getattr(instance, field)
+        return {name: getattr(related, name) for name in names}
+    return model.objects.filter(pk=getattr(instance, f'{field}_id')).values(*names).first()
+
+@receiver(post_save, sender=TokeSignOff)
+@receiver(post_delete, sender=TokeSignOff)
+def update_roster_on_sign_off_change(sender, instance, **kwargs):
+    """
+    Keep the cached daily roster and the rollup row the sign-off counts
+    towards in step with it; the rollup's whole day is refreshed if the
+    toke or dealer is already gone
+    """
+    day = instance.shift_date
+    toke = related_values(instance, 'toke', Tokes, 'casino_id')
+    user = related_values(instance, 'user', User, 'shift')
+    if toke:
+        transaction.on_commit(lambda: roster.sign_offs_changed(toke['casino_id'], day))
+    if toke and user:
+        rollups.schedule_refresh(day, casino_id=toke['casino_id'], shift=user['shift'] or 0)
+    else:
+        rollups.schedule_refresh(day)
+
+@receiver(pre_save, sender=DealerVacation)
+def remember_vacation_range(sender, instance, **kwargs):
+    """
+    Remember the stored date range so the roster can drop days the vacation no longer covers
+    """
+    instance._previous_range = None
+    if not instance._state.adding:
+        instance._previous_range = DealerVacation.objects.filter(
+            pk=instance.pk
+        ).values_list('start_date', 'end_date').first()
+
+@receiver(post_save, sender=DealerVacation)
+def update_roster_on_vacation_save(sender, instance, **kwargs):
+    previous_range = getattr(instance, '_previous_range', None)
+    start_date, end_date = instance.start_date, instance.end_date
+    user = related_values(instance, 'user', User, 'casino_id', 'shift')
+    if not user:
+        return
+    casino_id = user['casino_id']
+    transaction.on_commit(lambda: roster.vacation_saved(casino_id, start_date, end_date, previous_range))
+    ranges = [(start_date, end_date)]
+    if previous_range:
+        ranges.append(previous_range)
+    rollups.schedule_vacation_refresh(casino_id, user['shift'], *ranges)
+    transaction.on_commit(lambda: vacation_history.invalidate(casino_id))
+
+@receiver(post_delete, sender=DealerVacation)
+def update_roster_on_vacation_delete(sender, instance, **kwargs):
+    start_date, end_date = instance.start_date, instance.end_date
+    user = related_values(instance, 'user', User, 'casino_id', 'shift')
+    if not user:
+        return
+    casino_id = user['casino_id']
+    transaction.on_commit(lambda: roster.vacation_deleted(casino_id, start_date, end_date))
+    rollups.schedule_vacation_refresh(casino_id, user['shift'], (start_date, end_date))
+    transaction.on_commit(lambda: vacation_history.invalidate(casino_id))
+
+@receiver(post_save, sender=EarlyOutRequest)
+def update_roster_on_early_out_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: roster.early_out_saved(instance))
+    rollups.schedule_refresh(instance.queue_date, casino_id=instance.casino_id)
+
+@receiver(post_delete, sender=EarlyOutRequest)
+def update_roster_on_early_out_delete(sender, instance, **kwargs):
+    casino_id, day = instance.casino_id, instance.queue_date
+    transaction.on_commit(lambda: roster.early_out_removed(casino_id, day))
+    rollups.schedule_refresh(day, casino_id=casino_id)
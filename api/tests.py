@@ -1,3 +1,833 @@
-from django.test import TestCase
+import json
+import re
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils.timezone import localdate
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import audit, authentication, events, rollups, roster
+from .early_out_queue import EarlyOutQueue
+from .models import AuditLog, User, Casino, Tokes, TokeSignOff, DealerVacation, Discrepancy, DailyRollup, EarlyOutRequest, EarlyOutEvent, TokePayout
+from .payouts import PayoutError, allocate, write_payouts
+from .serializers import TokesSerializer
+from .shifts import ShiftCalendar, current_gaming_day
+from .tokens import token_pair
+from .views import metrics as metrics_view
+from .views.tokes import FINALIZE_ERRORS, finalize_tokes
 
-# Create your tests here.
+FULL_SCAN = re.compile(r'\bSCAN (?!CONSTANT ROW)(\w+)')
+
+
+class HotPathQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on the toke hot-path querysets and fails if any
+    of them falls back to scanning a whole table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2025, 1, 15)
+        cls.casino = Casino.objects.create(name='Test Casino')
+        cls.dealer = User.objects.create(
+            username='800000001',
+            employee_id='800000001',
+            first_name='Test',
+            last_name='Dealer',
+            role='DEALER',
+            casino=cls.casino
+        )
+        cls.toke = Tokes.objects.create(casino=cls.casino, date=cls.day)
+        TokeSignOff.objects.create(user=cls.dealer, toke=cls.toke, shift_date=cls.day)
+        DealerVacation.objects.create(
+            user=cls.dealer,
+            start_date=cls.day,
+            end_date=cls.day,
+            status='APPROVED'
+        )
+
+    def assertNoFullScan(self, queryset):
+        plan = queryset.explain()
+        scans = FULL_SCAN.findall(plan)
+        self.assertFalse(scans, f'Full table scan on {", ".join(scans)}:\n{plan}')
+
+    def test_sign_offs_for_day(self):
+        self.assertNoFullScan(
+            TokeSignOff.objects.for_day(self.day).select_related('user')
+        )
+
+    def test_sign_off_for_toke_and_user(self):
+        self.assertNoFullScan(
+            TokeSignOff.objects.for_toke_user(self.toke, self.dealer)
+        )
+
+    def test_latest_sign_off_for_user(self):
+        self.assertNoFullScan(
+            TokeSignOff.objects.latest_for_user(self.dealer)[:1]
+        )
+
+    def test_vacations_covering_day(self):
+        self.assertNoFullScan(
+            DealerVacation.objects.covering(self.day).select_related('user')
+        )
+
+    def test_tokes_for_date(self):
+        self.assertNoFullScan(Tokes.objects.filter(date=self.day))
+
+    def test_casino_scoped_lookups(self):
+        casino_id = self.casino.pk
+        querysets = [
+            Tokes.objects.filter(casino_id=casino_id, date=self.day),
+            Tokes.objects.filter(casino_id=casino_id).order_by('-date')[:101],
+            TokeSignOff.objects.for_casino_day(casino_id, self.day).select_related('user'),
+            Discrepancy.objects.filter(casino_id=casino_id).order_by('-reported_at')[:101],
+            User.objects.filter(casino_id=casino_id, role='DEALER'),
+        ]
+        for queryset in querysets:
+            with self.subTest(model=queryset.model.__name__):
+                self.assertNoFullScan(queryset)
+
+    def test_cursor_pages(self):
+        # A page after the first is a range read from the cursor position
+        position = datetime(2025, 1, 15, tzinfo=timezone.utc)
+        pages = [
+            Tokes.objects.filter(date__lt=self.day).order_by('-date', '-id'),
+            TokeSignOff.objects.filter(created_at__lt=position).order_by('-created_at', '-id'),
+            Discrepancy.objects.filter(reported_at__lt=position).order_by('-reported_at', '-id'),
+            DealerVacation.objects.filter(start_date__lt=self.day).order_by('-start_date', '-id'),
+        ]
+        for queryset in pages:
+            with self.subTest(model=queryset.model.__name__):
+                self.assertNoFullScan(queryset[:101])
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        # User ids are reused between tests; drop principals cached by earlier ones
+        cache.clear()
+
+    def test_header_reports_phases(self):
+        user = User.objects.create(username='800000002', employee_id='800000002', role='TOKE_MANAGER')
+        token = RefreshToken.for_user(user).access_token
+        response = self.client.get('/api/dealers/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        timings = dict(
+            entry.split(';', 1) for entry in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({'total', 'view', 'db', 'auth'} <= set(timings))
+        self.assertRegex(timings['db'], r'desc="\d+ quer(y|ies)"')
+
+    def test_log_line_has_structured_fields(self):
+        with self.assertLogs('api.timing', level='INFO') as logs:
+            self.client.get('/api/tokes/current/')
+
+        record = logs.records[0]
+        self.assertEqual(record.getMessage(), 'request_timing')
+        self.assertEqual(
+            {key: record.fields[key] for key in ('method', 'path', 'status')},
+            {'method': 'GET', 'path': '/api/tokes/current/', 'status': 401}
+        )
+        self.assertTrue({'total_ms', 'db_ms', 'queries'} <= set(record.fields))
+
+
+class MetricsTests(TestCase):
+    def test_counts_by_route_for_token_holders_only(self):
+        self.client.get('/api/tokes/current/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        with mock.patch.object(metrics_view, 'METRICS_TOKEN', 'scrape-secret'):
+            response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                'tokebook_responses_total{route="current_toke",method="GET",status="401"}',
+                response.content.decode()
+            )
+            for header in ('Bearer wrong-secret', 'scrape-secret', ''):
+                self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION=header).status_code, 401)
+
+
+class LoginLoggingTests(TestCase):
+    def test_login_logs_neither_tokens_nor_password_hash(self):
+        user = User.objects.create(username='800000002', employee_id='800000002', role='DEALER')
+        user.set_password('correct horse')
+        user.save()
+
+        # The audit writer would otherwise flush after the test database is gone
+        with self.assertLogs('api', level='DEBUG') as logs, mock.patch.object(audit, 'record'):
+            response = self.client.post(
+                '/api/auth/login/',
+                {'username': '800000002', 'password': 'correct horse'},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        output = '\n'.join(logs.output)
+        self.assertIn('login_succeeded', output)
+        for secret in (user.password, response.json()['tokens']['access'], 'correct horse'):
+            self.assertNotIn(secret, output)
+
+
+class AuditLogTests(TestCase):
+    def test_timestamp_is_when_the_change_was_recorded(self):
+        with mock.patch.object(audit.writer, 'submit') as submit:
+            audit.record(action='UPDATE', model_name='Tokes')
+        fields = submit.call_args.kwargs
+
+        # Written later by the flusher, the row keeps the recorded time
+        audit.AuditWriter()._write([fields])
+        self.assertEqual(AuditLog.objects.get().timestamp, fields['timestamp'])
+
+    def test_dropped_records_are_logged_as_events(self):
+        writer = audit.AuditWriter(queue_size=1)
+        with mock.patch.object(writer, '_ensure_started'), self.assertLogs('api.audit', level='WARNING') as logs:
+            writer.submit(action='UPDATE')
+            writer.submit(action='UPDATE')
+        self.assertEqual((logs.records[0].getMessage(), logs.records[0].fields), ('audit_queue_full', {'dropped': 1}))
+
+
+class LoginTests(TransactionTestCase):
+    def test_one_query_and_hash_upgraded_in_background(self):
+        casino = Casino.objects.create(name='Test Casino')
+        user = User.objects.create(username='800000003', employee_id='800000003', role='DEALER', casino=casino)
+        # A hash made with fewer iterations than the current default
+        outdated = PBKDF2PasswordHasher().encode('correct horse', 'saltsaltsalt', iterations=1000)
+        User.objects.filter(pk=user.pk).update(password=outdated)
+
+        with self.assertNumQueries(1), mock.patch.object(audit, 'record'):
+            response = self.client.post(
+                '/api/auth/login/',
+                {'username': '800000003', 'password': 'correct horse'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['casino_name'], 'Test Casino')
+
+        # The upgrade runs on a single worker, so this waits for it
+        authentication._upgrade_executor().submit(lambda: None).result()
+        user.refresh_from_db()
+        self.assertFalse(get_hasher().must_update(user.password))
+        self.assertTrue(user.check_password('correct horse'))
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='800000004', employee_id='800000004', role='DEALER')
+        self.tokens = token_pair(self.user)
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': token}, content_type='application/json')
+
+    def test_rotated_refresh_token_is_revoked(self):
+        response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.json()['refresh']).status_code, 200)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {self.tokens['access']}"}
+        response = self.client.post(
+            '/api/auth/logout/',
+            {'refresh': self.tokens['refresh']},
+            content_type='application/json',
+            **auth
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/tokes/current/', **auth).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_retried_sign_off_replays_the_stored_response(self):
+        casino = Casino.objects.create(name='Test Casino')
+        dealer = User.objects.create(username='800000005', employee_id='800000005', role='DEALER', casino=casino)
+        toke = Tokes.objects.create(casino=casino, date=date(2025, 1, 15))
+        headers = {
+            'HTTP_AUTHORIZATION': f"Bearer {token_pair(dealer)['access']}",
+            'HTTP_IDEMPOTENCY_KEY': 'sign-1',
+        }
+        body = {'hours': 8, 'shift_start': '09:30:00', 'shift_end': '17:30:00', 'shift_date': '2025-01-15'}
+
+        def sign(data):
+            return self.client.post(f'/api/tokes/{toke.pk}/sign/', data, content_type='application/json', **headers)
+
+        first = sign(body)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            retry = sign(body)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(TokeSignOff.objects.filter(toke=toke).count(), 1)
+
+        self.assertEqual(sign({**body, 'hours': 6}).status_code, 422)
+
+
+class SignTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.dealer = User.objects.create(username='800000006', employee_id='800000006', role='DEALER', casino=self.casino)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(self.dealer)['access']}"}
+
+    def sign(self, toke):
+        return self.client.post(
+            f'/api/tokes/{toke.pk}/sign/',
+            {'hours': 8, 'shift_start': '09:30:00', 'shift_end': '17:30:00', 'shift_date': toke.date.isoformat()},
+            content_type='application/json',
+            **self.auth
+        )
+
+    def test_other_casinos_toke_is_not_found(self):
+        other = Tokes.objects.create(casino=Casino.objects.create(name='Other Casino'), date=date(2025, 1, 15))
+        self.assertEqual(self.sign(other).status_code, 404)
+        self.assertFalse(TokeSignOff.objects.exists())
+
+    def test_finalized_and_duplicate_sign_offs_are_rejected(self):
+        toke = Tokes.objects.create(casino=self.casino, date=date(2025, 1, 15))
+        self.assertEqual(self.sign(toke).status_code, 200)
+        self.assertEqual(self.sign(toke).status_code, 400)
+
+        Tokes.objects.filter(pk=toke.pk).update(finalized=True)
+        TokeSignOff.objects.all().delete()
+        self.assertEqual(self.sign(toke).status_code, 400)
+        self.assertFalse(TokeSignOff.objects.exists())
+
+
+class FinalizeAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.toke = Tokes.objects.create(casino=self.casino, date=date(2025, 1, 15), per_hour_rate=10)
+
+    def finalize(self, role, toke):
+        user = User.objects.create(username=f'8{role[:8]}', employee_id=f'8{role[:8]}', role=role, casino=self.casino)
+        return self.client.post(
+            f'/api/tokes/{toke.pk}/finalize/',
+            HTTP_AUTHORIZATION=f"Bearer {token_pair(user)['access']}"
+        )
+
+    def test_dealers_cannot_finalize(self):
+        self.assertEqual(self.finalize('DEALER', self.toke).status_code, 403)
+        self.assertEqual(self.client.post(
+            '/api/tokes/finalize-range/',
+            HTTP_AUTHORIZATION=f"Bearer {token_pair(User.objects.get(role='DEALER'))['access']}"
+        ).status_code, 403)
+
+    def test_other_casinos_toke_is_not_found(self):
+        other = Tokes.objects.create(casino=Casino.objects.create(name='Other Casino'), date=date(2025, 1, 15))
+        self.assertEqual(self.finalize('TOKE_MANAGER', other).status_code, 404)
+        other.refresh_from_db()
+        self.assertFalse(other.finalized)
+
+
+class TokeSerializerTests(TestCase):
+    def test_list_loads_sign_offs_and_early_outs_in_batches(self):
+        casino = Casino.objects.create(name='Test Casino')
+        for day in (date(2025, 1, 14), date(2025, 1, 15)):
+            toke = Tokes.objects.create(casino=casino, date=day)
+            for i in range(2):
+                employee_id = f'8000005{day.day}{i}'
+                dealer = User.objects.create(username=employee_id, employee_id=employee_id, role='DEALER', casino=casino)
+                TokeSignOff.objects.create(user=dealer, toke=toke, shift_date=day)
+                EarlyOutRequest.objects.create(user=dealer, casino=casino, queue_date=day, list_type='dealer')
+
+        # Tokes, sign-offs with users and payouts, then early-outs
+        with self.assertNumQueries(3):
+            data = TokesSerializer(Tokes.objects.filter(casino=casino), many=True).data
+        self.assertEqual([len(toke['signOffs']) for toke in data], [2, 2])
+        self.assertTrue(all(sign_off['early_out'] for toke in data for sign_off in toke['signOffs']))
+
+
+class FinalizeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.dealer = User.objects.create(username='800000050', employee_id='800000050', role='DEALER', casino=self.casino)
+
+    def toke(self, day, hours=8, **fields):
+        toke = Tokes.objects.create(casino=self.casino, date=date(2025, 1, day), **fields)
+        if hours is not None:
+            TokeSignOff.objects.create(user=self.dealer, toke=toke, shift_date=toke.date, actual_hours=hours)
+        return toke
+
+    def test_skip_reasons(self):
+        ready = self.toke(15, pool_amount=80, per_hour_rate=10)
+        done = self.toke(16, per_hour_rate=10, finalized=True)
+        no_pool = self.toke(17)
+        no_hours = self.toke(18, hours=None, per_hour_rate=10)
+
+        finalized, skipped = finalize_tokes([ready.pk, done.pk, no_pool.pk, no_hours.pk])
+        self.assertEqual([toke.pk for toke in finalized], [ready.pk])
+        self.assertEqual(skipped, {done.pk: 'finalized', no_pool.pk: 'no_pool', no_hours.pk: 'no_hours'})
+
+        ready.refresh_from_db()
+        self.assertTrue(ready.finalized)
+        self.assertEqual(TokeSignOff.objects.get(toke=ready).toke_hours, 8)
+        self.assertEqual(TokePayout.objects.get(toke=ready).amount, Decimal('80.00'))
+
+    def test_pool_rate_and_finalized_are_read_only(self):
+        toke = self.toke(15, pool_amount=80, per_hour_rate=10, finalized=True)
+        manager = User.objects.create(username='800000052', employee_id='800000052', role='TOKE_MANAGER', casino=self.casino)
+        response = self.client.patch(
+            f'/api/tokes/{toke.pk}/',
+            {'pool_amount': '1000.00', 'per_hour_rate': '99.00', 'finalized': False},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {token_pair(manager)['access']}"
+        )
+        self.assertEqual(response.status_code, 200)
+        toke.refresh_from_db()
+        self.assertEqual((toke.pool_amount, toke.per_hour_rate, toke.finalized), (80, 10, True))
+
+    def test_range_finalizes_own_casino_in_range(self):
+        self.toke(14, per_hour_rate=10)
+        inside = self.toke(15, per_hour_rate=10)
+        no_pool = self.toke(16)
+        other = Tokes.objects.create(casino=Casino.objects.create(name='Other Casino'), date=date(2025, 1, 15), per_hour_rate=10)
+        manager = User.objects.create(username='800000051', employee_id='800000051', role='TOKE_MANAGER', casino=self.casino)
+
+        response = self.client.post(
+            '/api/tokes/finalize-range/',
+            {'start_date': '2025-01-15', 'end_date': '2025-01-16'},
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f"Bearer {token_pair(manager)['access']}"
+        ).json()
+        self.assertEqual(response['finalized'], ['2025-01-15'])
+        self.assertEqual(response['skipped'], [
+            {'id': str(no_pool.pk), 'date': '2025-01-16', 'error': FINALIZE_ERRORS['no_pool']}
+        ])
+        self.assertEqual(
+            set(Tokes.objects.filter(finalized=True).values_list('pk', flat=True)), {inside.pk}
+        )
+        other.refresh_from_db()
+        self.assertFalse(other.finalized)
+
+
+class RollupAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        manager = User.objects.create(username='800000007', employee_id='800000007', role='TOKE_MANAGER', casino=self.casino)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(manager)['access']}"}
+
+    def test_scoped_to_own_casino_and_dates_validated(self):
+        other = Casino.objects.create(name='Other Casino')
+        response = self.client.get(f'/api/rollups/weekly/?casino={other.pk}&date=2025-01-15', **self.auth)
+        self.assertEqual(response.json()['casino'], str(self.casino.pk))
+
+        self.assertEqual(self.client.get('/api/rollups/?start_date=foo', **self.auth).status_code, 400)
+        self.assertEqual(self.client.get('/api/rollups/?casino=abc', **self.auth).status_code, 200)
+
+
+class RollupRefreshTests(TestCase):
+    def setUp(self):
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.dealer = User.objects.create(
+            username='800000008', employee_id='800000008', role='DEALER', casino=self.casino, shift=1
+        )
+        self.day = date(2025, 1, 15)
+
+    def rollup(self, day):
+        return DailyRollup.objects.filter(casino=self.casino, gaming_day=day, shift=1).first()
+
+    def test_sign_off_refreshes_only_its_bucket(self):
+        other = DailyRollup.objects.create(
+            casino=Casino.objects.create(name='Other Casino'), gaming_day=self.day, dealer_count=99
+        )
+        toke = Tokes.objects.create(casino=self.casino, date=self.day)
+        with self.captureOnCommitCallbacks(execute=True):
+            TokeSignOff.objects.create(user=self.dealer, toke=toke, shift_date=self.day, actual_hours=8)
+
+        self.assertEqual(self.rollup(self.day).dealer_count, 1)
+        other.refresh_from_db()
+        self.assertEqual(other.dealer_count, 99)
+
+    def test_vacation_updates_only_vacation_counts(self):
+        toke = Tokes.objects.create(casino=self.casino, date=self.day)
+        with self.captureOnCommitCallbacks(execute=True):
+            TokeSignOff.objects.create(user=self.dealer, toke=toke, shift_date=self.day, actual_hours=8)
+            vacation = DealerVacation.objects.create(
+                user=self.dealer, start_date=self.day, end_date=date(2025, 1, 17), status='APPROVED'
+            )
+        self.assertEqual([self.rollup(date(2025, 1, d)).vacation_count for d in (15, 16, 17)], [1, 1, 1])
+
+        vacation.end_date = self.day
+        with self.captureOnCommitCallbacks(execute=True):
+            vacation.save()
+        row = self.rollup(self.day)
+        self.assertEqual((row.vacation_count, row.dealer_count, row.actual_hours), (1, 1, 8))
+        # Rows that only held the vacation are gone
+        self.assertIsNone(self.rollup(date(2025, 1, 16)))
+
+    def test_compute_day_and_summarize(self):
+        unassigned = User.objects.create(username='800000060', employee_id='800000060', role='DEALER', casino=self.casino)
+        toke = Tokes.objects.create(casino=self.casino, date=self.day)
+        TokeSignOff.objects.create(user=self.dealer, toke=toke, shift_date=self.day, scheduled_hours=8, actual_hours=6)
+        TokeSignOff.objects.create(user=unassigned, toke=toke, shift_date=self.day, scheduled_hours=8, actual_hours=8)
+        for status in ('APPROVED', 'PENDING'):
+            EarlyOutRequest.objects.create(
+                user=self.dealer, status=status, casino=self.casino, queue_date=self.day, shift=1
+            )
+        DealerVacation.objects.create(user=unassigned, start_date=self.day, end_date=self.day, status='APPROVED')
+        # Tokes with no casino are left out
+        TokeSignOff.objects.create(
+            user=self.dealer, toke=Tokes.objects.create(date=self.day), shift_date=self.day, actual_hours=4
+        )
+
+        buckets = rollups.compute_day(self.day)
+        self.assertEqual(dict(buckets[(self.casino.pk, 1)]), {
+            'scheduled_hours': 8, 'actual_hours': 6, 'dealer_count': 1, 'early_out_count': 1, 'vacation_count': 0
+        })
+        self.assertEqual(dict(buckets[(self.casino.pk, 0)]), {
+            'scheduled_hours': 8, 'actual_hours': 8, 'dealer_count': 1, 'early_out_count': 0, 'vacation_count': 1
+        })
+        self.assertEqual(len(buckets), 2)
+
+        rollups.refresh_day(self.day)
+        DailyRollup.objects.create(casino=self.casino, gaming_day=date(2025, 1, 16), shift=1, actual_hours=2, dealer_count=1)
+        by_shift, totals = rollups.summarize(self.casino.pk, self.day, date(2025, 1, 16))
+        self.assertEqual([(row['shift'], row['actual_hours'], row['dealer_count']) for row in by_shift], [(0, 8, 1), (1, 8, 2)])
+        self.assertEqual((totals['actual_hours'], totals['dealer_count'], totals['vacation_count']), (16, 3, 1))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = date(2025, 1, 15)
+        self.casino = Casino.objects.create(name='Test Casino')
+        manager = User.objects.create(username='800000009', employee_id='800000009', role='TOKE_MANAGER', casino=self.casino)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(manager)['access']}"}
+
+    def sign_off(self, casino, employee_id):
+        dealer = User.objects.create(username=employee_id, employee_id=employee_id, role='DEALER', casino=casino)
+        toke = Tokes.objects.create(casino=casino, date=self.day)
+        return TokeSignOff.objects.create(user=dealer, toke=toke, shift_date=self.day)
+
+    def test_only_own_casino_is_exported(self):
+        own = self.sign_off(self.casino, '800000010')
+        self.sign_off(Casino.objects.create(name='Other Casino'), '800000011')
+
+        response = self.client.get(
+            '/api/toke-signoffs/export/?start_date=2025-01-15&end_date=2025-01-15&casino=Other Casino', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [str(own.pk)])
+
+
+class VacationReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        manager = User.objects.create(username='800000012', employee_id='800000012', role='TOKE_MANAGER', casino=self.casino)
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(manager)['access']}"}
+
+    def vacation(self, casino, employee_id):
+        dealer = User.objects.create(username=employee_id, employee_id=employee_id, role='DEALER', casino=casino)
+        DealerVacation.objects.create(
+            user=dealer, start_date=date(2025, 1, 15), end_date=date(2025, 1, 16), status='APPROVED'
+        )
+        return dealer
+
+    def test_reports_cover_only_own_casino(self):
+        own = self.vacation(self.casino, '800000013')
+        self.vacation(Casino.objects.create(name='Other Casino'), '800000014')
+
+        calendar = self.client.get('/api/dealer-vacations/calendar/?month=2025-01', **self.auth).json()
+        self.assertEqual([dealer['id'] for dealer in calendar['dealers']], [own.pk])
+
+        report = self.client.get('/api/dealer-vacations/monthly_report/?month=1&year=2025', **self.auth).json()
+        self.assertEqual(len(report), 1)
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_changes_rebuild_the_cached_snapshot(self):
+        casino = Casino.objects.create(name='Test Casino')
+        dealer = User.objects.create(username='800000015', employee_id='800000015', role='DEALER', casino=casino)
+        toke = Tokes.objects.create(casino=casino, date=date(2025, 1, 15))
+        self.assertEqual(roster.get_roster(casino.pk, toke.date)['sign_offs'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sign_off = TokeSignOff.objects.create(user=dealer, toke=toke, shift_date=toke.date)
+        self.assertEqual(list(roster.get_roster(casino.pk, toke.date)['sign_offs']), [dealer.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sign_off.delete()
+        self.assertEqual(roster.get_roster(casino.pk, toke.date)['sign_offs'], {})
+
+    def test_user_changes_rebuild_every_day(self):
+        casino = Casino.objects.create(name='Test Casino')
+        dealer = User.objects.create(username='800000016', employee_id='800000016', role='DEALER', casino=casino)
+        days = [date(2025, 1, 14), date(2025, 1, 15)]
+        for day in days:
+            TokeSignOff.objects.create(user=dealer, toke=Tokes.objects.create(casino=casino, date=day), shift_date=day)
+            roster.get_roster(casino.pk, day)
+
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(roster, 'user_changed') as user_changed:
+            dealer.save(update_fields=['last_login'])
+        user_changed.assert_not_called()
+
+        dealer.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            dealer.save()
+        for day in days:
+            self.assertEqual(roster.get_roster(casino.pk, day)['sign_offs'][dealer.pk]['user']['name'], 'Renamed')
+
+    def test_sign_off_handlers_read_ids_not_rows(self):
+        casino = Casino.objects.create(name='Test Casino')
+        dealer = User.objects.create(username='800000017', employee_id='800000017', role='DEALER', casino=casino, shift=2)
+        toke = Tokes.objects.create(casino=casino, date=date(2025, 1, 15))
+        sign_off = TokeSignOff.objects.create(user=dealer, toke=toke, shift_date=toke.date)
+
+        sign_off = TokeSignOff.objects.get(pk=sign_off.pk)
+        sign_off.actual_hours = 4
+        with mock.patch.object(rollups, 'schedule_refresh') as schedule_refresh:
+            sign_off.save()
+        schedule_refresh.assert_called_once_with(toke.date, casino_id=casino.pk, shift=2)
+        self.assertFalse(TokeSignOff.toke.is_cached(sign_off) or TokeSignOff.user.is_cached(sign_off))
+
+
+class EarlyOutQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.queue = EarlyOutQueue(self.casino.pk, date(2025, 1, 15), 1, 'dealer')
+        self.dealers = [
+            User.objects.create(username=f'80000002{i}', employee_id=f'80000002{i}', role='DEALER', casino=self.casino, shift=1)
+            for i in range(3)
+        ]
+
+    def test_removal_keeps_positions_unique_and_contiguous(self):
+        first, second, third = [self.queue.enqueue(dealer) for dealer in self.dealers]
+        self.assertEqual([first.position, second.position, third.position], [1, 2, 3])
+
+        self.queue.remove(first, 'REMOVED')
+        self.assertEqual(list(self.queue.waiting().values_list('pk', 'position')), [(second.pk, 1), (third.pk, 2)])
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EarlyOutRequest.objects.filter(pk=third.pk).update(position=1)
+
+    def test_current_list_is_in_line_order(self):
+        queue = EarlyOutQueue(self.casino.pk, current_gaming_day(self.casino.pk), 1, 'dealer')
+        first, second, third = [queue.enqueue(dealer) for dealer in self.dealers]
+        # Asked in the opposite order to their places in line
+        for minutes, early_out in enumerate((third, second, first)):
+            EarlyOutRequest.objects.filter(pk=early_out.pk).update(requested_at=datetime(2025, 1, 15, 8, minutes, tzinfo=timezone.utc))
+        queue.remove(second, 'APPROVED')
+
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(self.dealers[0])['access']}"}
+        response = self.client.get('/api/early-out-requests/current-list/?shift=day', **auth)
+        self.assertEqual([row['id'] for row in response.json()], [first.pk, third.pk, second.pk])
+
+    def test_next_in_line_rejects_unknown_list_type(self):
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(self.dealers[0])['access']}"}
+        self.assertEqual(self.client.get('/api/early-out-requests/next/?list_type=pit', **auth).status_code, 400)
+
+    def test_failed_authorize_leaves_the_request_in_line(self):
+        early_out = self.queue.enqueue(self.dealers[0])
+        toke = Tokes.objects.create(casino=self.casino, date=early_out.queue_date)
+        TokeSignOff.objects.create(user=self.dealers[0], toke=toke, shift_date=toke.date)
+        manager = User.objects.create(username='800000029', employee_id='800000029', role='CASINO_MANAGER', casino=self.casino)
+
+        with mock.patch.object(TokeSignOff, 'save', side_effect=RuntimeError('disk full')):
+            response = self.client.post(
+                f'/api/early-out-requests/{early_out.pk}/authorize/',
+                {'hours_worked': 4, 'toke_id': str(toke.pk)},
+                HTTP_AUTHORIZATION=f"Bearer {token_pair(manager)['access']}"
+            )
+        self.assertEqual(response.status_code, 500)
+        early_out.refresh_from_db()
+        self.assertEqual((early_out.status, early_out.position), ('PENDING', 1))
+
+    def test_plain_routes_go_through_the_queue(self):
+        queue = EarlyOutQueue(self.casino.pk, current_gaming_day(self.casino.pk), 1, 'dealer')
+        first = queue.enqueue(self.dealers[1])
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(self.dealers[0])['access']}"}
+
+        response = self.client.post('/api/early-out-requests/', {'pit_number': '4', 'position': 1, 'status': 'APPROVED'}, **auth)
+        self.assertEqual(response.status_code, 201)
+        early_out = EarlyOutRequest.objects.get(pk=response.json()['id'])
+        self.assertEqual((early_out.status, early_out.position, early_out.pit_number), ('PENDING', 2, '4'))
+
+        response = self.client.patch(
+            f'/api/early-out-requests/{early_out.pk}/',
+            {'reason': 'SICK', 'position': 1, 'list_type': 'supervisor', 'status': 'APPROVED'},
+            content_type='application/json', **auth
+        )
+        self.assertEqual(response.status_code, 200)
+        early_out.refresh_from_db()
+        self.assertEqual((early_out.reason, early_out.position, early_out.list_type, early_out.status), ('SICK', 2, 'dealer', 'PENDING'))
+
+        self.assertEqual(self.client.delete(f'/api/early-out-requests/{first.pk}/', **auth).status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/early-out-requests/{early_out.pk}/', **auth).status_code, 204)
+        early_out.refresh_from_db()
+        self.assertEqual((early_out.status, early_out.position), ('REMOVED', None))
+        self.assertEqual(list(queue.waiting().values_list('pk', 'position')), [(first.pk, 1)])
+
+    def test_other_casinos_requests_are_hidden(self):
+        early_out = self.queue.enqueue(self.dealers[0])
+        other = User.objects.create(
+            username='800000030', employee_id='800000030', role='DEALER',
+            casino=Casino.objects.create(name='Other Casino')
+        )
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(other)['access']}"}
+        self.assertEqual(self.client.get(f'/api/early-out-requests/{early_out.pk}/', **auth).status_code, 404)
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        casino = Casino.objects.create(name='Test Casino')
+        self.dealer = User.objects.create(username='800000031', employee_id='800000031', role='DEALER', casino=casino)
+        self.access = token_pair(self.dealer)['access']
+
+    def test_stream_token_only_opens_the_stream(self):
+        response = self.client.post('/api/early-out-requests/stream-token/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        stream_token = response.json()['token']
+
+        response = self.client.get(f'/api/early-out-requests/stream/?token={stream_token}')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        self.assertEqual(self.client.get(f'/api/early-out-requests/stream/?token={self.access}').status_code, 401)
+        self.assertEqual(
+            self.client.get('/api/early-out-requests/', HTTP_AUTHORIZATION=f'Bearer {stream_token}').status_code, 401
+        )
+
+    def test_wsgi_stream_ends_so_the_client_reconnects(self):
+        with mock.patch.object(events, 'WSGI_MAX_STREAM_SECONDS', 0.2), mock.patch.object(events, 'POLL_SECONDS', 0.05):
+            response = self.client.get('/api/early-out-requests/stream/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+            frames = [frame.decode() for frame in response.streaming_content]
+        self.assertEqual(frames[0], 'retry: 3000\n\n')
+        self.assertIn(': keep-alive\n\n', frames)
+
+    def test_prune_keeps_recent_events(self):
+        today = localdate()
+        for queue_date in (today, today - timedelta(days=30)):
+            EarlyOutEvent.objects.create(queue_date=queue_date, list_type='dealer', kind='add')
+        self.assertEqual(events.prune(days=7), 1)
+        self.assertEqual(list(EarlyOutEvent.objects.values_list('queue_date', flat=True)), [today])
+
+
+class PayoutTests(TestCase):
+    def test_allocation_sums_to_pool_with_ties_broken_by_id(self):
+        amounts = allocate(Decimal('100.00'), [('b', 8), ('a', 8), ('c', 8)])
+        self.assertEqual(amounts, {'a': Decimal('33.34'), 'b': Decimal('33.33'), 'c': Decimal('33.33')})
+
+        amounts = allocate(Decimal('1000.01'), [(key, hours) for key, hours in enumerate(['7.5', '8', '3.25', '0.5'])])
+        self.assertEqual(sum(amounts.values()), Decimal('1000.01'))
+
+    def test_no_hours_raises(self):
+        with self.assertRaises(PayoutError):
+            allocate(Decimal('100.00'), [('a', 0)])
+
+    def test_write_payouts_skips_zero_hour_sign_offs(self):
+        casino = Casino.objects.create(name='Test Casino')
+        toke = Tokes.objects.create(casino=casino, date=date(2025, 1, 15))
+        for employee_id, hours in (('800000040', 6), ('800000041', 2), ('800000042', 0)):
+            dealer = User.objects.create(username=employee_id, employee_id=employee_id, role='DEALER', casino=casino)
+            TokeSignOff.objects.create(user=dealer, toke=toke, shift_date=toke.date, actual_hours=hours)
+
+        self.assertEqual(write_payouts(toke, '100'), Decimal('12.50'))
+        self.assertEqual(
+            sorted(TokePayout.objects.values_list('hours', 'amount')),
+            [(Decimal('2.00'), Decimal('25.00')), (Decimal('6.00'), Decimal('75.00'))]
+        )
+
+        TokeSignOff.objects.filter(toke=toke).update(actual_hours=0)
+        with self.assertRaises(PayoutError):
+            write_payouts(toke, '100')
+
+
+class ShiftCalendarTests(TestCase):
+    def test_classify_many_matches_classify(self):
+        # Every 7 minutes over a DST change, crossing each day's grave-shift turnover
+        start = datetime(2025, 3, 8, 0, 0, tzinfo=timezone.utc)
+        values = [start + timedelta(minutes=7 * i) for i in range(3 * 24 * 60 // 7)]
+        # Either side of the default 01:30 turnover: swing of the 14th, then grave of the 15th
+        values += [datetime(2025, 1, 15, 9, 29, 59, tzinfo=timezone.utc), datetime(2025, 1, 15, 9, 30, tzinfo=timezone.utc)]
+
+        calendars = [
+            ShiftCalendar.default(),
+            # A grave shift starting in the evening moves the turnover to the next day
+            ShiftCalendar(
+                grave_start=dt_time(23, 0), grave_end=dt_time(7, 0),
+                day_start=dt_time(7, 0), day_end=dt_time(15, 0),
+                swing_start=dt_time(15, 0), swing_end=dt_time(23, 0)
+            ),
+        ]
+        for calendar in calendars:
+            with self.subTest(grave_start=calendar.times[0]):
+                self.assertEqual(calendar.classify_many(values), [calendar.classify(value) for value in values])
+
+        default = calendars[0]
+        self.assertEqual(default.classify_many(values[-2:]), [(date(2025, 1, 14), 2), (date(2025, 1, 15), 3)])
+
+
+class CasinoScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.casino = Casino.objects.create(name='Test Casino')
+        self.other = Casino.objects.create(name='Other Casino')
+        manager = User.objects.create(
+            username='800000070', employee_id='800000070', role='TOKE_MANAGER', casino=self.casino, has_pencil_flag=True
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token_pair(manager)['access']}"}
+        self.own_dealer = User.objects.create(username='800000071', employee_id='800000071', role='DEALER', casino=self.casino)
+        self.dealer = User.objects.create(username='800000072', employee_id='800000072', role='DEALER', casino=self.other)
+        User.objects.create(username='800000073', employee_id='800000073', role='SUPERVISOR', casino=self.other)
+        toke = Tokes.objects.create(casino=self.other, date=date(2025, 1, 15))
+        self.sign_off = TokeSignOff.objects.create(user=self.dealer, toke=toke, shift_date=toke.date, actual_hours=8)
+        today = localdate()
+        DealerVacation.objects.create(
+            user=self.dealer, start_date=today - timedelta(days=1), end_date=today + timedelta(days=1), status='APPROVED'
+        )
+
+    def test_other_casinos_sign_offs_are_not_found(self):
+        url = f'/api/toke-signoffs/{self.sign_off.pk}/'
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 404)
+        self.assertEqual(
+            self.client.patch(url, {'actual_hours': 1}, content_type='application/json', **self.auth).status_code, 404
+        )
+        response = self.client.post(
+            f'{url}update-hours/', {'actual_hours': 5}, content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 404)
+        self.sign_off.refresh_from_db()
+        self.assertEqual(self.sign_off.actual_hours, 8)
+        self.assertEqual(self.client.get('/api/toke-signoffs/', **self.auth).json()['results'], [])
+
+    def test_user_lists_are_scoped(self):
+        users = self.client.get('/api/users/', **self.auth).json()['results']
+        self.assertEqual({user['casino'] for user in users}, {str(self.casino.pk)})
+        self.assertEqual(self.client.get(f'/api/users/{self.dealer.pk}/', **self.auth).status_code, 404)
+
+        dealers = self.client.get('/api/dealers/', **self.auth).json()['data']
+        self.assertEqual([dealer['id'] for dealer in dealers], [self.own_dealer.pk])
+        self.assertEqual(self.client.get('/api/supervisors/', **self.auth).json()['data'], [])
+
+    def test_created_tokes_belong_to_the_callers_casino(self):
+        response = self.client.post('/api/tokes/', {'date': '2025-01-20'}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Tokes.objects.get(pk=response.json()['id']).casino_id, self.casino.pk)
+        self.assertEqual(self.client.get(f"/api/tokes/{response.json()['id']}/", **self.auth).status_code, 200)
+
+    def test_vacations_are_scoped(self):
+        self.assertEqual(self.client.get('/api/dealer-vacations/', **self.auth).json()['results'], [])
+        self.assertEqual(self.client.get('/api/dealer-vacations/current/', **self.auth).json(), [])
+        response = self.client.post('/api/dealer-vacations/', {
+            'user_id': self.dealer.pk, 'start_date': '2025-02-01', 'end_date': '2025-02-02'
+        }, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 400)
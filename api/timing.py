@@ -0,0 +1,83 @@
+"""
+Per-request timing counters behind the Server-Timing header.
+
+ServerTimingMiddleware starts a RequestTimings for each request and
+installs record_query as a database execute wrapper, so every query adds
+its count and duration without needing DEBUG. Code on the request path
+adds its own phases with timed(name): authentication and serialization do
+so. A phase that is re-entered (a nested serializer inside another, for
+example) is only counted once, by its outermost call. Outside a request
+timed() does nothing.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Header order; phases not listed here follow in the order they were recorded
+PHASES = ('total', 'view', 'db', 'auth', 'serialize')
+
+_local = threading.local()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = defaultdict(float)  # phase -> seconds
+        self.query_count = 0
+        self._active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['db'] += time.perf_counter() - started
+            self.query_count += 1
+
+    def milliseconds(self):
+        ordered = [name for name in PHASES if name in self.durations]
+        ordered += [name for name in self.durations if name not in PHASES]
+        return {name: self.durations[name] * 1000 for name in ordered}
+
+    def header(self, budget=None):
+        """The Server-Timing header value."""
+        entries = []
+        for name, ms in self.milliseconds().items():
+            if name == 'db':
+                noun = 'query' if self.query_count == 1 else 'queries'
+                entries.append(f'db;dur={ms:.1f};desc="{self.query_count} {noun}"')
+            else:
+                entries.append(f'{name};dur={ms:.1f}')
+        if budget and self.query_count > budget:
+            entries.append(f'query-budget;desc="{self.query_count} > {budget}"')
+        return ', '.join(entries)
+
+
+def start():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def stop():
+    _local.timings = None
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's phase."""
+    timings = current()
+    if timings is None or name in timings._active:
+        yield
+        return
+
+    timings._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - started
+        timings._active.discard(name)
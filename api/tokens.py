@@ -0,0 +1,51 @@
+"""
+JWTs issued to users.
+
+TokebookRefreshToken.for_user puts the claims the front end reads (role,
+casino, name, email and the pencil fields) on the refresh token. simplejwt
+copies them onto the access token it derives, and sets sub, jti, iat and
+exp itself from SIMPLE_JWT, so both tokens carry the same claims and
+expire after the configured lifetimes.
+
+StreamToken is for the early-out event stream only. EventSource cannot
+send an Authorization header, so the client trades its access token for
+a stream token and passes it as ?token=. Query strings end up in access
+logs, so a stream token only carries the user id and expires after
+STREAM_TOKEN_LIFETIME. It only needs to be valid when the connection
+opens. Its token_type is 'stream', so no other endpoint accepts it.
+Streams end every few minutes (sooner under WSGI, see api/events.py) and
+EventSource reconnects with the same URL, so once that is refused the
+client fetches a new stream token and opens the stream again.
+"""
+from datetime import timedelta
+from django.conf import settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+STREAM_TOKEN_LIFETIME = getattr(settings, 'STREAM_TOKEN_LIFETIME', timedelta(minutes=1))
+
+
+class TokebookRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['role'] = user.role
+        token['casino'] = user.casino.name if user.casino_id else None
+        token['name'] = f"{user.first_name} {user.last_name}".strip()
+        token['has_pencil_flag'] = user.has_pencil_flag
+        token['email'] = user.email
+        token['pencil_id'] = user.pencil_id
+        return token
+
+
+class StreamToken(Token):
+    token_type = 'stream'
+    lifetime = STREAM_TOKEN_LIFETIME
+
+
+def token_pair(user):
+    """The {'refresh', 'access'} strings returned by login and signup."""
+    refresh = TokebookRefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.views.decorators.csrf import csrf_exempt
-from .views import viewsets
-from .views.auth import login, signup, reset_password
+from .views import viewsets, tokes
+from .views.metrics import metrics
+from .views.auth import login, refresh_token, logout, signup, reset_password
 
 router = DefaultRouter()
 router.register(r'users', viewsets.UserViewSet)
@@ -14,10 +15,13 @@ router.register(r'discrepancies', viewsets.DiscrepancyViewSet, basename='discrep
 router.register(r'dealer-vacations', viewsets.DealerVacationViewSet, basename='dealer-vacations')
 router.register(r'supervisors', viewsets.SupervisorViewSet, basename='supervisors')
 router.register(r'early-out-requests', viewsets.EarlyOutRequestViewSet, basename='early-out-requests')
+router.register(r'rollups', viewsets.DailyRollupViewSet, basename='rollups')
 
 urlpatterns = [
     # Auth URLs
     path('auth/login/', csrf_exempt(login), name='login'),
+    path('auth/refresh/', csrf_exempt(refresh_token), name='token_refresh'),
+    path('auth/logout/', csrf_exempt(logout), name='logout'),
     path('auth/signup/', csrf_exempt(signup), name='signup'),
     path('auth/reset-password/', csrf_exempt(reset_password), name='reset_password'),
 
@@ -26,6 +30,9 @@ urlpatterns = [
     path('tokes/manage/current/', csrf_exempt(viewsets.TokesViewSet.as_view({'get': 'manage_current'})), name='manage_current_toke'),
     path('toke-signoffs/<uuid:pk>/update-hours/', csrf_exempt(viewsets.TokeSignOffViewSet.as_view({'post': 'update_hours'})), name='update_toke_hours'),
     path('tokes/<uuid:pk>/sign/', csrf_exempt(viewsets.TokesViewSet.as_view({'post': 'sign'})), name='sign_toke'),
+    path('tokes/<uuid:pk>/sign-bulk/', csrf_exempt(tokes.TokeViewSet.as_view({'post': 'sign_bulk'})), name='sign_toke_bulk'),
+    path('tokes/<uuid:pk>/finalize/', csrf_exempt(tokes.TokeViewSet.as_view({'post': 'finalize'})), name='finalize_toke'),
+    path('tokes/finalize-range/', csrf_exempt(tokes.TokeViewSet.as_view({'post': 'finalize_range'})), name='finalize_toke_range'),
     path('toke-signoffs/last_shift/', csrf_exempt(viewsets.TokeSignOffViewSet.as_view({'get': 'last_shift'})), name='last_shift'),
 
     # Discrepancy URLs
@@ -42,8 +49,13 @@ urlpatterns = [
     path('early-out-requests/current-list/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'get': 'current_list'})), name='early-out-request-current-list'),
     path('early-out-requests/add-to-list/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'post': 'add_to_list'})), name='early-out-request-add'),
     path('early-out-requests/<int:pk>/remove-from-list/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'delete': 'remove_from_list'})), name='early-out-request-remove'),
+    path('early-out-requests/my-position/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'get': 'my_position'})), name='early-out-request-my-position'),
+    path('early-out-requests/next/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'get': 'next_in_line'})), name='early-out-request-next'),
     path('early-out-requests/<int:pk>/authorize/', csrf_exempt(viewsets.EarlyOutRequestViewSet.as_view({'post': 'authorize'})), name='early-out-request-authorize'),
 
+    # Scraped by a metrics collector holding METRICS_TOKEN
+    path('metrics/', metrics, name='metrics'),
+
     # Router URLs
     path('', include(router.urls)),
 ]
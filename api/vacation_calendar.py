@@ -0,0 +1,64 @@
+"""
+Day-by-day vacation calendar.
+
+All vacations overlapping the window are loaded in one query. Each one is
+clipped to the window and turned into two events: the dealer joins the
+"off" set on the first day and leaves it the day after the last. A single
+pass over the sorted events then yields who is off on every day, so the
+cost grows with the number of vacations plus days, not their product.
+"""
+from collections import Counter
+from datetime import timedelta
+from .models import DealerVacation
+
+
+def build_calendar(casino_id, start_date, end_date, status='APPROVED'):
+    """
+    Return the compact calendar of a casino's dealers for a window: a list
+    of the dealers who are off at some point, and for each day the indexes
+    into that list of the dealers off that day.
+    """
+    vacations = DealerVacation.objects.overlapping(start_date, end_date).filter(
+        user__casino_id=casino_id,
+        status=status
+    ).select_related('user').order_by('user__last_name', 'user__first_name', 'user_id')
+
+    dealers = []
+    index = {}
+    events = []
+    for vacation in vacations:
+        user = vacation.user
+        if user.pk not in index:
+            index[user.pk] = len(dealers)
+            dealers.append({
+                'id': user.pk,
+                'name': user.get_full_name(),
+                'role': user.role
+            })
+        first = max(vacation.start_date, start_date)
+        last = min(vacation.end_date, end_date)
+        events.append((first, 1, index[user.pk]))
+        events.append((last + timedelta(days=1), -1, index[user.pk]))
+    events.sort()
+
+    # A dealer can have overlapping vacations, so count rather than flag
+    off = Counter()
+    days = []
+    position = 0
+    day = start_date
+    while day <= end_date:
+        while position < len(events) and events[position][0] <= day:
+            _, change, dealer = events[position]
+            off[dealer] += change
+            if not off[dealer]:
+                del off[dealer]
+            position += 1
+        days.append(sorted(off))
+        day += timedelta(days=1)
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'dealers': dealers,
+        'days': days
+    }
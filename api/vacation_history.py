@@ -0,0 +1,51 @@
+"""
+Cached twelve-month vacation history, grouped by month.
+
+The history for a casino is built from one query (vacations with their
+dealers and approvers joined in) and serialized in a single pass. It is
+cached per casino and dropped whenever one of that casino's vacations is
+saved or deleted. The cached copy also records the day it was built for,
+so the twelve-month window moves forward at midnight.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from .models import DealerVacation
+from .serializers import DealerVacationSerializer
+from .shifts import current_gaming_day
+
+HISTORY_CACHE_TIMEOUT = getattr(settings, 'VACATION_HISTORY_CACHE_TIMEOUT', 60 * 60)
+
+
+def _cache_key(casino_id):
+    return f'vacation_history:{casino_id or 0}'
+
+
+def build_history(casino_id, today):
+    """Approved vacations starting in the last 12 months, as {YYYY-MM: [vacation, ...]}, newest first."""
+    vacations = DealerVacation.objects.filter(
+        user__casino_id=casino_id,
+        status='APPROVED',
+        start_date__gte=today - timedelta(days=365),
+        start_date__lte=today
+    ).select_related('user__casino', 'approved_by__casino').order_by('-start_date')
+
+    grouped = {}
+    for vacation in DealerVacationSerializer(vacations, many=True).data:
+        # start_date is serialized as YYYY-MM-DD
+        grouped.setdefault(vacation['start_date'][:7], []).append(vacation)
+    return grouped
+
+
+def get_history(casino_id):
+    today = current_gaming_day(casino_id)
+    key = _cache_key(casino_id)
+    cached = cache.get(key)
+    if cached is None or cached['as_of'] != today:
+        cached = {'as_of': today, 'history': build_history(casino_id, today)}
+        cache.set(key, cached, HISTORY_CACHE_TIMEOUT)
+    return cached['history']
+
+
+def invalidate(casino_id):
+    cache.delete(_cache_key(casino_id))
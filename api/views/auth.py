@@ -1,15 +1,19 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate, get_user_model
-from django.utils import timezone
-from datetime import timedelta
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from django.contrib.auth import get_user_model
+from ..authentication import CustomModelBackend
 from ..serializers import UserSerializer
+from ..tokens import TokebookRefreshToken, token_pair
+from .. import revocation
 from ..middleware import log_action
+from ..log import get_logger
 
 User = get_user_model()
+log = get_logger(__name__)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -19,80 +23,107 @@ User = get_user_model()
 })
 def login(request):
     """Handle user login and return tokens."""
-    print('Login request data:', request.data)
     username = request.data.get('username')
     password = request.data.get('password')
 
-    print(f'Login attempt for username: {username}')
     if not username or not password:
+        log.info('login_failed', username=username, reason='missing_credentials')
         return Response(
             {'error': 'Both username and password are required'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    print(f'Attempting to authenticate user with username: {username}')
-    try:
-        existing_user = User.objects.get(username=username)
-        print(f'Found user in database: {existing_user.username}, active: {existing_user.is_active}')
-        print(f'Stored password hash: {existing_user.password}')
-    except User.DoesNotExist:
-        print(f'No user found with username: {username}')
-        existing_user = None
-
-    from api.authentication import CustomModelBackend
-    auth_backend = CustomModelBackend()
-    user = auth_backend.authenticate(request, username=username, password=password)
-    print(f'Authentication result for {username}:', 'Success' if user else 'Failed')
-    if not user and existing_user:
-        print('User exists but authentication failed - password mismatch')
+    user, reason = CustomModelBackend().check_credentials(username, password)
     if not user:
+        log.info('login_failed', username=username, reason=reason)
         return Response(
             {'error': 'Invalid credentials'},
             status=status.HTTP_401_UNAUTHORIZED
         )
 
-    print(f'Creating tokens for user {username}')
-
     # Update audit log details to indicate successful login
     request.audit_log_details['success'] = True
 
-    # Create refresh token
-    refresh = RefreshToken.for_user(user)
-    
-    # Add custom claims to both refresh and access tokens
-    for token in [refresh, refresh.access_token]:
-        # Essential claims for authentication
-        token['sub'] = str(user.id)  # Primary user identifier
-        token['token_type'] = 'refresh' if token == refresh else 'access'
-        token['jti'] = str(token['jti'])  # Ensure JTI is a string
-        
-        # User data claims
-        token['role'] = user.role
-        token['casino'] = user.casino
-        token['name'] = f"{user.first_name} {user.last_name}".strip()
-        token['has_pencil_flag'] = user.has_pencil_flag
-        token['email'] = user.email
-        if hasattr(user, 'pencil_id'):
-            token['pencil_id'] = user.pencil_id
-        
-        # Set token timestamps
-        now = timezone.now()
-        token['iat'] = int(now.timestamp())
-        token['exp'] = int((now + timedelta(days=30)).timestamp())  # 30 days expiry
-
-    serializer = UserSerializer(user)
-
     response_data = {
-        'user': serializer.data,
-        'tokens': {
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-        }
+        'user': UserSerializer(user).data,
+        'tokens': token_pair(user)
     }
-    print('Login response data:', response_data)
-    print('Access token:', str(refresh.access_token))
+    log.info('login_succeeded', user_id=user.id)
+    return Response(response_data)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def refresh_token(request):
+    """
+    Exchange a refresh token for a new access token with current claims.
+    With ROTATE_REFRESH_TOKENS a new refresh token is returned too, and
+    with BLACKLIST_AFTER_ROTATION the old one is revoked.
+    """
+    raw_token = request.data.get('refresh')
+    if not raw_token:
+        return Response(
+            {'error': 'Refresh token is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        refresh = TokebookRefreshToken(raw_token)
+    except TokenError:
+        return Response(
+            {'error': 'Invalid refresh token'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    if revocation.is_revoked(refresh['jti']):
+        return Response(
+            {'error': 'Refresh token has been revoked'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    user = User.objects.select_related('casino').filter(id=refresh['sub'], is_active=True).first()
+    if user is None:
+        return Response(
+            {'error': 'Invalid refresh token'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    new_refresh = TokebookRefreshToken.for_user(user)
+    response_data = {'access': str(new_refresh.access_token)}
+    if api_settings.ROTATE_REFRESH_TOKENS:
+        # Only one of two concurrent refreshes with the same token wins
+        if api_settings.BLACKLIST_AFTER_ROTATION and not revocation.revoke(refresh, user.id):
+            return Response(
+                {'error': 'Refresh token has been revoked'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        response_data['refresh'] = str(new_refresh)
     return Response(response_data)
 
+@api_view(['POST'])
+def logout(request):
+    """Revoke the caller's access token and, if one is sent, their refresh token."""
+    tokens = [request.auth]
+    raw_token = request.data.get('refresh')
+    if raw_token:
+        try:
+            refresh = TokebookRefreshToken(raw_token)
+        except TokenError:
+            return Response(
+                {'error': 'Invalid refresh token'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if refresh['sub'] != str(request.user.id):
+            return Response(
+                {'error': 'Refresh token belongs to another user'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        tokens.append(refresh)
+
+    for token in tokens:
+        revocation.revoke(token, request.user.id)
+    log.info('logout', user_id=request.user.id)
+    return Response({'message': 'Logged out'})
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def signup(request):
@@ -130,15 +161,9 @@ def signup(request):
     user.set_password(password)
     user.save()
 
-    # Generate tokens
-    refresh = RefreshToken.for_user(user)
-
     return Response({
         'user': serializer.data,
-        'tokens': {
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
-        }
+        'tokens': token_pair(user)
     }, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
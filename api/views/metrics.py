@@ -0,0 +1,27 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+from .. import metrics as request_metrics
+
+# Scrapers send "Authorization: Bearer <METRICS_TOKEN>". The client address
+# is no proof of a local scraper: behind a reverse proxy on the same host
+# every request arrives from 127.0.0.1. Without a token the endpoint is off.
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', None)
+
+@require_GET
+def metrics(request):
+    """Request latency, database time and status counts in the Prometheus text format."""
+    if not METRICS_TOKEN:
+        return HttpResponseForbidden('Metrics are disabled; set METRICS_TOKEN to enable them')
+
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        response = HttpResponse('Invalid metrics token', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+
+    return HttpResponse(
+        request_metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
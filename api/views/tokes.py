@@ -1,85 +1,155 @@
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from django.utils import timezone
-from django.db import IntegrityError, models
-from django.db.models import F
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from ..models import TokeSignOff, DealerVacation, EarlyOutRequest, Tokes
+from ..models import TokeSignOff, DealerVacation, EarlyOutRequest, Tokes, User
 from ..serializers import TokeSignOffSerializer
+from ..roster import roster_response
+from ..shifts import current_gaming_day
+from ..payouts import write_payouts, PayoutError
+from .. import rollups, roster
+
+FINALIZE_ERRORS = {
+    'finalized': 'Toke list is already finalized',
+    'no_pool': 'Pool amount must be set before finalizing',
+    'no_hours': 'No valid hours found for toke distribution',
+}
+
+def finalize_tokes(toke_ids):
+    """
+    Finalize tokes with set-based updates inside a single transaction.
+    Returns (finalized, skipped): the finalized Tokes and a dict mapping each
+    skipped toke id to a FINALIZE_ERRORS key.
+    """
+    with transaction.atomic():
+        tokes = list(Tokes.objects.select_for_update().filter(pk__in=toke_ids))
+
+        # Total actual hours per toke in one aggregate query
+        total_hours = dict(
+            TokeSignOff.objects.filter(
+                toke_id__in=[t.pk for t in tokes],
+                actual_hours__isnull=False
+            ).values('toke_id').annotate(
+                total=Sum('actual_hours')
+            ).values_list('toke_id', 'total')
+        )
+
+        finalized, skipped = [], {}
+        for toke in tokes:
+            if toke.finalized:
+                skipped[toke.pk] = 'finalized'
+            elif not toke.per_hour_rate:
+                skipped[toke.pk] = 'no_pool'
+            elif not total_hours.get(toke.pk) or total_hours[toke.pk] <= 0:
+                skipped[toke.pk] = 'no_hours'
+            else:
+                finalized.append(toke)
+
+        if finalized:
+            # Settle payouts against the final hours
+            for toke in finalized:
+                if toke.pool_amount:
+                    write_payouts(toke, toke.pool_amount)
+
+            finalized_ids = [t.pk for t in finalized]
+            # Copy actual hours into toke hours for every sign-off in one UPDATE
+            TokeSignOff.objects.filter(
+                toke_id__in=finalized_ids
+            ).update(toke_hours=F('actual_hours'), updated_at=timezone.now())
+            Tokes.objects.filter(
+                pk__in=finalized_ids
+            ).update(finalized=True, updated_at=timezone.now())
+            # The UPDATEs above bypass the sign-off signals
+            for toke in finalized:
+                rollups.schedule_refresh(toke.date, casino_id=toke.casino_id)
+
+    return finalized, skipped
+
+# Largest batch accepted by sign_bulk
+MAX_BULK_SIGN_OFFS = 500
+
+def parse_sign_off_fields(hours, shift_start, shift_end):
+    """
+    Validate the hours and shift times of a sign-off.
+    Returns hours as a float; raises ValueError with a user-facing message.
+    """
+    try:
+        hours = float(hours)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid hours format. Must be a number')
+    if hours <= 0 or hours > 24:
+        raise ValueError('Hours must be between 0 and 24')
+
+    try:
+        datetime.strptime(shift_start, '%H:%M:%S')
+        datetime.strptime(shift_end, '%H:%M:%S')
+    except (TypeError, ValueError):
+        raise ValueError('Invalid time format. Use HH:MM:SS')
+    return hours
+
+def sign_toke(request, pk):
+    """Sign off for tokes with scheduled and actual hours."""
+    try:
+        # Get required fields
+        hours = request.data.get('hours')
+        shift_start = request.data.get('shift_start')
+        shift_end = request.data.get('shift_end')
+        shift_date = request.data.get('shift_date')
+
+        # Validate input
+        if not all([hours is not None, shift_start, shift_end, shift_date]):
+            return Response(
+                {'error': 'Missing required fields'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-class TokeViewSet(viewsets.ViewSet):
-    permission_classes = [IsAuthenticated]
-
-    @action(detail=True, methods=['post'])
-    def sign(self, request, pk=None):
-        """Sign off for tokes with scheduled and actual hours."""
         try:
-            # Get required fields
-            hours = request.data.get('hours')
-            shift_start = request.data.get('shift_start')
-            shift_end = request.data.get('shift_end')
-            shift_date = request.data.get('shift_date')
-
-            # Validate input
-            if not all([hours is not None, shift_start, shift_end, shift_date]):
-                return Response(
-                    {'error': 'Missing required fields'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Validate hours
-            try:
-                hours = float(hours)
-                if hours <= 0 or hours > 24:
-                    return Response(
-                        {'error': 'Hours must be between 0 and 24'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except (TypeError, ValueError):
-                return Response(
-                    {'error': 'Invalid hours format. Must be a number'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            hours = parse_sign_off_fields(hours, shift_start, shift_end)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Parse shift_date string into date object
-            try:
-                shift_date_obj = datetime.strptime(shift_date, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid shift date format. Use YYYY-MM-DD'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        # Parse shift_date string into date object
+        try:
+            shift_date_obj = datetime.strptime(shift_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid shift date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Validate time formats
-            try:
-                datetime.strptime(shift_start, '%H:%M:%S')
-                datetime.strptime(shift_end, '%H:%M:%S')
-            except ValueError:
-                return Response(
-                    {'error': 'Invalid time format. Use HH:MM:SS'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        # Get the toke and validate it exists
+        try:
+            toke = Tokes.objects.get(pk=pk, casino_id=request.user.casino_id)
+        except Tokes.DoesNotExist:
+            return Response(
+                {'error': 'Toke not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            # Get the toke and validate it exists
-            try:
-                toke = Tokes.objects.get(pk=pk)
-            except Tokes.DoesNotExist:
-                return Response(
-                    {'error': 'Toke not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        if toke.finalized:
+            return Response(
+                {'error': FINALIZE_ERRORS['finalized']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # Validate shift_date matches toke date
-            if shift_date_obj != toke.date:
-                return Response(
-                    {'error': 'Shift date must match toke date'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        # Validate shift_date matches toke date
+        if shift_date_obj != toke.date:
+            return Response(
+                {'error': 'Shift date must match toke date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            try:
-                # Create sign off
+        try:
+            # Savepoint, so a duplicate leaves any surrounding transaction usable
+            with transaction.atomic():
                 sign_off = TokeSignOff.objects.create(
                     user=request.user,
                     toke=toke,  # Use toke object instead of toke_id
@@ -90,16 +160,154 @@ class TokeViewSet(viewsets.ViewSet):
                     actual_hours=hours,     # Initially set actual hours to scheduled
                     original_hours=hours    # Store original hours
                 )
-            except IntegrityError:
+        except IntegrityError:
+            return Response(
+                {'error': 'You have already signed off for this toke period'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'success': True,
+            'data': TokeSignOffSerializer(sign_off).data
+        })
+
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+class TokeViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=True, methods=['post'])
+    def sign(self, request, pk=None):
+        """Sign off for tokes with scheduled and actual hours."""
+        return sign_toke(request, pk)
+
+    @action(detail=True, methods=['post'])
+    def sign_bulk(self, request, pk=None):
+        """
+        Sign off many dealers for one toke. Takes sign_offs, a list of
+        {user_id or employee_id, shift_start, shift_end, hours}. Valid rows are
+        inserted together; invalid rows are reported by index and skipped.
+        """
+        if request.user.role not in ['CASINO_MANAGER', 'TOKE_MANAGER']:
+            return Response(
+                {'error': 'Only casino managers and toke managers can sign off dealers in bulk'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        rows = request.data.get('sign_offs')
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {'error': 'sign_offs must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_BULK_SIGN_OFFS:
+            return Response(
+                {'error': f'At most {MAX_BULK_SIGN_OFFS} sign-offs can be submitted at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            try:
+                toke = Tokes.objects.get(pk=pk, casino_id=request.user.casino_id)
+            except Tokes.DoesNotExist:
+                return Response(
+                    {'error': 'Toke not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if toke.finalized:
                 return Response(
-                    {'error': 'You have already signed off for this toke period'},
+                    {'error': FINALIZE_ERRORS['finalized']},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            # Look up every referenced dealer and existing sign-off up front
+            rows = [row if isinstance(row, dict) else {} for row in rows]
+            user_ids = {str(row['user_id']) for row in rows if row.get('user_id') is not None}
+            employee_ids = {str(row['employee_id']) for row in rows if row.get('employee_id')}
+            users = User.objects.filter(
+                models.Q(pk__in=[i for i in user_ids if i.isdigit()]) |
+                models.Q(employee_id__in=employee_ids),
+                casino_id=toke.casino_id,
+                is_active=True
+            )
+            users_by_id = {str(u.pk): u for u in users}
+            users_by_employee_id = {u.employee_id: u for u in users_by_id.values() if u.employee_id}
+            signed = set(TokeSignOff.objects.filter(
+                toke=toke,
+                user_id__in=[u.pk for u in users_by_id.values()]
+            ).values_list('user_id', flat=True))
+
+            errors = []
+            sign_offs = []
+            batch_users = set()
+            for index, row in enumerate(rows):
+                if row.get('user_id') is not None:
+                    user = users_by_id.get(str(row['user_id']))
+                else:
+                    user = users_by_employee_id.get(str(row.get('employee_id')))
+                if user is None:
+                    errors.append({'index': index, 'error': 'Dealer not found'})
+                    continue
+                if user.pk in signed:
+                    errors.append({'index': index, 'error': 'Dealer has already signed off for this toke period'})
+                    continue
+                if user.pk in batch_users:
+                    errors.append({'index': index, 'error': 'Dealer is listed more than once'})
+                    continue
+
+                try:
+                    hours = parse_sign_off_fields(row.get('hours'), row.get('shift_start'), row.get('shift_end'))
+                except ValueError as e:
+                    errors.append({'index': index, 'error': str(e)})
+                    continue
+
+                batch_users.add(user.pk)
+                sign_offs.append((index, TokeSignOff(
+                    user=user,
+                    toke=toke,
+                    shift_date=toke.date,
+                    shift_start=row['shift_start'],
+                    shift_end=row['shift_end'],
+                    scheduled_hours=hours,
+                    actual_hours=hours,
+                    original_hours=hours
+                )))
+
+            created = []
+            if sign_offs:
+                with transaction.atomic():
+                    # A dealer signing off on their own meanwhile is skipped
+                    # rather than failing the whole batch
+                    TokeSignOff.objects.bulk_create(
+                        [sign_off for _, sign_off in sign_offs],
+                        ignore_conflicts=True
+                    )
+                    inserted = set(TokeSignOff.objects.filter(
+                        pk__in=[sign_off.pk for _, sign_off in sign_offs]
+                    ).values_list('pk', flat=True))
+
+                    for index, sign_off in sign_offs:
+                        if sign_off.pk in inserted:
+                            created.append((index, sign_off))
+                        else:
+                            errors.append({'index': index, 'error': 'Dealer has already signed off for this toke period'})
+
+                    # bulk_create sends no post_save signals
+                    transaction.on_commit(lambda: roster.sign_offs_changed(toke.casino_id, toke.date))
+                    rollups.schedule_refresh(toke.date, casino_id=toke.casino_id)
+
             return Response({
-                'success': True,
-                'data': TokeSignOffSerializer(sign_off).data
-            })
+                'success': not errors,
+                'created': [
+                    {'index': index, 'id': str(sign_off.pk), 'user_id': sign_off.user_id}
+                    for index, sign_off in created
+                ],
+                'errors': sorted(errors, key=lambda e: e['index'])
+            }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
             return Response(
@@ -110,47 +318,94 @@ class TokeViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['post'])
     def finalize(self, request, pk=None):
         """Finalize a toke list and calculate per-hour rates."""
+        if request.user.role not in ['CASINO_MANAGER', 'TOKE_MANAGER']:
+            return Response(
+                {'error': 'Only casino managers and toke managers can finalize toke lists'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         try:
-            toke = Tokes.objects.get(pk=pk)
-            
-            if toke.finalized:
+            toke_ids = list(
+                Tokes.objects.filter(pk=pk, casino_id=request.user.casino_id).values_list('pk', flat=True)
+            )
+            if not toke_ids:
+                raise Tokes.DoesNotExist
+
+            finalized, skipped = finalize_tokes(toke_ids)
+
+            if skipped:
                 return Response(
-                    {'error': 'Toke list is already finalized'},
+                    {'error': FINALIZE_ERRORS[next(iter(skipped.values()))]},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-                
-            if not toke.per_hour_rate:
+
+            return Response({'success': True})
+
+        except Tokes.DoesNotExist:
+            return Response(
+                {'error': 'Toke not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'])
+    def finalize_range(self, request):
+        """Finalize every toke list between start_date and end_date in one transaction."""
+        if request.user.role not in ['CASINO_MANAGER', 'TOKE_MANAGER']:
+            return Response(
+                {'error': 'Only casino managers and toke managers can finalize toke lists'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            start_date = request.data.get('start_date')
+            end_date = request.data.get('end_date')
+            if not start_date or not end_date:
                 return Response(
-                    {'error': 'Pool amount must be set before finalizing'},
+                    {'error': 'start_date and end_date are required'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Calculate total hours and per-hour rate
-            sign_offs = TokeSignOff.objects.filter(toke=toke)
-            total_hours = sum(float(s.actual_hours) for s in sign_offs if s.actual_hours)
-            
-            if total_hours <= 0:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
                 return Response(
-                    {'error': 'No valid hours found for toke distribution'},
+                    {'error': 'Invalid date format. Use YYYY-MM-DD'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Set toke hours for each sign-off based on actual hours
-            for sign_off in sign_offs:
-                sign_off.toke_hours = sign_off.actual_hours
-                sign_off.save()
+            if end_date < start_date:
+                return Response(
+                    {'error': 'end_date must not be before start_date'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-            # Mark as finalized
-            toke.finalized = True
-            toke.save()
+            tokes = dict(Tokes.objects.filter(
+                casino_id=request.user.casino_id,
+                date__gte=start_date,
+                date__lte=end_date
+            ).values_list('id', 'date'))
 
-            return Response({'success': True})
+            finalized, skipped = finalize_tokes(list(tokes))
+
+            return Response({
+                'success': True,
+                'finalized': sorted(t.date.isoformat() for t in finalized),
+                'skipped': [
+                    {
+                        'id': str(toke_id),
+                        'date': tokes[toke_id].isoformat(),
+                        'error': FINALIZE_ERRORS[reason]
+                    }
+                    for toke_id, reason in sorted(skipped.items(), key=lambda item: tokes[item[0]])
+                ]
+            })
 
-        except Tokes.DoesNotExist:
-            return Response(
-                {'error': 'Toke not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
         except Exception as e:
             return Response(
                 {'error': str(e)},
@@ -160,8 +415,14 @@ class TokeViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['patch'])
     def update_pool(self, request, pk=None):
         """Update the pool amount for a toke list."""
+        if request.user.role not in ['CASINO_MANAGER', 'TOKE_MANAGER']:
+            return Response(
+                {'error': 'Only casino managers and toke managers can set the toke pool'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         try:
-            toke = Tokes.objects.get(pk=pk)
+            toke = Tokes.objects.get(pk=pk, casino_id=request.user.casino_id)
             
             if toke.finalized:
                 return Response(
@@ -170,26 +431,25 @@ class TokeViewSet(viewsets.ViewSet):
                 )
 
             pool_amount = request.data.get('total_pool_amount')
-            if not pool_amount or float(pool_amount) <= 0:
+            try:
+                pool_amount = Decimal(str(pool_amount))
+            except InvalidOperation:
+                pool_amount = None
+            if not pool_amount or not pool_amount.is_finite() or pool_amount <= 0:
                 return Response(
                     {'error': 'Invalid pool amount'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Calculate per-hour rate
-            sign_offs = TokeSignOff.objects.filter(toke=toke)
-            total_hours = sum(float(s.actual_hours) for s in sign_offs if s.actual_hours)
-            
-            if total_hours <= 0:
+            # Split the pool into exact per-dealer payouts and store them
+            try:
+                per_hour_rate = write_payouts(toke, pool_amount)
+            except PayoutError as e:
                 return Response(
-                    {'error': 'No valid hours found for rate calculation'},
+                    {'error': str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            per_hour_rate = float(pool_amount) / total_hours
-            toke.per_hour_rate = per_hour_rate
-            toke.save()
-
             return Response({'success': True, 'per_hour_rate': per_hour_rate})
 
         except Tokes.DoesNotExist:
@@ -207,19 +467,20 @@ class TokeViewSet(viewsets.ViewSet):
     def previous_day(self, request):
         """Get previous day's toke list for distribution."""
         try:
-            # Get yesterday's date in the casino's timezone
-            yesterday = timezone.localtime().date() - timedelta(days=1)
+            # The gaming day before today's, for the user's casino
+            yesterday = current_gaming_day(request.user.casino_id) - timedelta(days=1)
             
             # Get or create yesterday's distribution toke list
             toke, created = Tokes.objects.get_or_create(
+                casino_id=request.user.casino_id,
                 date=yesterday,
                 defaults={'is_collection_day': False}
             )
             
-            # Get all sign-offs for yesterday
+            # Get all sign-offs for yesterday with their stored payouts
             sign_offs = TokeSignOff.objects.filter(
                 toke=toke
-            ).select_related('user')
+            ).select_related('user', 'payout')
 
             # Format response
             response_data = {
@@ -239,7 +500,7 @@ class TokeViewSet(viewsets.ViewSet):
                     'scheduled_hours': float(sign_off.scheduled_hours),
                     'actual_hours': float(sign_off.actual_hours) if sign_off.actual_hours else None,
                     'original_hours': float(sign_off.original_hours) if sign_off.original_hours else None,
-                    'toke_amount': float(sign_off.toke_hours) if sign_off.toke_hours else None
+                    'toke_amount': float(sign_off.payout.amount) if hasattr(sign_off, 'payout') else None
                 } for sign_off in sign_offs],
                 'summary': {
                     'total_scheduled_hours': sum(float(s.scheduled_hours) for s in sign_offs),
@@ -262,82 +523,18 @@ class TokeViewSet(viewsets.ViewSet):
     def current(self, request):
         """Get today's toke sign-offs including vacation and early-out information."""
         try:
-            # Get today's date in the casino's timezone
-            today = timezone.localtime().date()
+            # Today's gaming day for the user's casino
+            today = current_gaming_day(request.user.casino_id)
             
             # Get or create today's collection toke list
             toke, created = Tokes.objects.get_or_create(
+                casino_id=request.user.casino_id,
                 date=today,
                 defaults={'is_collection_day': True}
             )
             
-            # Get all sign-offs for today
-            sign_offs = TokeSignOff.objects.filter(
-                toke=toke
-            ).select_related('user')
-
-            # Get all dealers on vacation today
-            vacations = DealerVacation.objects.filter(
-                start_date__lte=today,
-                end_date__gte=today
-            ).select_related('user')
-
-            # Create vacation sign-offs
-            vacation_sign_offs = []
-            for vacation in vacations:
-                # Skip if dealer already signed in
-                if not sign_offs.filter(user=vacation.user).exists():
-                    vacation_sign_offs.append(TokeSignOff(
-                        user=vacation.user,
-                        toke=toke,
-                        shift_date=today,
-                        shift_start="00:00",
-                        shift_end="00:00",
-                        scheduled_hours=8.0,  # Default to 8 hours for vacation
-                        actual_hours=8.0,     # Same for actual hours
-                        original_hours=8.0,   # And original hours
-                        is_on_vacation=True
-                    ))
-
-            # Get early-out requests for today's sign-offs
-            early_outs = EarlyOutRequest.objects.filter(
-                user__in=[s.user for s in sign_offs],
-                requested_at__date=today,
-                status__in=['PENDING', 'APPROVED']
-            ).select_related('user')
-
-            # Create early-out lookup
-            early_out_lookup = {
-                eo.user_id: {
-                    'id': eo.id,
-                    'status': eo.status,
-                    'hours_worked': eo.hours_worked if eo.status == 'APPROVED' else None
-                }
-                for eo in early_outs
-            }
-
-            # Combine regular and vacation sign-offs
-            all_sign_offs = list(sign_offs) + vacation_sign_offs
-
-            # Format response
-            response_data = {
-                'id': str(today),
-                'date': today.isoformat(),
-                'signOffs': [{
-                    'id': str(sign_off.id) if not getattr(sign_off, 'is_on_vacation', False) else f"v-{sign_off.user.id}",
-                    'user': {
-                        'id': str(sign_off.user.id),
-                        'name': sign_off.user.get_full_name(),
-                        'role': sign_off.user.role
-                    },
-                    'shift_start': sign_off.shift_start,
-                    'shift_end': sign_off.shift_end,
-                    'scheduled_hours': sign_off.scheduled_hours,
-                    'actual_hours': sign_off.actual_hours,
-                    'early_out': early_out_lookup.get(sign_off.user.id),
-                    'is_on_vacation': getattr(sign_off, 'is_on_vacation', False)
-                } for sign_off in all_sign_offs]
-            }
+            # Sign-offs, vacations and early-outs come from the cached roster
+            response_data = roster_response(request.user.casino_id, today)
 
             return Response(response_data)
 
@@ -1,12 +1,35 @@
-from rest_framework import viewsets, status
+import calendar
+from datetime import datetime, timedelta
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from django.db import models
-from ..models import TokeSignOff, Tokes, EarlyOutRequest, Casino, Discrepancy, DealerVacation, User
+from django.db import models, transaction
+from django.http import StreamingHttpResponse
+from ..models import TokeSignOff, Tokes, EarlyOutRequest, Casino, Discrepancy, DealerVacation, DailyRollup, User
+from ..roster import roster_response
+from ..early_out_queue import EarlyOutQueue, SHIFT_NUMBERS, LIST_TYPES
+from ..renderers import EventStreamRenderer, NDJSONRenderer, CSVRenderer
+from ..exports import EXPORT_FORMATS, export_rows
+from ..vacation_calendar import build_calendar
+from ..shifts import current_gaming_day
+from ..pagination import (
+    TokesPagination,
+    TokeSignOffPagination,
+    DiscrepancyPagination,
+    DealerVacationPagination,
+    DailyRollupPagination,
+    UserPagination
+)
+from .. import events, rollups, vacation_history
+from ..idempotency import idempotent
+from .tokes import sign_toke
+from ..log import get_logger, HOT_PATH_SAMPLE_RATE
 from ..serializers import (
     TokeSignOffSerializer,
     TokesSerializer,
@@ -14,14 +37,29 @@ from ..serializers import (
     UserSerializer,
     CasinoSerializer,
     DiscrepancySerializer,
-    DealerVacationSerializer
+    DealerVacationSerializer,
+    DailyRollupSerializer
 )
 
 User = get_user_model()
+log = get_logger(__name__)
+
+REPORT_ROLES = ['ACCOUNTING', 'TOKE_MANAGER', 'CASINO_MANAGER', 'ADMIN']
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('casino')
     serializer_class = UserSerializer
+    pagination_class = UserPagination
+
+    def get_queryset(self):
+        return self.queryset.filter(casino_id=self.request.user.casino_id)
+
+    def perform_create(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
+
+    def perform_update(self, serializer):
+        # Users stay in the casino they were created in
+        serializer.save(casino_id=self.request.user.casino_id)
 
 class CasinoViewSet(viewsets.ModelViewSet):
     queryset = Casino.objects.all()
@@ -29,16 +67,19 @@ class CasinoViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def shift_times(self, request):
-        """Get shift times for a casino by name."""
+        """Get shift times for a casino by name, default the user's own casino."""
         casino_name = request.query_params.get('name')
-        if not casino_name:
+        if not casino_name and not request.user.casino_id:
             return Response(
                 {'error': 'Casino name is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
             
         try:
-            casino = Casino.objects.get(name=casino_name)
+            if casino_name:
+                casino = Casino.objects.get(name=casino_name)
+            else:
+                casino = Casino.objects.get(pk=request.user.casino_id)
             return Response({
                 'grave_start': casino.grave_start.strftime('%H:%M'),
                 'grave_end': casino.grave_end.strftime('%H:%M'),
@@ -50,7 +91,7 @@ class CasinoViewSet(viewsets.ModelViewSet):
             })
         except Casino.DoesNotExist:
             return Response(
-                {'error': f'Casino "{casino_name}" not found'},
+                {'error': f'Casino "{casino_name or request.user.casino_id}" not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
@@ -71,62 +112,34 @@ class CasinoViewSet(viewsets.ModelViewSet):
 
 class TokesViewSet(viewsets.ModelViewSet):
     serializer_class = TokesSerializer
+    pagination_class = TokesPagination
 
     def get_queryset(self):
-        return Tokes.objects.all().order_by('-date')
+        return Tokes.objects.filter(casino_id=self.request.user.casino_id).order_by('-date')
+
+    def perform_create(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def sign(self, request, pk=None):
         """Sign off for tokes with scheduled and actual hours."""
-        try:
-            # Get required fields
-            hours = request.data.get('hours')
-            shift_start = request.data.get('shift_start')
-            shift_end = request.data.get('shift_end')
-            shift_date = request.data.get('shift_date')
-
-            # Validate input
-            if not all([hours, shift_start, shift_end, shift_date]):
-                return Response(
-                    {'error': 'Missing required fields'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Create sign off
-            sign_off = TokeSignOff.objects.create(
-                user=request.user,
-                toke_id=pk,
-                shift_date=shift_date,
-                shift_start=shift_start,
-                shift_end=shift_end,
-                scheduled_hours=hours,  # Set scheduled hours
-                actual_hours=hours,     # Initially set actual hours to scheduled
-                original_hours=hours    # Store original hours
-            )
-
-            return Response({
-                'success': True,
-                'data': TokeSignOffSerializer(sign_off).data
-            })
-
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Same checks as TokeViewSet.sign: the caller's casino, not finalized, once per dealer
+        return sign_toke(request, pk)
 
     @action(detail=False, methods=['get', 'post'])
     def create_toke(self, request):
         """Create a new toke for today."""
         try:
-            today = timezone.now().date()
-            current_toke = Tokes.objects.filter(date=today).first()
+            casino_id = request.user.casino_id
+            today = current_gaming_day(casino_id)
+            current_toke = Tokes.objects.filter(casino_id=casino_id, date=today).first()
             
             if current_toke:
                 serializer = self.get_serializer(current_toke)
                 return Response(serializer.data)
             
-            current_toke = Tokes.objects.create(date=today)
+            current_toke = Tokes.objects.create(casino_id=casino_id, date=today)
             serializer = self.get_serializer(current_toke)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -140,75 +153,11 @@ class TokesViewSet(viewsets.ModelViewSet):
     def current(self, request):
         """Get today's toke sign-offs including vacation and early-out information."""
         try:
-            # Get today's date in the casino's timezone
-            today = timezone.localtime().date()
-            
-            # Get all sign-offs for today
-            sign_offs = TokeSignOff.objects.filter(
-                shift_date=today
-            ).select_related('user')
-
-            # Get all dealers on vacation today
-            vacations = DealerVacation.objects.filter(
-                start_date__lte=today,
-                end_date__gte=today
-            ).select_related('user')
-
-            # Create vacation sign-offs
-            vacation_sign_offs = []
-            for vacation in vacations:
-                # Skip if dealer already signed in
-                if not sign_offs.filter(user=vacation.user).exists():
-                    vacation_sign_offs.append(TokeSignOff(
-                        user=vacation.user,
-                        shift_date=today,
-                        shift_start="00:00",
-                        shift_end="00:00",
-                        scheduled_hours=8.0,  # Default to 8 hours for vacation
-                        actual_hours=8.0,     # Same for actual hours
-                        original_hours=8.0,   # And original hours
-                        is_on_vacation=True
-                    ))
-
-            # Get early-out requests for today's sign-offs
-            early_outs = EarlyOutRequest.objects.filter(
-                user__in=[s.user for s in sign_offs],
-                requested_at__date=today,
-                status__in=['PENDING', 'APPROVED']
-            ).select_related('user')
-
-            # Create early-out lookup
-            early_out_lookup = {
-                eo.user_id: {
-                    'id': eo.id,
-                    'status': eo.status,
-                    'hours_worked': eo.hours_worked if eo.status == 'APPROVED' else None
-                }
-                for eo in early_outs
-            }
+            # Today's gaming day for the user's casino
+            today = current_gaming_day(request.user.casino_id)
 
-            # Combine regular and vacation sign-offs
-            all_sign_offs = list(sign_offs) + vacation_sign_offs
-
-            # Format response
-            response_data = {
-                'id': str(today),
-                'date': today.isoformat(),
-                'signOffs': [{
-                    'id': str(sign_off.id) if not getattr(sign_off, 'is_on_vacation', False) else f"v-{sign_off.user.id}",
-                    'user': {
-                        'id': str(sign_off.user.id),
-                        'name': sign_off.user.get_full_name(),
-                        'role': sign_off.user.role
-                    },
-                    'shift_start': sign_off.shift_start,
-                    'shift_end': sign_off.shift_end,
-                    'scheduled_hours': sign_off.scheduled_hours,
-                    'actual_hours': sign_off.actual_hours,
-                    'early_out': early_out_lookup.get(sign_off.user.id),
-                    'is_on_vacation': getattr(sign_off, 'is_on_vacation', False)
-                } for sign_off in all_sign_offs]
-            }
+            # Sign-offs, vacations and early-outs come from the cached roster
+            response_data = roster_response(request.user.casino_id, today)
 
             return Response(response_data)
 
@@ -221,8 +170,9 @@ class TokesViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def manage_current(self, request):
         """Get current toke for management."""
-        today = timezone.now().date()
-        current_toke = Tokes.objects.filter(date=today).first()
+        casino_id = request.user.casino_id
+        today = current_gaming_day(casino_id)
+        current_toke = Tokes.objects.filter(casino_id=casino_id, date=today).first()
         
         if not current_toke:
             return Response(
@@ -234,12 +184,17 @@ class TokesViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 class TokeSignOffViewSet(viewsets.ModelViewSet):
-    queryset = TokeSignOff.objects.all()
+    queryset = TokeSignOff.objects.select_related('user__casino', 'payout')
     serializer_class = TokeSignOffSerializer
+    pagination_class = TokeSignOffPagination
+
+    def get_queryset(self):
+        return self.queryset.filter(toke__casino_id=self.request.user.casino_id)
 
     @action(detail=True, methods=['post'])
     def update_hours(self, request, pk=None):
         """Update actual hours for a toke sign off."""
+        signoff = self.get_object()
         try:
             # Validate user has pencil access
             if not request.user.has_pencil_flag:
@@ -248,8 +203,6 @@ class TokeSignOffViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            signoff = self.get_object()
-
             # Validate request body
             actual_hours = request.data.get('actual_hours')
             if actual_hours is None or not isinstance(actual_hours, (int, float)):
@@ -290,9 +243,7 @@ class TokeSignOffViewSet(viewsets.ModelViewSet):
     def last_shift(self, request):
         """Get the last shift's toke sign-off for the current user."""
         try:
-            last_signoff = self.queryset.filter(
-                user=request.user
-            ).order_by('-shift_date').first()
+            last_signoff = self.queryset.latest_for_user(request.user).first()
 
             if not last_signoff:
                 return Response(
@@ -309,32 +260,126 @@ class TokeSignOffViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[NDJSONRenderer, CSVRenderer, JSONRenderer]
+    )
+    def export(self, request):
+        """Stream sign-offs with rates and payouts for a date range as NDJSON or CSV."""
+        if request.user.role not in REPORT_ROLES:
+            return Response(
+                {'error': 'Not authorized to export toke history'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        if not start_date or not end_date:
+            return Response(
+                {'error': 'start_date and end_date are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if end_date < start_date:
+            return Response(
+                {'error': 'end_date must not be before start_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shift = request.query_params.get('shift')
+        shift_number = SHIFT_NUMBERS.get(shift.lower()) if shift else None
+        if shift and not shift_number:
+            return Response(
+                {'error': 'Invalid shift'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # ?format=csv or an Accept header picks the format; NDJSON otherwise
+        export_format = request.accepted_renderer.format
+        content_type, write = EXPORT_FORMATS.get(export_format, EXPORT_FORMATS['ndjson'])
+        # Only the user's own casino is ever exported
+        rows = export_rows(request.user.casino_id, start_date, end_date, shift=shift_number)
+
+        response = StreamingHttpResponse(write(rows), content_type=content_type)
+        extension = 'csv' if export_format == 'csv' else 'ndjson'
+        response['Content-Disposition'] = (
+            f'attachment; filename="tokes-{start_date}-{end_date}.{extension}"'
+        )
+        return response
+
 from rest_framework.permissions import IsAuthenticated
-from ..authentication import CustomJWTAuthentication
+from ..authentication import CustomJWTAuthentication, StreamTokenAuthentication
+from ..tokens import StreamToken
 
 class EarlyOutRequestViewSet(viewsets.ModelViewSet):
-    queryset = EarlyOutRequest.objects.all()
+    # Creates and deletes go through EarlyOutQueue, which keeps the line's
+    # positions contiguous; updates can't touch the queue fields
     serializer_class = EarlyOutRequestSerializer
     authentication_classes = [CustomJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return EarlyOutRequest.objects.filter(casino_id=self.request.user.casino_id)
+
+    def perform_create(self, serializer):
+        """Join the back of the caller's line for today."""
+        list_type = self.request.query_params.get('list_type', 'dealer')
+        if list_type not in LIST_TYPES:
+            raise ValidationError({'list_type': 'Invalid list type'})
+
+        queue = EarlyOutQueue.for_user(self.request.user, list_type)
+        if EarlyOutRequest.objects.filter(
+            user=self.request.user,
+            queue_date=queue.queue_date,
+            status__in=['PENDING', 'APPROVED']
+        ).exists():
+            raise ValidationError({'error': 'You already have an early out request for today'})
+
+        serializer.instance = queue.enqueue(self.request.user, **serializer.validated_data)
+        events.publish(serializer.instance, 'add', serializer.data)
+
+    def perform_destroy(self, instance):
+        """Take the request out of line; it stays on record as REMOVED."""
+        if instance.user_id != self.request.user.id:
+            raise PermissionDenied('Not authorized to remove this request')
+        if instance.status != 'PENDING':
+            raise ValidationError({'error': 'Only pending requests can be removed'})
+
+        EarlyOutQueue.for_request(instance).remove(instance, 'REMOVED')
+        events.publish(instance, 'remove', self.get_serializer(instance).data)
+
     @action(detail=False, methods=['get'])
     def current_list(self, request):
         """Get list of early out requests for today."""
-        print('EarlyOutRequestViewSet.current_list() called')
-        print('User:', request.user)
-        print('User role:', getattr(request.user, 'role', None))
-        print('Auth header:', request.META.get('HTTP_AUTHORIZATION', 'No auth header'))
-        print('Query params:', request.query_params)
-        
-        today = timezone.now().date()
+        today = current_gaming_day(request.user.casino_id)
         list_type = request.query_params.get('list_type', 'dealer')
         shift = request.query_params.get('shift')
-        
-        # Get requests for today
+        log.debug(
+            'early_out_current_list',
+            user_id=request.user.id,
+            role=request.user.role,
+            list_type=list_type,
+            shift=shift,
+            sample=HOT_PATH_SAMPLE_RATE
+        )
+
+        # Get today's requests for this casino's list; a user has at most
+        # one active request per day, so no per-user de-duplication is needed
         queryset = EarlyOutRequest.objects.filter(
-            requested_at__date=today
-        ).exclude(status='REMOVED')
+            casino_id=request.user.casino_id,
+            queue_date=today,
+            list_type='supervisor' if list_type == 'supervisor' else 'dealer'
+        ).exclude(status='REMOVED').select_related('user', 'authorized_by')
 
         # Filter by status if provided
         status = request.query_params.get('status')
@@ -344,41 +389,27 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
             # Default to only PENDING and APPROVED
             queryset = queryset.filter(status__in=['PENDING', 'APPROVED'])
 
-        # Get the latest request for each user
-        latest_requests = {}
-        for req in queryset:
-            user_id = req.user_id
-            if user_id not in latest_requests or req.requested_at > latest_requests[user_id].requested_at:
-                latest_requests[user_id] = req
-
-        # Get the IDs of the latest requests
-        latest_request_ids = [req.id for req in latest_requests.values()]
-
-        # Filter to only include the latest request for each user
-        queryset = queryset.filter(id__in=latest_request_ids)
-
         # Filter by shift if provided
         if shift:
-            shift_mapping = {'day': 1, 'swing': 2, 'grave': 3}
-            shift_number = shift_mapping.get(shift.lower())
+            shift_number = SHIFT_NUMBERS.get(shift.lower())
             if shift_number:
-                queryset = queryset.filter(user__shift=shift_number)
-        
-        # Filter based on user role
-        if list_type == 'supervisor':
-            queryset = queryset.filter(user__role='SUPERVISOR')
-        else:  # dealer
-            queryset = queryset.filter(user__role='DEALER')
+                queryset = queryset.filter(shift=shift_number)
             
-        early_outs = queryset.order_by('requested_at')
+        early_outs = EarlyOutQueue.in_line_order(queryset)
         serializer = self.get_serializer(early_outs, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def add_to_list(self, request):
         """Add user to early out list."""
         try:
             list_type = request.query_params.get('list_type', 'dealer')
+            if list_type not in LIST_TYPES:
+                return Response(
+                    {'error': 'Invalid list type'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # Verify user role matches list type
             if list_type == 'supervisor' and request.user.role != 'SUPERVISOR':
@@ -393,20 +424,24 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                 )
             
             shift = request.query_params.get('shift')
-            shift_mapping = {'day': 1, 'swing': 2, 'grave': 3}
-            shift_number = shift_mapping.get(shift.lower()) if shift else None
-            print(f"Comparing shifts - User shift: {request.user.shift}, Request shift: {shift_number}")
+            shift_number = SHIFT_NUMBERS.get(shift.lower()) if shift else None
             if shift_number and request.user.shift != shift_number:
+                log.debug(
+                    'early_out_wrong_shift',
+                    user_id=request.user.id,
+                    user_shift=request.user.shift,
+                    requested_shift=shift_number
+                )
                 return Response(
                     {'error': 'You can only join the early out list for your assigned shift'},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
             # Check for any active requests for today
-            today = timezone.now().date()
+            queue = EarlyOutQueue.for_user(request.user, list_type, shift=shift_number)
             active_request = EarlyOutRequest.objects.filter(
                 user=request.user,
-                requested_at__date=today,
+                queue_date=queue.queue_date,
                 status__in=['PENDING', 'APPROVED']
             ).order_by('-requested_at').first()
 
@@ -416,16 +451,17 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Create new request
-            early_out = EarlyOutRequest.objects.create(
-                user=request.user,
+            # Create new request at the back of the line
+            early_out = queue.enqueue(
+                request.user,
                 pit_number=request.data.get('pit_number', ''),
-                table_number=request.data.get('table_number'),
-                status='PENDING'
+                table_number=request.data.get('table_number')
             )
             serializer = self.get_serializer(early_out)
+            events.publish(early_out, 'add', serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
+            log.exception('early_out_add_failed', user_id=request.user.id)
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -434,10 +470,10 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'])
     def remove_from_list(self, request, pk=None):
         """Remove user from early out list."""
+        early_out = self.get_object()
         try:
             list_type = request.query_params.get('list_type', 'dealer')
-            early_out = self.get_object()
-            
+
             # Verify user role matches list type
             if list_type == 'supervisor' and request.user.role != 'SUPERVISOR':
                 return Response(
@@ -456,8 +492,8 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
                 
-            early_out.status = 'REMOVED'
-            early_out.save()
+            EarlyOutQueue.for_request(early_out).remove(early_out, 'REMOVED')
+            events.publish(early_out, 'remove', self.get_serializer(early_out).data)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response(
@@ -468,6 +504,7 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def authorize(self, request, pk=None):
         """Authorize an early out request."""
+        early_out = self.get_object()
         try:
             # Only users with pencil_id or casino managers can authorize
             if not (request.user.pencil_id or request.user.role == 'CASINO_MANAGER'):
@@ -476,8 +513,6 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            early_out = self.get_object()
-            
             # Validate request status
             if early_out.status != 'PENDING':
                 return Response(
@@ -503,8 +538,8 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get the toke sign off for today
-            today = timezone.now().date()
+            # Get the toke sign off for the request's gaming day
+            today = early_out.queue_date or current_gaming_day(early_out.casino_id)
             toke_signoff = TokeSignOff.objects.filter(
                 user=early_out.user,
                 toke__date=today
@@ -516,18 +551,20 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Update early out request
-            early_out.status = 'APPROVED'
+            # Update early out request and take it out of the line
             early_out.authorized_by = request.user
             early_out.authorized_by_name = f"{request.user.first_name} {request.user.last_name}"
             early_out.hours_worked = hours_worked
             early_out.processed_at = timezone.now()
             early_out.toke_sign_off = toke_signoff
-            early_out.save()
+            # The approval and the sign-off hours are written together
+            with transaction.atomic():
+                EarlyOutQueue.for_request(early_out).remove(early_out, 'APPROVED')
+                events.publish(early_out, 'authorize', self.get_serializer(early_out).data)
 
-            # Update toke sign off actual hours
-            toke_signoff.actual_hours = hours_worked
-            toke_signoff.save()
+                # Update toke sign off actual hours
+                toke_signoff.actual_hours = hours_worked
+                toke_signoff.save()
 
             # Return response with toke sign-off ID if it's a dealer
             response_data = {
@@ -548,9 +585,115 @@ class EarlyOutRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def my_position(self, request):
+        """Get the current user's place in today's early out line."""
+        early_out = EarlyOutRequest.objects.filter(
+            user=request.user,
+            queue_date=current_gaming_day(request.user.casino_id),
+            position__isnull=False
+        ).first()
+
+        if not early_out:
+            return Response(
+                {'error': 'You are not on an early out list'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response({
+            'id': early_out.id,
+            'list_type': early_out.list_type,
+            'position': early_out.position,
+            'ahead': early_out.position - 1,
+            'total': EarlyOutQueue.for_request(early_out).size()
+        })
+
+    @action(detail=False, methods=['get'])
+    def next_in_line(self, request):
+        """Get the next N pending requests on an early out list."""
+        list_type = request.query_params.get('list_type', 'dealer')
+        if list_type not in LIST_TYPES:
+            return Response(
+                {'error': 'Invalid list type'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shift = request.query_params.get('shift')
+        shift_number = SHIFT_NUMBERS.get(shift.lower()) if shift else None
+        try:
+            count = max(1, min(int(request.query_params.get('count', 5)), 100))
+        except ValueError:
+            return Response(
+                {'error': 'count must be a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queue = EarlyOutQueue.for_user(request.user, list_type, shift=shift_number)
+        early_outs = queue.next(count).select_related('user', 'authorized_by')
+        serializer = self.get_serializer(early_outs, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='stream-token')
+    def stream_token(self, request):
+        """Issue a short-lived token for opening the event stream."""
+        token = StreamToken.for_user(request.user)
+        return Response({
+            'token': str(token),
+            'expires_in': int(StreamToken.lifetime.total_seconds())
+        })
+
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[EventStreamRenderer, JSONRenderer],
+        # EventSource cannot set headers, so a stream token in ?token= also works here
+        authentication_classes=[StreamTokenAuthentication, CustomJWTAuthentication]
+    )
+    def stream(self, request):
+        """Stream add, remove and authorize events for an early out list as Server-Sent Events."""
+        list_type = request.query_params.get('list_type', 'dealer')
+        if list_type not in LIST_TYPES:
+            return Response(
+                {'error': 'Invalid list type'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shift = request.query_params.get('shift')
+        shift_number = SHIFT_NUMBERS.get(shift.lower()) if shift else None
+        queue = EarlyOutQueue.for_user(request.user, list_type, shift=shift_number)
+
+        # EventSource resends the last id it saw when it reconnects
+        last_event_id = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else events.latest_event_id(queue)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid Last-Event-ID'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Under ASGI a waiting stream is an idle coroutine; under WSGI it holds
+        # this worker thread, so the sync stream ends sooner
+        if 'wsgi.version' in request.META:
+            frames = events.stream(queue, last_event_id)
+        else:
+            frames = events.astream(queue, last_event_id)
+        response = StreamingHttpResponse(frames, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class DiscrepancyViewSet(viewsets.ModelViewSet):
-    queryset = Discrepancy.objects.all()
     serializer_class = DiscrepancySerializer
+    pagination_class = DiscrepancyPagination
+
+    def get_queryset(self):
+        return Discrepancy.objects.filter(casino_id=self.request.user.casino_id).select_related(
+            'reported_by__casino', 'verified_by__casino', 'resolved_by__casino'
+        )
+
+    def perform_create(self, serializer):
+        serializer.save(reported_by=self.request.user, casino_id=self.request.user.casino_id)
 
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):
@@ -576,7 +719,8 @@ class DiscrepancyViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 from rest_framework.permissions import IsAuthenticated
-from ..authentication import CustomJWTAuthentication
+from ..authentication import CustomJWTAuthentication, StreamTokenAuthentication
+from ..tokens import StreamToken
 
 class DealerViewSet(viewsets.ModelViewSet):
     """
@@ -587,24 +731,25 @@ class DealerViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        print('DealerViewSet.get_queryset() called')
-        print('User:', self.request.user)
-        print('User role:', getattr(self.request.user, 'role', None))
-        print('Auth header:', self.request.META.get('HTTP_AUTHORIZATION', 'No auth header'))
-        print('Request method:', self.request.method)
-        print('Request path:', self.request.path)
-        
         # Check if user is authenticated
         if not self.request.user.is_authenticated:
-            print('User is not authenticated')
             return User.objects.none()
-        
+
         # Check user role
-        if self.request.user.role in ['CASINO_MANAGER', 'TOKE_MANAGER']:
-            print('User has correct role, returning dealers')
-            return User.objects.filter(role='DEALER').order_by('first_name', 'last_name')
-        
-        print('User does not have correct role')
+        allowed = self.request.user.role in ['CASINO_MANAGER', 'TOKE_MANAGER']
+        log.debug(
+            'dealer_list',
+            user_id=self.request.user.id,
+            role=self.request.user.role,
+            method=self.request.method,
+            allowed=allowed,
+            sample=HOT_PATH_SAMPLE_RATE
+        )
+        if allowed:
+            return User.objects.filter(
+                role='DEALER',
+                casino_id=self.request.user.casino_id
+            ).select_related('casino').order_by('first_name', 'last_name')
         return User.objects.none()
 
     def list(self, request, *args, **kwargs):
@@ -615,6 +760,12 @@ class DealerViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
 
+    def perform_create(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
+
+    def perform_update(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
+
     def create(self, request, *args, **kwargs):
         """Create a new dealer"""
         # Ensure required fields are set
@@ -629,7 +780,7 @@ class DealerViewSet(viewsets.ModelViewSet):
         # Create the user with all data including password
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        self.perform_create(serializer)
         return Response({
             'success': True,
             'data': serializer.data
@@ -645,7 +796,12 @@ class DealerViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            dealer = User.objects.get(employee_id=pk, role='DEALER', is_active=False)
+            dealer = User.objects.get(
+                employee_id=pk,
+                role='DEALER',
+                is_active=False,
+                casino_id=request.user.casino_id
+            )
             return Response({
                 'success': True,
                 'data': {
@@ -731,7 +887,10 @@ class SupervisorViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role in ['CASINO_MANAGER', 'TOKE_MANAGER']:
-            return User.objects.filter(role='SUPERVISOR').order_by('first_name', 'last_name')
+            return User.objects.filter(
+                role='SUPERVISOR',
+                casino_id=user.casino_id
+            ).select_related('casino').order_by('first_name', 'last_name')
         return User.objects.none()
 
     def list(self, request, *args, **kwargs):
@@ -742,6 +901,12 @@ class SupervisorViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
 
+    def perform_create(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
+
+    def perform_update(self, serializer):
+        serializer.save(casino_id=self.request.user.casino_id)
+
     def create(self, request, *args, **kwargs):
         """Create a new supervisor"""
         data = request.data.copy()
@@ -755,7 +920,7 @@ class SupervisorViewSet(viewsets.ModelViewSet):
         # Create the user with all data including password
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response({
             'success': True,
@@ -829,14 +994,15 @@ class SupervisorViewSet(viewsets.ModelViewSet):
         })
 
 class DealerVacationViewSet(viewsets.ModelViewSet):
-    queryset = DealerVacation.objects.all()
+    queryset = DealerVacation.objects.select_related('user__casino', 'approved_by__casino')
     serializer_class = DealerVacationSerializer
+    pagination_class = DealerVacationPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.role in ['CASINO_MANAGER', 'TOKE_MANAGER']:
-            # Casino managers and toke managers can see all vacations
-            queryset = self.queryset
+            # Casino managers and toke managers can see every vacation in their casino
+            queryset = self.queryset.filter(user__casino_id=user.casino_id)
         else:
             # Other users can only see their own vacations
             queryset = self.queryset.filter(user=user)
@@ -852,6 +1018,20 @@ class DealerVacationViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('-start_date')
 
+    def perform_create(self, serializer):
+        self.check_dealer_casino(serializer)
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self.check_dealer_casino(serializer)
+        serializer.save()
+
+    def check_dealer_casino(self, serializer):
+        # user_id accepts any dealer; only the caller's own casino is allowed
+        dealer = serializer.validated_data.get('user')
+        if dealer is not None and dealer.casino_id != self.request.user.casino_id:
+            raise ValidationError({'user_id': 'Dealer not found'})
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a dealer vacation request."""
@@ -902,13 +1082,9 @@ class DealerVacationViewSet(viewsets.ModelViewSet):
     def current(self, request):
         """Get current dealer vacations."""
         list_type = request.query_params.get('list_type', 'all')
-        today = timezone.now().date()
+        today = current_gaming_day(request.user.casino_id)
         
-        queryset = self.queryset.filter(
-            start_date__lte=today,
-            end_date__gte=today,
-            status='APPROVED'
-        )
+        queryset = self.queryset.covering(today).filter(user__casino_id=request.user.casino_id)
         
         if list_type == 'supervisor':
             queryset = queryset.filter(user__role='SUPERVISOR')
@@ -937,9 +1113,18 @@ class DealerVacationViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            vacations = self.queryset.filter(
-                start_date__year=year,
-                start_date__month=month
+            start_date = datetime(int(year), int(month), 1).date()
+            end_date = start_date.replace(day=calendar.monthrange(start_date.year, start_date.month)[1])
+        except ValueError:
+            return Response(
+                {'error': 'Invalid month or year'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # Every vacation in the casino that covers part of the month, not just those starting in it
+            vacations = self.queryset.overlapping(start_date, end_date).filter(
+                user__casino_id=request.user.casino_id
             ).order_by('start_date')
             
             serializer = self.get_serializer(vacations, many=True)
@@ -950,6 +1135,44 @@ class DealerVacationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """Who is off on each day of a month (?month=YYYY-MM) or quarter (?quarter=YYYY-Q1)."""
+        if request.user.role not in ['CASINO_MANAGER', 'TOKE_MANAGER']:
+            return Response(
+                {'error': 'Only casino managers and toke managers can access the vacation calendar'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        month = request.query_params.get('month')
+        quarter = request.query_params.get('quarter')
+        try:
+            if quarter:
+                year, number = quarter.upper().split('-Q')
+                number = int(number)
+                if not 1 <= number <= 4:
+                    raise ValueError(quarter)
+                start_date = datetime(int(year), 3 * number - 2, 1).date()
+                last_month = 3 * number
+            else:
+                start_date = (
+                    datetime.strptime(month, '%Y-%m').date() if month
+                    else current_gaming_day(request.user.casino_id).replace(day=1)
+                )
+                last_month = start_date.month
+        except ValueError:
+            return Response(
+                {'error': 'Use month=YYYY-MM or quarter=YYYY-Q1 through YYYY-Q4'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        end_date = start_date.replace(
+            month=last_month,
+            day=calendar.monthrange(start_date.year, last_month)[1]
+        )
+        vacation_status = request.query_params.get('status', 'APPROVED')
+        return Response(build_calendar(request.user.casino_id, start_date, end_date, status=vacation_status))
+
     @action(detail=False, methods=['get'])
     def history(self, request):
         """Get vacation history for the past 12 months."""
@@ -960,30 +1183,110 @@ class DealerVacationViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Get current date
-            today = timezone.now().date()
-            
-            # Calculate date 12 months ago
-            twelve_months_ago = today - timezone.timedelta(days=365)
-            
-            # Get all approved vacations from the past 12 months
-            vacations = self.queryset.filter(
-                status='APPROVED',
-                start_date__gte=twelve_months_ago,
-                start_date__lte=today
-            ).order_by('-start_date')  # Most recent first
-            
-            # Group vacations by month
-            grouped_vacations = {}
-            for vacation in vacations:
-                month_key = vacation.start_date.strftime('%Y-%m')  # Format: YYYY-MM
-                if month_key not in grouped_vacations:
-                    grouped_vacations[month_key] = []
-                grouped_vacations[month_key].append(self.get_serializer(vacation).data)
-            
-            return Response(grouped_vacations)
+            # Grouped by month, for the manager's casino
+            return Response(vacation_history.get_history(request.user.casino_id))
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+class DailyRollupViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    serializer_class = DailyRollupSerializer
+    pagination_class = DailyRollupPagination
+
+    # Set by list() once ?start_date= and ?end_date= have been validated
+    start_date = end_date = None
+
+    def get_casino_id(self):
+        # Summaries are only ever shown for the user's own casino
+        return self.request.user.casino_id
+
+    def get_queryset(self):
+        queryset = DailyRollup.objects.filter(casino_id=self.get_casino_id())
+        if self.start_date:
+            queryset = queryset.filter(gaming_day__gte=self.start_date)
+        if self.end_date:
+            queryset = queryset.filter(gaming_day__lte=self.end_date)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.user.role not in REPORT_ROLES:
+            return Response(
+                {'error': 'Not authorized to view toke summaries'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        try:
+            self.start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+            self.end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            return Response(
+                {'error': 'end_date must not be before start_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return super().list(request, *args, **kwargs)
+
+    def summary_response(self, start_date, end_date):
+        casino_id = self.get_casino_id()
+        shifts, totals = rollups.summarize(casino_id, start_date, end_date)
+        return Response({
+            'casino': casino_id,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'shifts': shifts,
+            'totals': totals
+        })
+
+    @action(detail=False, methods=['get'])
+    def weekly(self, request):
+        """Summary for the Monday to Sunday week containing ?date= (default today)."""
+        if request.user.role not in REPORT_ROLES:
+            return Response(
+                {'error': 'Not authorized to view toke summaries'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        day = request.query_params.get('date')
+        try:
+            day = datetime.strptime(day, '%Y-%m-%d').date() if day else current_gaming_day(request.user.casino_id)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start_date = day - timedelta(days=day.weekday())
+        return self.summary_response(start_date, start_date + timedelta(days=6))
+
+    @action(detail=False, methods=['get'])
+    def monthly(self, request):
+        """Summary for ?month=YYYY-MM (default the current month)."""
+        if request.user.role not in REPORT_ROLES:
+            return Response(
+                {'error': 'Not authorized to view toke summaries'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        month = request.query_params.get('month')
+        try:
+            start_date = (
+                datetime.strptime(month, '%Y-%m').date() if month
+                else current_gaming_day(request.user.casino_id).replace(day=1)
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid month format. Use YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        end_date = start_date.replace(day=calendar.monthrange(start_date.year, start_date.month)[1])
+        return self.summary_response(start_date, end_date)
@@ -53,7 +53,7 @@ def create_test_data():
             first_name=first_name,
             last_name=last_name,
             role='CASINO_MANAGER',
-            casino=casino.name,
+            casino=casino,
             employee_id=employee_id,
             shift=i-20,  # 21->1, 22->2
             pencil_id=employee_id  # Set pencil_id for casino managers
@@ -86,7 +86,7 @@ def create_test_data():
             first_name=first_name,
             last_name=last_name,
             role='DEALER',
-            casino=casino.name,
+            casino=casino,
             employee_id=employee_id,
             shift=((i-1) // 3) + 1  # Assigns shifts 1, 1, 1, 2, 2, 2, 3, 3, 3
         )
@@ -110,7 +110,7 @@ def create_test_data():
             first_name=first_name,
             last_name=last_name,
             role='SUPERVISOR',
-            casino=casino.name,
+            casino=casino,
             employee_id=employee_id,
             shift=((i-10) // 2) + 1  # Assigns 2 supervisors per shift: 1,1,2,2,3,3
         )
@@ -133,7 +133,7 @@ def create_test_data():
             first_name=first_name,
             last_name=last_name,
             role='SUPERVISOR',  # Pencils are supervisors with pencil privileges
-            casino=casino.name,
+            casino=casino,
             employee_id=employee_id,
             shift=((i-15) // 2) + 1  # Assigns shifts: 1,1,2,2
         )
@@ -157,7 +157,7 @@ def create_test_data():
             first_name=first_name,
             last_name=last_name,
             role='TOKE_MANAGER',
-            casino=casino.name,
+            casino=casino,
             employee_id=employee_id,
             shift=i-18  # 19->1, 20->2
         )
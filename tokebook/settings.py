@@ -4,6 +4,7 @@ Django settings for tokebook project.
 
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -55,12 +57,16 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'x-user-role',
-    'x-user-id'
+    'x-user-id',
+    'last-event-id',
+    'idempotency-key',
 ]
 
 CORS_EXPOSE_HEADERS = [
     'content-type',
     'authorization',
+    'server-timing',
+    'idempotent-replayed',
 ]
 
 ROOT_URLCONF = 'tokebook.urls'
@@ -91,6 +97,54 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile, enabled with SQLITE_PROFILE=production.
+# WAL lets readers carry on while a writer commits, and busy_timeout makes
+# a blocked writer wait instead of failing with "database is locked".
+# Transactions start IMMEDIATE so two writers queue up at BEGIN rather
+# than deadlocking when both try to upgrade a read lock. Run the
+# sqlite_maintenance command periodically alongside it.
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,  # negative means KiB, so 64 MiB per connection
+    'temp_store': 'MEMORY',
+}
+
+if os.environ.get('SQLITE_PROFILE') == 'production':
+    DATABASES['default']['OPTIONS'] = {
+        'init_command': ';'.join(
+            f'PRAGMA {name}={value}' for name, value in SQLITE_PRODUCTION_PRAGMAS.items()
+        ),
+        'transaction_mode': 'IMMEDIATE',
+    }
+
+# Early-out event stream
+# Each open stream on a WSGI server holds a worker thread, so WSGI streams
+# end after EARLY_OUT_STREAM_WSGI_MAX_SECONDS and clients reconnect. Serve
+# /api/early-out-requests/stream/ from tokebook.asgi (e.g. uvicorn or daphne)
+# to hold streams for EARLY_OUT_STREAM_MAX_SECONDS without tying up threads.
+EARLY_OUT_STREAM_WSGI_MAX_SECONDS = 25
+EARLY_OUT_STREAM_MAX_SECONDS = 300
+
+# Cache
+# Local memory works for a single process. Point this at a shared backend
+# (e.g. Redis or memcached) when running several workers, so cached data
+# such as the daily roster stays consistent between them. Running several
+# workers also relies on it for correctness:
+# - Idempotency-Key claims and stored responses (api/idempotency.py) live
+#   here. With a per-process cache, a retry that reaches another worker
+#   runs the write again.
+# - Token revocations (api/revocation.py) only reach other workers
+#   through it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokebook',
+    }
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'api.User'
 
@@ -147,6 +201,7 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),  # Match NextAuth's session expiry
     'REFRESH_TOKEN_LIFETIME': timedelta(days=60),
+    # Both honoured by /api/auth/refresh/; revoked tokens live in api/revocation.py
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': False,
@@ -164,29 +219,55 @@ SIMPLE_JWT = {
     'VERIFY_EXP': False,  # Temporarily disable expiration check for debugging
 }
 
-# Debug logging for DRF
+# Metrics
+# /api/metrics/ answers only requests with "Authorization: Bearer <METRICS_TOKEN>"
+# and is disabled when no token is set.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Logging
+# Application loggers write JSON lines through api.log.QueuedHandler, so
+# request threads only enqueue records and a background thread does the
+# I/O. LOG_LEVEL=DEBUG turns on the per-request debug events; the hot-path
+# ones are sampled at LOG_HOT_PATH_SAMPLE_RATE.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_HOT_PATH_SAMPLE_RATE = 0.01
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
+        'queued': {
+            '()': 'api.log.QueuedHandler',
         },
     },
     'loggers': {
+        # Not propagated: Django's own 'django' console handler writes synchronously
         'django.request': {
-            'handlers': ['console'],
+            'handlers': ['queued'],
             'level': 'DEBUG',
-            'propagate': True,
+            'propagate': False,
         },
         'rest_framework': {
-            'handlers': ['console'],
+            'handlers': ['queued'],
             'level': 'DEBUG',
             'propagate': True,
         },
+        'api': {
+            'handlers': ['queued'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # One line per request from api.middleware.ServerTimingMiddleware
+        'api.timing': {
+            'level': 'INFO',
+        },
     },
 }
 
+# Test runs make hundreds of requests; keep only the over-budget timing lines
+if sys.argv[1:2] == ['test']:
+    LOGGING['loggers']['api.timing']['level'] = 'WARNING'
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = False  # Change to False for security
 CORS_ALLOW_CREDENTIALS = True